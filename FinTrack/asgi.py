@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FinTrack.settings')
 
+# Django does not support persistent connections under ASGI
+for database in settings.DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
+
 application = get_asgi_application()
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fintrack_app.middleware.StaticFilesMiddleware',
+    'fintrack_app.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,10 +56,18 @@ ROOT_URLCONF = 'FinTrack.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock Django templates, timed for the Server-Timing header
+        'BACKEND': 'fintrack_app.template_backends.InstrumentedDjangoTemplates',
         'DIRS': ['templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process. runserver's autoreloader
+            # still picks up template edits in development.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -68,18 +78,113 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'FinTrack.wsgi.application'
+ASGI_APPLICATION = 'FinTrack.asgi.application'
+
+
+# Request performance metrics (fintrack_app/middleware.py)
+# Server-Timing headers plus one JSON log line per request, printed once
+# PERFORMANCE_LOG_LEVEL is 'INFO'. cProfile dumps are taken for a random
+# PERFORMANCE_PROFILE_SAMPLE_RATE share of requests (0 = off) and kept when the
+# request took at least PERFORMANCE_PROFILE_THRESHOLD_MS.
+
+PERFORMANCE_METRICS = True
+PERFORMANCE_LOG_LEVEL = 'WARNING'
+PERFORMANCE_PROFILE_SAMPLE_RATE = 0
+PERFORMANCE_PROFILE_THRESHOLD_MS = 500
+PERFORMANCE_PROFILE_DIR = BASE_DIR / 'profiles'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'fintrack.performance': {
+            'handlers': ['console'],
+            'level': PERFORMANCE_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
 
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Applied to every new SQLite connection; see fintrack_app/sqlite.py for the
+# periodic optimize. The WAL journal mode, which lets readers keep going while a
+# write is in progress, is stored in the database file and set by migration 0015.
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # KiB when negative
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # ms
+}
+
+# Seconds between PRAGMA optimize runs on a persistent connection
+SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse connections between requests instead of reopening per request.
+        # FinTrack/asgi.py turns this off, persistent connections are not safe under ASGI.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ''.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock at BEGIN, so read-then-write blocks wait on busy_timeout instead of failing
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file rather than shared-cache memory, so concurrency tests see real SQLite locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Dashboards are cached per user under a data version (see fintrack_app/caching.py).
+# The cache must be shared by every process that writes data: web workers,
+# run_jobs and the management commands. A directory works on one box, use
+# Redis or Memcached across several. Local memory is only safe for a single
+# process and fails the fintrack.W001 check.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Async views run independent queries on separate threads and connections
+# (see fintrack_app/concurrency.py). Off runs them one by one on the request's connection.
+ASYNC_PARALLEL_QUERIES = True
+
+# Background jobs (fintrack_app/jobs.py), run by `manage.py run_jobs`.
+# JOBS_PER_USER caps the jobs of one user running at once; uploads and
+# finished exports are kept under JOB_FILES_DIR for JOB_RETENTION_DAYS.
+JOBS_PER_USER = 1
+JOB_THREADS = 4
+JOB_FILES_DIR = BASE_DIR / 'job_files'
+JOB_RETENTION_DAYS = 7
+
+
+# Sessions, users and profiles are read from the cache (fintrack_app/auth.py).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = [
+    'fintrack_app.auth.CachedModelBackend',
+    # Still named in sessions from before the cached backend
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -125,6 +230,22 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# `manage.py collectstatic` writes content-hashed copies plus .gz/.br variants
+# to STATIC_ROOT (fintrack_app/staticfiles.py). StaticFilesMiddleware serves
+# hashed names as immutable and plain names for STATIC_MAX_AGE seconds.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'fintrack_app.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+STATIC_MAX_AGE = 60
+
 
 LOGIN_URL = 'login'          # the URL name of your login view
 LOGIN_REDIRECT_URL = 'dashboard'  # where to go after login
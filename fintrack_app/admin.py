@@ -1,10 +1,35 @@
 from django.contrib import admin
-from .models import UserProfile, Category, Debt, Transaction, Budget, Goal
+from .models import UserProfile, Category, Debt, Transaction, Budget, Goal, MonthlySummary, LedgerEntry, BalanceSnapshot, RecurringTransaction, ArchivedTransaction, Job
 # Register your models here.
 
-admin.site.register(UserProfile)
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Rows derived from other data, edits would put them out of step."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class UserProfileAdmin(admin.ModelAdmin):
+    # The running balance of the ledger
+    readonly_fields = ["balance"]
+
+
+admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(Category)
 admin.site.register(Transaction)
 admin.site.register(Budget)
 admin.site.register(Debt)
-admin.site.register(Goal)
\ No newline at end of file
+admin.site.register(Goal)
+admin.site.register(MonthlySummary, ReadOnlyAdmin)
+admin.site.register(LedgerEntry, ReadOnlyAdmin)
+admin.site.register(BalanceSnapshot, ReadOnlyAdmin)
+admin.site.register(RecurringTransaction)
+admin.site.register(ArchivedTransaction)
+admin.site.register(Job)
@@ -0,0 +1,201 @@
+"""Income and expense time series per category, grouped in the database.
+
+Whole months come from the MonthlySummary rollups, the rest from raw
+transactions. Buckets ending before today are cached under the user's history version.
+"""
+from collections import defaultdict
+from itertools import chain
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import DateField, DateTimeField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedTransaction, Category, MonthlySummary, Transaction
+
+GRANULARITIES = ("day", "week", "month", "year")
+
+# Upper bound on buckets per series, about ten years of days
+MAX_BUCKETS = 3700
+
+HISTORY_TIMEOUT = 60 * 60 * 24
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket `day` falls in. Weeks start on Monday, like TruncWeek."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == "day":
+        return day + timedelta(days=1)
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return (day + timedelta(days=32)).replace(day=1)
+    return day.replace(year=day.year + 1)
+
+
+def buckets(start, end, granularity):
+    """Every bucket between `start` and `end` (inclusive), so empty periods show up as zeros."""
+    result = []
+    day = bucket_start(start, granularity)
+    while day <= end:
+        result.append(day)
+        day = next_bucket(day, granularity)
+    return result
+
+
+def bucket_count(start, end, granularity):
+    if granularity == "day":
+        return (end - start).days + 1
+    if granularity == "week":
+        return (bucket_start(end, "week") - bucket_start(start, "week")).days // 7 + 1
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return end.year - start.year + 1
+
+
+# date() modifiers that truncate to the start of each bucket; weekday 0 is the next Sunday
+_SQLITE_MODIFIERS = {
+    "day": "",
+    "week": ", 'weekday 0', '-6 days'",
+    "month": ", 'start of month'",
+    "year": ", 'start of year'",
+}
+
+
+class BucketTrunc(Trunc):
+    """Trunc to a date, with SQLite's native date() instead of a Python callback when the time zone is UTC."""
+    output_field = DateField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if isinstance(self.lhs.output_field, DateTimeField) and self.get_tzname() not in (None, "UTC"):
+            return self.as_sql(compiler, connection)
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}{_SQLITE_MODIFIERS[self.kind]})", params
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _raw_totals(user, start, end, granularity, category):
+    # [start, end) of raw transactions, truncated to buckets by the database
+    parts = []
+    for model in (Transaction, ArchivedTransaction):
+        queryset = model.objects.filter(user=user, date__gte=_day_start(start), date__lt=_day_start(end))
+        if category:
+            queryset = queryset.filter(category_id=category)
+        parts.append(
+            queryset.order_by()
+            .annotate(bucket=BucketTrunc("date", granularity))
+            .values_list("bucket", "category_id", "transaction_type")
+            .annotate(total=Sum("amount"))
+        )
+    return chain(*parts)
+
+
+def _rollup_totals(user, start, end, granularity, category):
+    # [start, end) of whole months from the rollups
+    queryset = MonthlySummary.objects.filter(user=user, month__gte=start, month__lt=end)
+    if category:
+        queryset = queryset.filter(category_id=category)
+    return (
+        queryset.order_by()
+        .annotate(bucket=BucketTrunc("month", granularity))
+        .values_list("bucket", "category_id", "transaction_type")
+        .annotate(total=Sum("total"))
+    )
+
+
+def _totals(user, start, end, granularity, category):
+    """{(bucket, category id, type): total} for transactions dated in [start, end)."""
+    parts = []
+    if granularity in ("month", "year"):
+        first_month = start if start.day == 1 else next_bucket(start, "month")
+        last_month = end.replace(day=1)
+        if first_month < last_month:
+            if start < first_month:
+                parts.append(_raw_totals(user, start, first_month, granularity, category))
+            parts.append(_rollup_totals(user, first_month, last_month, granularity, category))
+            if last_month < end:
+                parts.append(_raw_totals(user, last_month, end, granularity, category))
+    if not parts:
+        parts.append(_raw_totals(user, start, end, granularity, category))
+
+    totals = defaultdict(int)
+    for part in parts:
+        for bucket, category_id, transaction_type, total in part:
+            totals[(bucket, category_id, transaction_type)] += total
+    return dict(totals)
+
+
+def _history_key(user_id, start, cutoff, granularity, category):
+    version = caching.history_version(user_id)
+    return f"fintrack:analytics:{user_id}:{version}:{granularity}:{start}:{cutoff}:{category or ''}"
+
+
+def series(user, start, end, granularity="month", category=None):
+    """Income and expense per bucket and per category for transactions dated `start` to `end` (inclusive)."""
+    cutoff = min(bucket_start(timezone.localdate(), granularity), end + timedelta(days=1))
+    totals = {}
+
+    if start < cutoff:
+        key = _history_key(user.pk, start, cutoff, granularity, category)
+        history = cache.get(key)
+        if history is None:
+            history = _totals(user, start, cutoff, granularity, category)
+            cache.set(key, history, timeout=HISTORY_TIMEOUT)
+        totals.update(history)
+
+    if cutoff <= end:
+        totals.update(_totals(user, max(start, cutoff), end + timedelta(days=1), granularity, category))
+
+    labels = buckets(start, end, granularity)
+    index = {bucket: i for i, bucket in enumerate(labels)}
+    names = dict(Category.objects.filter(user=user).values_list("id", "name"))
+
+    income = [0.0] * len(labels)
+    expense = [0.0] * len(labels)
+    per_category = {}
+    for (bucket, category_id, transaction_type), total in totals.items():
+        i = index[bucket]
+        (income if transaction_type == "income" else expense)[i] += float(total)
+        values = per_category.setdefault((category_id, transaction_type), [0.0] * len(labels))
+        values[i] += float(total)
+
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "buckets": labels,
+        "income": [round(value, 2) for value in income],
+        "expense": [round(value, 2) for value in expense],
+        "categories": [
+            {
+                "id": category_id,
+                "name": names.get(category_id),
+                "transaction_type": transaction_type,
+                "values": [round(value, 2) for value in values],
+            }
+            for (category_id, transaction_type), values in sorted(
+                per_category.items(), key=lambda item: (item[0][1], names.get(item[0][0]) or "")
+            )
+        ],
+    }
+
+
+def default_range(today=None):
+    """The last twelve months, including the current one."""
+    today = today or timezone.localdate()
+    months = today.year * 12 + today.month - 1 - 11
+    return date(months // 12, months % 12 + 1, 1), today
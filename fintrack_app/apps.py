@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.models.signals import post_migrate
 
 
 class FintrackAppConfig(AppConfig):
     name = 'fintrack_app'
+
+    def ready(self):
+        from . import signals, staticfiles  # noqa: F401
+        from .search import ensure_installed
+        from .sqlite import optimize_connections
+
+        request_finished.connect(optimize_connections, dispatch_uid="fintrack_sqlite_optimize")
+        post_migrate.connect(ensure_installed, sender=self, dispatch_uid="fintrack_search_triggers")
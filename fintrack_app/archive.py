@@ -0,0 +1,96 @@
+"""Moves old transactions out of the hot table into ArchivedTransaction, in batches.
+
+Archived rows keep their id, so they stay in the search index (see
+search.py) and in exports, which merge both tables. Their amounts are
+already in the monthly rollups and the balance ledger, and both are left
+alone: rows are moved with plain SQL, which sends none of the signals a
+delete would use to take them back out. Dashboard totals, analytics and
+balances are therefore unchanged by archiving.
+
+Each batch is deleted and inserted in one short DB transaction, so
+the job can run next to normal traffic, and an interrupted run is resumed by
+simply running it again.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedTransaction, Transaction
+
+# Transactions dated before this many days ago are archived
+ARCHIVE_AFTER_DAYS = getattr(settings, "ARCHIVE_AFTER_DAYS", 2 * 365)
+
+DEFAULT_BATCH_SIZE = 1000
+
+FIELDS = (
+    "id", "user_id", "category_id", "transaction_type", "amount", "date", "note",
+    "recurring_id", "occurrence_date", "created_at", "updated_at",
+)
+
+
+@dataclass
+class ArchiveResult:
+    batches: int = 0
+    archived: int = 0
+
+
+def cutoff(days=None):
+    """Start of the local day `days` (ARCHIVE_AFTER_DAYS by default) before today."""
+    day = timezone.localdate() - timedelta(days=ARCHIVE_AFTER_DAYS if days is None else days)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _move(candidates, last_pk, batch_size):
+    """Archive the next batch after `last_pk`. Returns the moved rows, as FIELDS tuples."""
+    columns = ", ".join(connection.ops.quote_name(name) for name in FIELDS)
+    with transaction.atomic():
+        # Selected inside the transaction, a concurrent edit of a row either lands before or fails the batch
+        ids = list(candidates.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return []
+        archived_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            # Rows go across as stored, without the per-field conversions of a model round trip
+            cursor.execute(
+                f"DELETE FROM {Transaction._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(ids))}) "
+                f"RETURNING {columns}",
+                ids,
+            )
+            rows = cursor.fetchall()
+            cursor.executemany(
+                f"INSERT INTO {ArchivedTransaction._meta.db_table} ({columns}, archived_at) "
+                f"VALUES ({', '.join(['%s'] * (len(FIELDS) + 1))})",
+                [(*row, archived_at) for row in rows],
+            )
+    return rows
+
+
+def run(days=None, batch_size=DEFAULT_BATCH_SIZE, user_ids=None, progress=None):
+    """Archive every transaction dated before `cutoff(days)`.
+
+    Transactions are read in primary key order, `batch_size` at a time.
+    `progress(result)` is called after every batch.
+    """
+    result = ArchiveResult()
+    candidates = Transaction.objects.filter(date__lt=cutoff(days)).order_by("pk")
+    if user_ids is not None:
+        candidates = candidates.filter(user_id__in=user_ids)
+
+    last_pk = 0
+    while True:
+        rows = _move(candidates, last_pk, batch_size)
+        if not rows:
+            break
+        last_pk = max(row[0] for row in rows)
+        result.batches += 1
+        result.archived += len(rows)
+        # Lists and the dashboard's recent transactions may have shown these rows
+        for user_id in {row[1] for row in rows}:
+            caching.bump_version(user_id)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,77 @@
+"""Cached user and profile lookup for authenticated requests.
+
+The user is cached until saved, deleted or logged out, the profile under the
+user's data version. Both need a cache shared between processes.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.checks import Error, Tags, register
+
+from . import caching
+from .models import UserProfile
+
+# Bounds how long changes made without save() (queryset updates) can go unnoticed
+USER_CACHE_TIMEOUT = getattr(settings, "USER_CACHE_TIMEOUT", 5 * 60)
+
+
+def load_user(user_id):
+    """The user with their profile attached, from the cache when possible. None if there is no such user."""
+    if not caching.is_shared():
+        # Other processes could not drop a copy cached here
+        return User.objects.select_related("userprofile").filter(pk=user_id).first()
+    user_key, profile_key = caching.user_key(user_id), caching.profile_key(user_id)
+    found = cache.get_many([user_key, profile_key, caching.version_key(user_id)])
+    version = found.get(caching.version_key(user_id))
+    if version is None:
+        version = caching.data_version(user_id)
+
+    user, entry = found.get(user_key), found.get(profile_key)
+    if user is not None and entry is not None and entry[0] == version:
+        profile = entry[1]
+    else:
+        if user is None:
+            user = User.objects.select_related("userprofile").filter(pk=user_id).first()
+            if user is None:
+                return None
+            profile = getattr(user, "userprofile", None)
+            # The profile is cached separately
+            user._state.fields_cache.pop("userprofile", None)
+            cache.set(user_key, user, timeout=USER_CACHE_TIMEOUT)
+        else:
+            profile = UserProfile.objects.filter(user_id=user_id).first()
+        if profile is not None:
+            cache.set(profile_key, (version, profile), timeout=caching.DASHBOARD_TIMEOUT)
+
+    if profile is not None:
+        user.userprofile = profile
+    return user
+
+
+def forget_user(user_id):
+    cache.delete(caching.user_key(user_id))
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    if caching.is_shared() or "cache" not in settings.SESSION_ENGINE:
+        return []
+    return [Error(
+        "SESSION_ENGINE keeps sessions in a cache local to each process, so a logout only ends "
+        "the session in the process that handled it.",
+        hint="Use a cache shared between processes, or the db session engine.",
+        id="fintrack.E003",
+    )]
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup goes through load_user."""
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,500 @@
+"""Synthetic data and timing helpers behind the seed_benchmark, run_benchmarks, benchmark_sqlite and
+benchmark_servers commands."""
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Q, Sum
+from django.template.loader import render_to_string
+from django.test import AsyncClient, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, ledger, rollups, views
+from .models import Budget, Category, Debt, Goal, MonthlySummary, Transaction
+
+EXPENSE_NAMES = ["Food", "Rent", "Transport", "Utilities", "Health", "Shopping", "Travel", "Education", "Fun", "Gifts"]
+INCOME_NAMES = ["Salary", "Freelance", "Interest", "Refunds"]
+NOTES = ["", "", "weekly shop", "monthly bill", "card payment", "cash", "online order", "subscription"]
+
+
+def _categories(user, count):
+    names = [(name, "income") for name in INCOME_NAMES] + [(name, "expense") for name in EXPENSE_NAMES]
+    rows = []
+    for i in range(count):
+        name, category_type = names[i % len(names)]
+        suffix = f" {i // len(names) + 1}" if i >= len(names) else ""
+        rows.append(Category(user=user, name=f"{name}{suffix}", category_type=category_type))
+    return Category.objects.bulk_create(rows)
+
+
+def _transactions(user, categories, count, years, rng):
+    now = timezone.now()
+    span = int(timedelta(days=365 * years).total_seconds())
+    income = [c for c in categories if c.category_type == "income"] or categories
+    expense = [c for c in categories if c.category_type == "expense"] or categories
+
+    for _ in range(count):
+        # Roughly one income for every nine expenses, like a real account
+        if rng.random() < 0.1:
+            category, amount = rng.choice(income), rng.uniform(500, 5000)
+        else:
+            category, amount = rng.choice(expense), rng.uniform(1, 300)
+        yield Transaction(
+            user=user,
+            category=category,
+            transaction_type=category.category_type,
+            amount=Decimal(f"{amount:.2f}"),
+            date=now - timedelta(seconds=rng.randrange(span)),
+            note=rng.choice(NOTES),
+        )
+
+
+def seed(users=1, categories=10, transactions=1000, years=3, batch_size=10000, seed=None, progress=None,
+         budget_months=None):
+    """Create benchmark users with bulk inserts and return their ids.
+
+    Transactions are generated lazily and written `batch_size` at a time, so
+    memory stays flat even for millions of rows. Each user gets a budget for
+    the last `budget_months` months (default: `years` worth).
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    user_ids = []
+
+    for n in range(users):
+        user = User.objects.create(username=f"bench_{run}_{n}", password="!")
+        user_ids.append(user.pk)
+        cats = _categories(user, categories)
+
+        batch = []
+        written = 0
+        for t in _transactions(user, cats, transactions, years, rng):
+            batch.append(t)
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+                if progress:
+                    progress(user, written)
+        Transaction.objects.bulk_create(batch)
+
+        month = date.today().replace(day=1)
+        budgets = []
+        for _ in range(budget_months or 12 * years):
+            budgets.append(Budget(user=user, month=month, monthly_limit=Decimal(rng.randrange(500, 3000))))
+            month = (month - timedelta(days=1)).replace(day=1)
+        Budget.objects.bulk_create(budgets)
+
+        Debt.objects.bulk_create([
+            Debt(user=user, title=f"Debt {i}", debt_type=rng.choice(["lent", "borrowed"]),
+                 total_amount=Decimal(1000), remaining_amount=Decimal(rng.randrange(0, 1000)),
+                 start_date=date.today() - timedelta(days=rng.randrange(365 * years)))
+            for i in range(5)
+        ])
+        Goal.objects.bulk_create([
+            Goal(user=user, title=f"Goal {i}", goal_type=rng.choice(["savings", "purchase"]),
+                 target_amount=Decimal(5000), current_amount=Decimal(rng.randrange(0, 5000)))
+            for i in range(4)
+        ])
+
+    rollups.rebuild(user_ids)
+    for user_id in user_ids:
+        ledger.reconcile(user_id)
+    return user_ids
+
+
+# Benchmarks: name -> callable(client, user). Later features add theirs here.
+
+def _get(name):
+    def fetch(client, user):
+        response = client.get(reverse(name))
+        assert response.status_code == 200, (name, response.status_code)
+    return fetch
+
+
+def _dashboard_cold(client, user):
+    cache.clear()
+    _get("dashboard")(client, user)
+
+
+def _dashboard_render(fragments):
+    # Template rendering only, from the cached context. Without `fragments` every
+    # render gets a fresh fragment version, so the cached blocks are rebuilt
+    def render(client, user):
+        request = RequestFactory().get(reverse("dashboard"))
+        request.user = user
+        context = caching.get_dashboard(user.pk, lambda: views.dashboard_context(user))
+        if not fragments:
+            context = {**context, "fragment_cache": {**context["fragment_cache"], "version": uuid.uuid4().hex}}
+        render_to_string("fintrack_app/dashboard.html", context, request=request)
+    return render
+
+
+def _analytics(granularity, years, cold):
+    def fetch(client, user):
+        if cold:
+            cache.clear()
+        end = date.today()
+        start = end.replace(year=end.year - years)
+        response = client.get(reverse("analytics-series"), {
+            "start": start.isoformat(), "end": end.isoformat(), "granularity": granularity,
+        })
+        assert response.status_code == 200, ("analytics-series", response.status_code)
+    return fetch
+
+
+def _search(**params):
+    def fetch(client, user):
+        response = client.get(reverse("transaction-search"), params)
+        assert response.status_code == 200, ("transaction-search", response.status_code)
+    return fetch
+
+
+def _forecast_cold(client, user):
+    cache.clear()
+    _get("forecast")(client, user)
+
+
+def _goals_cold(client, user):
+    cache.clear()
+    _get("goal-list")(client, user)
+
+
+def _budget_actuals(client, user):
+    list(rollups.with_budget_actuals(Budget.objects.filter(user=user)))
+
+
+def _raw_totals(client, user):
+    Transaction.objects.filter(user=user).aggregate(
+        income=Sum("amount", filter=Q(transaction_type="income")),
+        expense=Sum("amount", filter=Q(transaction_type="expense")),
+    )
+
+
+def _rollup_totals(client, user):
+    MonthlySummary.objects.filter(user=user).aggregate(
+        income=Sum("total", filter=Q(transaction_type="income")),
+        expense=Sum("total", filter=Q(transaction_type="expense")),
+    )
+
+
+def _category_totals(client, user):
+    list(MonthlySummary.objects.filter(user=user).values("category__name", "transaction_type").annotate(
+        total=Sum("total")
+    ))
+
+
+BENCHMARKS = {
+    "dashboard (cold cache)": _dashboard_cold,
+    "dashboard (warm cache)": _get("dashboard"),
+    "dashboard render (cold fragments)": _dashboard_render(fragments=False),
+    "dashboard render (cached fragments)": _dashboard_render(fragments=True),
+    "dashboard charts": _get("dashboard-charts"),
+    "transaction list": _get("transaction-list"),
+    "category list": _get("category-list"),
+    "budget list": _get("budget-list"),
+    "budget vs actual (all months)": _budget_actuals,
+    "debt list": _get("debt-list"),
+    "analytics: 5y monthly (cold cache)": _analytics("month", 5, cold=True),
+    "analytics: 5y monthly (warm cache)": _analytics("month", 5, cold=False),
+    "analytics: 1y daily (cold cache)": _analytics("day", 1, cold=True),
+    "forecast (cold cache)": _forecast_cold,
+    "goal list": _get("goal-list"),
+    "goal list (cold projections)": _goals_cold,
+    "search: common word prefix": _search(q="onl"),
+    "search: word + type/amount/date filters": _search(
+        q="shop", transaction_type="expense", min_amount="100", start=(date.today() - timedelta(days=90)).isoformat()
+    ),
+    "search: no match": _search(q="zzzz"),
+    "aggregate: raw transaction totals": _raw_totals,
+    "aggregate: rollup totals": _rollup_totals,
+    "aggregate: category totals": _category_totals,
+}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_call(func, repeat):
+    """Run `func` once to warm up, then `repeat` times. Returns timings in ms and the query count."""
+    func()
+    timings = []
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings, len(ctx.captured_queries) // repeat
+
+
+def run(sizes, repeat=5, categories=10, names=None, keep=False, progress=None, budget_months=None):
+    """Time every benchmark against a freshly seeded user per size.
+
+    Unless `keep` is set the seeded data is rolled back afterwards.
+    """
+    results = []
+    for size in sizes:
+        with transaction.atomic():
+            [user_id] = seed(users=1, categories=categories, transactions=size, seed=size,
+                             budget_months=budget_months)
+            user = User.objects.get(pk=user_id)
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(user)
+
+            for name, bench in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                timings, queries = time_call(lambda: bench(client, user), repeat)
+                result = {
+                    "name": name,
+                    "size": size,
+                    "median_ms": round(statistics.median(timings), 3),
+                    "min_ms": round(min(timings), 3),
+                    "max_ms": round(max(timings), 3),
+                    "queries": queries,
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+
+            if not keep:
+                transaction.set_rollback(True)
+        cache.clear()
+
+    return {
+        "commit": _commit(),
+        "timestamp": timezone.now().isoformat(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(previous, current):
+    """(name, size, previous median, current median, change %) for results present in both runs."""
+    before = {(r["name"], r["size"]): r["median_ms"] for r in previous["results"]}
+    rows = []
+    for r in current["results"]:
+        old = before.get((r["name"], r["size"]))
+        if old:
+            rows.append((r["name"], r["size"], old, r["median_ms"], round((r["median_ms"] - old) / old * 100, 1)))
+    return rows
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _sqlite_connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def sqlite_concurrency(pragmas=None, duration=5.0, readers=4, rows=100000, write_batch=100):
+    """Dashboard-style aggregate reads per second while one writer keeps inserting.
+
+    Runs against a scratch database file with the given PRAGMAs (None for
+    SQLite's defaults), so settings can be compared before and after.
+    """
+    directory = tempfile.mkdtemp(prefix="fintrack-sqlite-")
+    path = os.path.join(directory, "bench.sqlite3")
+    rng = random.Random(0)
+
+    setup = _sqlite_connect(path, pragmas)
+    setup.execute(
+        "CREATE TABLE txn (id INTEGER PRIMARY KEY, user_id INTEGER, transaction_type TEXT,"
+        " amount NUMERIC, date TEXT)"
+    )
+    setup.execute("CREATE INDEX txn_user_type ON txn (user_id, transaction_type, date, amount)")
+    setup.execute("BEGIN")
+    setup.executemany(
+        "INSERT INTO txn (user_id, transaction_type, amount, date) VALUES (?, ?, ?, ?)",
+        ((rng.randrange(10), rng.choice(["income", "expense"]), rng.uniform(1, 500),
+          f"2025-{rng.randrange(1, 13):02d}-01") for _ in range(rows)),
+    )
+    setup.execute("COMMIT")
+    setup.close()
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def bump(name, n=1):
+        with lock:
+            counts[name] += n
+
+    def reader(user_id):
+        conn = _sqlite_connect(path, pragmas)
+        while not stop.is_set():
+            try:
+                conn.execute(
+                    "SELECT transaction_type, SUM(amount) FROM txn WHERE user_id = ? GROUP BY transaction_type",
+                    (user_id,),
+                ).fetchall()
+                bump("reads")
+            except sqlite3.OperationalError:
+                bump("errors")
+        conn.close()
+
+    def writer():
+        conn = _sqlite_connect(path, pragmas)
+        while not stop.is_set():
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO txn (user_id, transaction_type, amount, date) VALUES (?, ?, ?, ?)",
+                    [(rng.randrange(10), "expense", 9.99, "2026-01-01")] * write_batch,
+                )
+                conn.execute("COMMIT")
+                bump("writes", write_batch)
+            except sqlite3.OperationalError:
+                bump("errors")
+        conn.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "pragmas": pragmas or {},
+        "reads_per_sec": round(counts["reads"] / duration, 1),
+        "writes_per_sec": round(counts["writes"] / duration, 1),
+        "errors": counts["errors"],
+    }
+
+
+def _latency_summary(mode, timings, elapsed):
+    timings = sorted(timings)
+    return {
+        "mode": mode,
+        "requests": len(timings),
+        "requests_per_sec": round(len(timings) / elapsed, 1),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def _drive_wsgi(url, cookies, clients, requests, before):
+    """`clients` threads each sending `requests` GETs through the WSGI handler, like a threaded server."""
+    timings = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        client.cookies = cookies
+        try:
+            for _ in range(requests):
+                before()
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+                assert response.status_code == 200, (url, response.status_code)
+                with lock:
+                    timings.append(elapsed)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return _latency_summary("wsgi", timings, time.perf_counter() - start)
+
+
+async def _drive_asgi(url, cookies, clients, requests, before):
+    """`clients` concurrent tasks each sending `requests` GETs through the ASGI handler."""
+    timings = []
+
+    async def worker():
+        client = AsyncClient()
+        client.cookies = cookies
+        for _ in range(requests):
+            before()
+            start = time.perf_counter()
+            response = await client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return _latency_summary("asgi", timings, time.perf_counter() - start)
+
+
+def serve_concurrency(clients=8, requests=20, transactions=10000, cold=True, url_name="dashboard"):
+    """Latency and throughput of a page through the WSGI and the ASGI handler under concurrent clients.
+
+    Both run in process, without a network server, against a freshly seeded
+    user that is deleted afterwards. The data has to be committed so that
+    every client's connection can see it. With `cold` the cached dashboard is
+    dropped before each request, so every request runs the aggregate queries.
+    """
+    [user_id] = seed(users=1, transactions=transactions, seed=transactions)
+    user = User.objects.get(pk=user_id)
+    login = Client()
+    login.force_login(user)
+    url = reverse(url_name)
+
+    def before():
+        if cold:
+            cache.delete(caching.dashboard_key(user_id))
+
+    try:
+        # The test clients' default host, AsyncClient always sends it
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            results = [
+                _drive_wsgi(url, login.cookies, clients, requests, before),
+                asyncio.run(_drive_asgi(url, login.cookies, clients, requests, before)),
+            ]
+    finally:
+        login.logout()
+        user.delete()
+        cache.clear()
+
+    return {
+        "commit": _commit(),
+        "timestamp": timezone.now().isoformat(),
+        "clients": clients,
+        "transactions": transactions,
+        "cold": cold,
+        "results": results,
+    }
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+
+# How long a built dashboard may live in the cache (seconds). Staleness is
+# handled by the version key, this only bounds memory use.
+DASHBOARD_TIMEOUT = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 60 * 60 * 24)
+CATEGORIES_TIMEOUT = 60 * 60 * 24
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def is_shared():
+    """False when the cache lives in this process's memory, out of reach of other processes' writes."""
+    return not isinstance(caches["default"], LocMemCache)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared():
+        return []
+    return [Warning(
+        "The default cache is local to each process, so writes made by run_jobs, the management "
+        "commands or other workers leave cached dashboards, sessions and users stale.",
+        hint="Use a cache shared between processes, e.g. FileBasedCache, Redis or Memcached.",
+        id="fintrack.W001",
+    )]
+
+
+def version_key(user_id):
+    return f"fintrack:version:{user_id}"
+
+
+def history_key(user_id):
+    return f"fintrack:history:{user_id}"
+
+
+def dashboard_key(user_id):
+    return f"fintrack:dashboard:{user_id}"
+
+
+def categories_version_key(user_id):
+    return f"fintrack:categories-version:{user_id}"
+
+
+def categories_key(user_id):
+    return f"fintrack:categories:{user_id}"
+
+
+def user_key(user_id):
+    return f"fintrack:user:{user_id}"
+
+
+def profile_key(user_id):
+    return f"fintrack:profile:{user_id}"
+
+
+def _new_version():
+    # Never restart at 1 after an eviction, or old entries would look current again
+    return time.time_ns()
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def _bump_now_and_on_commit(key):
+    # Again on commit, in case a reader cached pre-commit data in between
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def data_version(user_id):
+    """Current version of a user's data, bumped on every write."""
+    return _version(version_key(user_id))
+
+
+def bump_version(user_id):
+    """Invalidate everything cached for a user."""
+    _bump_now_and_on_commit(version_key(user_id))
+
+
+def history_version(user_id):
+    """Version of a user's transactions dated before today, bumped only by backdated writes."""
+    return _version(history_key(user_id))
+
+
+def bump_history(user_id):
+    """Invalidate cached results for completed periods (see analytics.py)."""
+    _bump_now_and_on_commit(history_key(user_id))
+
+
+def bump_categories(user_id):
+    """Invalidate the cached category list of a user (see get_categories)."""
+    _bump_now_and_on_commit(categories_version_key(user_id))
+
+
+def get_categories(user_id, build):
+    """Return a user's cached category rows, calling `build()` on a miss.
+
+    Versioned separately from data_version, so transaction writes do not
+    throw the list away, only category changes do.
+    """
+    found = cache.get_many([categories_version_key(user_id), categories_key(user_id)])
+    version = found.get(categories_version_key(user_id))
+    entry = found.get(categories_key(user_id))
+    if version is not None and entry is not None and entry[0] == version:
+        _count("categories_hit")
+        return entry[1]
+
+    _count("categories_miss")
+    if version is None:
+        version = _version(categories_version_key(user_id))
+    rows = build()
+    cache.set(categories_key(user_id), (version, rows), timeout=CATEGORIES_TIMEOUT)
+    return rows
+
+
+def _cached_context(found, user_id, today):
+    # The cached context if it was built for the current version today, else None
+    version = found.get(version_key(user_id))
+    entry = found.get(dashboard_key(user_id))
+    if version is not None and entry is not None and entry[:2] == (version, today):
+        return entry[2]
+    return None
+
+
+def _with_fragment_cache(context, version, today):
+    # The {% cache %} blocks of dashboard.html vary on this, so they go stale together with the context
+    context["fragment_cache"] = {"version": f"{version}:{today.isoformat()}", "timeout": DASHBOARD_TIMEOUT}
+    return context
+
+
+def get_dashboard(user_id, build):
+    """Return the cached dashboard context for a user, calling `build()` on a miss.
+
+    The context carries `fragment_cache`, the version and timeout for the
+    template's fragment cache keys.
+    """
+    today = date.today()
+    found = cache.get_many([version_key(user_id), dashboard_key(user_id)])
+    context = _cached_context(found, user_id, today)
+    if context is not None:
+        _count("dashboard_hit")
+        return context
+
+    _count("dashboard_miss")
+    version = found.get(version_key(user_id))
+    if version is None:
+        version = data_version(user_id)
+
+    context = _with_fragment_cache(build(), version, today)
+    cache.set(dashboard_key(user_id), (version, today, context), timeout=DASHBOARD_TIMEOUT)
+    return context
+
+
+async def aget_dashboard(user_id, build):
+    """get_dashboard for async views, `build()` returns an awaitable."""
+    today = date.today()
+    found = await cache.aget_many([version_key(user_id), dashboard_key(user_id)])
+    context = _cached_context(found, user_id, today)
+    if context is not None:
+        _count("dashboard_hit")
+        return context
+
+    _count("dashboard_miss")
+    version = found.get(version_key(user_id))
+    if version is None:
+        version = await sync_to_async(data_version)(user_id)
+
+    context = _with_fragment_cache(await build(), version, today)
+    await cache.aset(dashboard_key(user_id), (version, today, context), timeout=DASHBOARD_TIMEOUT)
+    return context
@@ -0,0 +1,41 @@
+import asyncio
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .middleware import current_metrics
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def _on_own_connection(call):
+    def run():
+        # Queries on this worker thread still count towards the request's metrics
+        metrics = current_metrics.get()
+        try:
+            with connection.execute_wrapper(metrics.sql_wrapper) if metrics else nullcontext():
+                return call()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather(*calls):
+    """Run independent ORM callables at the same time and return their results in order.
+
+    Django's async ORM (aget, aaggregate, ...) hands every query to the same
+    thread, so asyncio.gather over it still runs them one after another. Each
+    call here gets a worker thread and its own connection instead, which lets
+    SQLite's WAL readers overlap. Inside an open transaction other connections
+    could not see its rows, so the calls then run in turn on the request's
+    connection, as they do with ASYNC_PARALLEL_QUERIES off.
+    """
+    if not getattr(settings, "ASYNC_PARALLEL_QUERIES", True) or await sync_to_async(_in_transaction)():
+        return [await sync_to_async(call)() for call in calls]
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection(call), thread_sensitive=False)() for call in calls
+    ))
@@ -0,0 +1,141 @@
+import csv
+import heapq
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ArchivedTransaction, Budget, Debt, Goal, Transaction
+
+CHUNK_SIZE = 2000
+
+# Columns of each exported table, in order
+TRANSACTION_FIELDS = ("id", "date", "transaction_type", "amount", "category__name", "note")
+BUDGET_FIELDS = ("id", "month", "monthly_limit")
+DEBT_FIELDS = ("id", "title", "debt_type", "total_amount", "remaining_amount", "start_date", "due_date")
+GOAL_FIELDS = ("id", "title", "goal_type", "target_amount", "current_amount", "deadline", "created_at")
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def transactions(user, start=None, end=None, category=None, model=Transaction):
+    """A user's transactions, oldest first, with the date range (inclusive) and category filters."""
+    queryset = model.objects.filter(user=user)
+    if start:
+        queryset = queryset.filter(date__gte=_day_start(start))
+    if end:
+        queryset = queryset.filter(date__lt=_day_start(end + timedelta(days=1)))
+    if category:
+        queryset = queryset.filter(category_id=category)
+    return queryset.order_by("date", "id")
+
+
+def _rows(queryset, fields):
+    # values_list + iterator: plain tuples streamed from the cursor, no model instances
+    return queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _transaction_rows(user, **filters):
+    # Archived and hot transactions as one stream, merged on (date, id) as both are read in that order
+    return heapq.merge(
+        _rows(transactions(user, model=ArchivedTransaction, **filters), TRANSACTION_FIELDS),
+        _rows(transactions(user, **filters), TRANSACTION_FIELDS),
+        key=lambda row: (row[1], row[0]),
+    )
+
+
+def _tables(user, start=None, end=None, category=None):
+    budgets = Budget.objects.filter(user=user).order_by("month", "id")
+    debts = Debt.objects.filter(user=user).order_by("start_date", "id")
+    goals = Goal.objects.filter(user=user).order_by("created_at", "id")
+    if start:
+        budgets = budgets.filter(month__gte=start.replace(day=1))
+        debts = debts.filter(start_date__gte=start)
+        goals = goals.filter(created_at__gte=_day_start(start))
+    if end:
+        budgets = budgets.filter(month__lte=end)
+        debts = debts.filter(start_date__lte=end)
+        goals = goals.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+
+    return [
+        ("transactions", TRANSACTION_FIELDS, _transaction_rows(user, start=start, end=end, category=category)),
+        ("budgets", BUDGET_FIELDS, _rows(budgets, BUDGET_FIELDS)),
+        ("debts", DEBT_FIELDS, _rows(debts, DEBT_FIELDS)),
+        ("goals", GOAL_FIELDS, _rows(goals, GOAL_FIELDS)),
+    ]
+
+
+class _Echo:
+    # csv.writer wants a file, this one hands each line straight back
+    def write(self, value):
+        return value
+
+
+def _header(name):
+    return "category" if name == "category__name" else name
+
+
+def transactions_csv(user, **filters):
+    """Transactions as CSV text chunks."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([_header(name) for name in TRANSACTION_FIELDS])
+    for row in _transaction_rows(user, **filters):
+        yield writer.writerow(row)
+
+
+def transactions_json(user, **filters):
+    """Transactions as a JSON array, one object per chunk."""
+    yield "["
+    separator = ""
+    for row in _transaction_rows(user, **filters):
+        yield separator + json.dumps(
+            {_header(name): value for name, value in zip(TRANSACTION_FIELDS, row)},
+            cls=DjangoJSONEncoder,
+        )
+        separator = ","
+    yield "]"
+
+
+def account_json(user, **filters):
+    """Transactions, budgets, debts and goals as one JSON object."""
+    yield "{"
+    for index, (table, fields, rows) in enumerate(_tables(user, **filters)):
+        yield f'{"," if index else ""}"{table}":['
+        separator = ""
+        for row in rows:
+            yield separator + json.dumps(
+                {_header(name): value for name, value in zip(fields, row)},
+                cls=DjangoJSONEncoder,
+            )
+            separator = ","
+        yield "]"
+    yield "}"
+
+
+def encode(chunks, compress=False, buffer_size=64 * 1024):
+    """UTF-8 encode text chunks into bytes of roughly `buffer_size`, optionally gzipped on the fly."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    pending = []
+    size = 0
+
+    for chunk in chunks:
+        data = chunk.encode()
+        pending.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            data = b"".join(pending)
+            pending, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b"".join(pending)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
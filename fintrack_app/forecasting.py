@@ -0,0 +1,217 @@
+"""Twelve-month cash-flow and balance projection.
+
+The history is per category and type per month. It is read from the
+MonthlySummary rollups rather than raw transactions, a few hundred rows even
+for a million transactions, through values_list into flat `array` columns
+and then a dense month-by-series grid. Each series is projected from the
+mean and least-squares trend of its last twelve months, scaled by a seasonal
+index per calendar month once two years of history exist.
+
+Recurring rules (see recurring.py) are known exactly, so their scheduled
+occurrences are added as they are and their past occurrences are taken out
+of the history, or they would be counted twice.
+"""
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import caching, ledger, recurring
+from .analytics import BucketTrunc
+from .models import ArchivedTransaction, Category, MonthlySummary, RecurringTransaction, Transaction
+
+HORIZON = 12
+
+# Months of history read, enough for two seasons and a trend
+HISTORY_MONTHS = 36
+
+# Recent months the level and the trend are fitted over
+TREND_MONTHS = 12
+
+# Seasonal indexes need every calendar month seen at least this often
+SEASONAL_YEARS = 2
+
+FORECAST_TIMEOUT = 60 * 60 * 24
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class History:
+    """Monthly totals as columns: month index, series index and amount, one entry per rollup row."""
+
+    def __init__(self, first, last):
+        self.first = first
+        self.last = last
+        self.months = array("l")
+        self.series = array("l")
+        self.totals = array("d")
+        self.keys = {}
+
+    def add(self, month, category_id, transaction_type, total):
+        key = (category_id, transaction_type)
+        if key not in self.keys:
+            self.keys[key] = len(self.keys)
+        self.months.append(month_index(month) - self.first)
+        self.series.append(self.keys[key])
+        self.totals.append(float(total))
+
+    def grid(self):
+        """One row of monthly totals per series, months without data as zero."""
+        width = self.last - self.first
+        rows = [array("d", bytes(8 * width)) for _ in self.keys]
+        for month, series, total in zip(self.months, self.series, self.totals):
+            rows[series][month] += total
+        return rows
+
+
+def load_history(user_id, first, last):
+    """Completed months [first, last) of the user's totals, without occurrences of recurring rules."""
+    history = History(first, last)
+    start, end = month_start(first), month_start(last)
+
+    rollups = MonthlySummary.objects.filter(user_id=user_id, month__gte=start, month__lt=end).values_list(
+        "month", "category_id", "transaction_type", "total"
+    )
+    for row in rollups:
+        history.add(*row)
+
+    for model in (Transaction, ArchivedTransaction):
+        scheduled = (
+            model.objects.filter(recurring__user_id=user_id, occurrence_date__gte=start, occurrence_date__lt=end)
+            .order_by()
+            .annotate(month=BucketTrunc("occurrence_date", "month"))
+            .values_list("month", "category_id", "transaction_type")
+            .annotate(total=Sum("amount"))
+        )
+        for month, category_id, transaction_type, total in scheduled:
+            history.add(month, category_id, transaction_type, -total)
+    return history
+
+
+def _fit(values):
+    """Mean and least-squares slope per month of `values`."""
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, 0.0
+    centre = (n - 1) / 2
+    spread = sum((x - centre) ** 2 for x in range(n))
+    return mean, sum((x - centre) * (y - mean) for x, y in enumerate(values)) / spread
+
+
+def _seasonal(values, first):
+    """Index per calendar month (1.0 is an average month), or None with too little history."""
+    if len(values) < 12 * SEASONAL_YEARS:
+        return None
+    mean = sum(values) / len(values)
+    if mean <= 0:
+        return None
+    sums, counts = [0.0] * 12, [0] * 12
+    for offset, value in enumerate(values):
+        month = (first + offset) % 12
+        sums[month] += value
+        counts[month] += 1
+    return [sums[m] / counts[m] / mean for m in range(12)]
+
+
+def project(values, first, horizon=HORIZON):
+    """The next `horizon` months of one series, given its history starting at month index `first`."""
+    recent = values[-TREND_MONTHS:]
+    mean, slope = _fit(recent)
+    seasonal = _seasonal(values, first)
+    # x of the next month, measured from the centre of the fitted window
+    ahead = (len(recent) - 1) / 2 + 1
+    after = first + len(values)
+    return [
+        max(0.0, (mean + slope * (ahead + h)) * (seasonal[(after + h) % 12] if seasonal else 1.0))
+        for h in range(horizon)
+    ]
+
+
+def _scheduled(user_id, first, horizon):
+    """{(category id, type): totals per month} of the user's recurring rules over the horizon."""
+    start, end = month_start(first), month_start(first + horizon)
+    result = {}
+    for rule in RecurringTransaction.objects.filter(user_id=user_id, active=True, next_date__lt=end):
+        dates, _ = recurring.due_dates(rule, end - timedelta(days=1))
+        values = result.setdefault((rule.category_id, rule.transaction_type), [0.0] * horizon)
+        for day in dates:
+            if day >= start:
+                values[month_index(day) - first] += float(rule.amount)
+    return result
+
+
+def _forecast(user, today):
+    current = month_index(today)
+    first = current - HISTORY_MONTHS
+    history = load_history(user.pk, first, current)
+
+    # History starts at the user's first month with data, so new users are not averaged with empty months
+    rows = history.grid()
+    begin = min(history.months, default=0)
+    per_series = {key: project(rows[series][begin:], first + begin) for key, series in history.keys.items()}
+    scheduled = _scheduled(user.pk, current + 1, HORIZON)
+    for key, values in scheduled.items():
+        projected = per_series.setdefault(key, [0.0] * HORIZON)
+        for h, value in enumerate(values):
+            projected[h] += value
+
+    income, expense = [0.0] * HORIZON, [0.0] * HORIZON
+    for (category_id, transaction_type), values in per_series.items():
+        totals = income if transaction_type == "income" else expense
+        for h, value in enumerate(values):
+            totals[h] += value
+    net = [i - e for i, e in zip(income, expense)]
+    start_balance = float(ledger.balance(user.pk))
+
+    names = dict(Category.objects.filter(user=user).values_list("id", "name"))
+    return {
+        "months": [month_start(current + 1 + h) for h in range(HORIZON)],
+        "start_balance": round(start_balance, 2),
+        "income": [round(value, 2) for value in income],
+        "expense": [round(value, 2) for value in expense],
+        "net": [round(value, 2) for value in net],
+        "balance": [round(value, 2) for value in accumulate(net, initial=start_balance)][1:],
+        "recurring": {
+            transaction_type: [
+                round(sum(values[h] for (_, kind), values in scheduled.items() if kind == transaction_type), 2)
+                for h in range(HORIZON)
+            ]
+            for transaction_type in ("income", "expense")
+        },
+        "categories": [
+            {
+                "id": category_id,
+                "name": names.get(category_id),
+                "transaction_type": transaction_type,
+                "values": [round(value, 2) for value in values],
+            }
+            for (category_id, transaction_type), values in sorted(
+                per_series.items(), key=lambda item: (item[0][1], names.get(item[0][0]) or "")
+            )
+            if any(values)
+        ],
+    }
+
+
+def forecast(user, today=None):
+    """Projected income, expense and balance for each of the next HORIZON months, from next month on.
+
+    Cached until the user's data changes, or the month turns.
+    """
+    today = today or timezone.localdate()
+    key = f"fintrack:forecast:{user.pk}:{caching.data_version(user.pk)}:{month_index(today)}"
+    result = cache.get(key)
+    if result is None:
+        result = _forecast(user, today)
+        cache.set(key, result, timeout=FORECAST_TIMEOUT)
+    return result
@@ -1,5 +1,55 @@
 from django import forms
-from .models import Budget, Debt, UserProfile
+from django.core.validators import EMPTY_VALUES
+from . import analytics, caching
+from .models import Budget, Category, Debt, RecurringTransaction, Transaction, UserProfile
+
+
+def user_categories(user_id):
+    """(id, name, category_type) of a user's categories by name, from the per-user cache."""
+    return caching.get_categories(user_id, lambda: list(
+        Category.objects.filter(user_id=user_id).order_by("name", "id").values_list("id", "name", "category_type")
+    ))
+
+
+class CategoryChoiceField(forms.ChoiceField):
+    """A select of one user's categories, grouped by type.
+
+    Choices and validation both come from user_categories(), so neither
+    rendering nor submitting the form queries categories on a cache hit.
+    Cleans to a Category instance (or None).
+    """
+    def __init__(self, *, empty_label="---------", **kwargs):
+        self.empty_label = empty_label
+        self.rows = {}
+        super().__init__(choices=(), **kwargs)
+
+    def set_user(self, user):
+        rows = user_categories(user.pk) if user else []
+        self.user_id = user.pk if user else None
+        self.rows = {str(pk): (pk, name, category_type) for pk, name, category_type in rows}
+        groups = [
+            (label, [(pk, name) for pk, name, category_type in rows if category_type == value])
+            for value, label in Category.CATEGORY_TYPE
+        ]
+        self.choices = [("", self.empty_label)] + [group for group in groups if group[1]]
+
+    def to_python(self, value):
+        if value in EMPTY_VALUES:
+            return None
+        row = self.rows.get(str(value))
+        if row is None:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+        pk, name, category_type = row
+        return Category.from_db(None, ["id", "user_id", "name", "category_type"], [pk, self.user_id, name, category_type])
+
+    def validate(self, value):
+        # to_python already checked the choice
+        forms.Field.validate(self, value)
+
+    def prepare_value(self, value):
+        return value.pk if isinstance(value, Category) else value
 
 class BudgetForm(forms.ModelForm):
     class Meta:
@@ -31,3 +81,153 @@ class DebtForm(forms.ModelForm):
             'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'due_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
         }
+
+class TransactionForm(forms.ModelForm):
+    category = CategoryChoiceField(required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+
+    class Meta:
+        model = Transaction
+        fields = ['category', 'transaction_type', 'amount', 'note']
+        widgets = {
+            'transaction_type': forms.Select(attrs={'class': 'form-select'}),
+            'amount': forms.NumberInput(attrs={'class': 'form-control'}),
+            'note': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["category"].set_user(user)
+
+    def _get_validation_exclusions(self):
+        # The category field already checked the id against the user's categories,
+        # skip the foreign key's own existence query
+        exclude = super()._get_validation_exclusions()
+        exclude.add("category")
+        return exclude
+
+class RecurringTransactionForm(forms.ModelForm):
+    category = CategoryChoiceField(required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+
+    class Meta:
+        model = RecurringTransaction
+        fields = ['category', 'transaction_type', 'amount', 'note', 'frequency', 'interval', 'start_date', 'end_date']
+        widgets = {
+            'transaction_type': forms.Select(attrs={'class': 'form-select'}),
+            'amount': forms.NumberInput(attrs={'class': 'form-control'}),
+            'note': forms.TextInput(attrs={'class': 'form-control'}),
+            'frequency': forms.Select(attrs={'class': 'form-select'}),
+            'interval': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'end_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["category"].set_user(user)
+
+    def _get_validation_exclusions(self):
+        # Checked against the user's categories by the field, as in TransactionForm
+        exclude = super()._get_validation_exclusions()
+        exclude.add("category")
+        return exclude
+
+class TransactionImportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("ofx", "OFX"),
+    )
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control'}))
+    file_format = forms.ChoiceField(choices=FORMAT_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
+    date_format = forms.CharField(
+        required=False,
+        help_text="strptime format of CSV dates, e.g. %d/%m/%Y (default: ISO 8601)",
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+
+class ExportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("json", "JSON"),
+    )
+
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+    gzip = forms.BooleanField(required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    category = forms.IntegerField(required=False)
+
+    def filters(self):
+        return {
+            "start": self.cleaned_data["start"],
+            "end": self.cleaned_data["end"],
+            "category": self.cleaned_data["category"],
+        }
+
+class AnalyticsForm(forms.Form):
+    GRANULARITY_CHOICES = [(name, name.title()) for name in analytics.GRANULARITIES]
+
+    granularity = forms.ChoiceField(choices=GRANULARITY_CHOICES, required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    category = forms.IntegerField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        default_start, default_end = analytics.default_range()
+        cleaned_data["granularity"] = cleaned_data.get("granularity") or "month"
+        cleaned_data["start"] = cleaned_data.get("start") or default_start
+        cleaned_data["end"] = cleaned_data.get("end") or default_end
+
+        if cleaned_data["start"] > cleaned_data["end"]:
+            raise forms.ValidationError("start must not be after end.")
+        count = analytics.bucket_count(cleaned_data["start"], cleaned_data["end"], cleaned_data["granularity"])
+        if count > analytics.MAX_BUCKETS:
+            raise forms.ValidationError(
+                f"Too many {cleaned_data['granularity']} buckets ({count}), use a shorter range or a coarser granularity."
+            )
+        return cleaned_data
+
+class TransactionSearchForm(forms.Form):
+    TYPE_CHOICES = [("", "Any type")] + list(Transaction.TRANSACTION_TYPE)
+
+    q = forms.CharField(required=False, max_length=200, widget=forms.TextInput(
+        attrs={'class': 'form-control', 'placeholder': 'Search notes and categories', 'type': 'search'}
+    ))
+    transaction_type = forms.ChoiceField(choices=TYPE_CHOICES, required=False,
+                                         widget=forms.Select(attrs={'class': 'form-select'}))
+    category = CategoryChoiceField(required=False, empty_label="Any category",
+                                   widget=forms.Select(attrs={'class': 'form-select'}))
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    min_amount = forms.DecimalField(required=False, min_value=0, decimal_places=2,
+                                    widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Min'}))
+    max_amount = forms.DecimalField(required=False, min_value=0, decimal_places=2,
+                                    widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Max'}))
+    archived = forms.BooleanField(required=False, label="Archived transactions",
+                                  widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+    page = forms.IntegerField(required=False, min_value=1)
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["category"].set_user(user)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("start must not be after end.")
+        return cleaned_data
+
+    def filters(self):
+        category = self.cleaned_data["category"]
+        return {
+            "text": self.cleaned_data["q"],
+            "start": self.cleaned_data["start"],
+            "end": self.cleaned_data["end"],
+            "min_amount": self.cleaned_data["min_amount"],
+            "max_amount": self.cleaned_data["max_amount"],
+            "transaction_type": self.cleaned_data["transaction_type"],
+            "category": category.pk if category else None,
+            "archived": self.cleaned_data["archived"],
+        }
@@ -0,0 +1,97 @@
+"""Completion estimates for all of a user's goals from their rolling savings rate.
+
+Two queries cover any number of goals: the goals themselves, and one
+aggregate over the monthly rollups for the savings rate. Savings are assumed
+to go to one goal at a time, earliest deadline first (goals without one
+last), so later goals complete after the ones ahead of them.
+"""
+import math
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Min, Q, Sum
+from django.utils import timezone
+
+from . import caching
+from .forecasting import month_index, month_start
+from .models import Goal, MonthlySummary
+
+# Completed months the savings rate is averaged over
+SAVINGS_MONTHS = 6
+
+GOALS_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass(frozen=True)
+class GoalProjection:
+    progress: Decimal
+    remaining: Decimal
+    # First day of the month the goal is expected to be reached, None if savings do not grow
+    completion: date | None
+    # What has to be put aside each month to meet the deadline, None without a deadline
+    required_monthly: Decimal | None
+    on_track: bool | None
+
+
+def savings_rate(user_id, today):
+    """Average monthly income minus expense over the last SAVINGS_MONTHS completed months."""
+    current = month_index(today)
+    totals = MonthlySummary.objects.filter(
+        user_id=user_id, month__gte=month_start(current - SAVINGS_MONTHS), month__lt=month_start(current)
+    ).aggregate(
+        income=Sum("total", filter=Q(transaction_type="income")),
+        expense=Sum("total", filter=Q(transaction_type="expense")),
+        first=Min("month"),
+    )
+    if totals["first"] is None:
+        return Decimal("0")
+    # Users with a shorter history are averaged over the months they have
+    months = current - month_index(totals["first"])
+    return ((totals["income"] or 0) - (totals["expense"] or 0)) / months
+
+
+def _projections(goals, rate, today):
+    current = month_index(today)
+    ordered = sorted(goals, key=lambda goal: (goal.deadline is None, goal.deadline or today, goal.created_at))
+    ahead = Decimal("0")
+    result = {}
+    for goal in ordered:
+        remaining = max(goal.target_amount - goal.current_amount, Decimal("0"))
+        progress = min(goal.current_amount * 100 / goal.target_amount, Decimal("100")) if goal.target_amount else 0
+
+        if not remaining:
+            completion = today
+        elif rate > 0:
+            ahead += remaining
+            completion = month_start(current + math.ceil(ahead / rate))
+        else:
+            completion = None
+
+        required = on_track = None
+        if goal.deadline:
+            months_left = max(month_index(goal.deadline) - current, 1)
+            required = (remaining / months_left).quantize(Decimal("0.01"))
+            on_track = completion is not None and month_index(completion) <= month_index(goal.deadline)
+
+        result[goal.pk] = GoalProjection(progress, remaining, completion, required, on_track)
+    return result
+
+
+def project_goals(user, today=None):
+    """All of the user's goals, newest first, each with its GoalProjection as `goal.projection`.
+
+    Cached until any of the user's data changes, or the day turns.
+    """
+    today = today or timezone.localdate()
+    key = f"fintrack:goals:{user.pk}:{caching.data_version(user.pk)}:{today}"
+    result = cache.get(key)
+    if result is None:
+        goals = list(Goal.objects.filter(user=user).order_by("-created_at", "id"))
+        projections = _projections(goals, savings_rate(user.pk, today), today) if goals else {}
+        for goal in goals:
+            goal.projection = projections[goal.pk]
+        result = goals
+        cache.set(key, result, timeout=GOALS_TIMEOUT)
+    return result
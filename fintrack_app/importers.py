@@ -0,0 +1,227 @@
+import csv
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, ledger, rollups
+from .models import Category, Transaction
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Only this many rejected rows are kept with their reason, the rest are just counted
+MAX_REJECTED_DETAILS = 1000
+
+
+# Largest amount Transaction.amount (max_digits=12, decimal_places=2) can hold
+MAX_AMOUNT = Decimal("9999999999.99")
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    processed: int = 0
+    created: int = 0
+    rejected_count: int = 0
+    rejected: list = field(default_factory=list)
+
+    def reject(self, line, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REJECTED_DETAILS:
+            self.rejected.append((line, reason))
+
+
+def parse_date(value, date_format=None):
+    value = (value or "").strip()
+    if not value:
+        raise RowError("missing date")
+    try:
+        parsed = datetime.strptime(value, date_format) if date_format else datetime.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"invalid date {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_amount(value, transaction_type=None):
+    """Amount and type of a row. Without an explicit type the sign decides."""
+    try:
+        signed = Decimal((value or "").strip().replace(",", ""))
+        if not signed.is_finite():
+            raise InvalidOperation
+        amount = abs(signed).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise RowError(f"invalid amount {value!r}")
+    if amount > MAX_AMOUNT:
+        raise RowError(f"amount {value!r} is too large")
+
+    if not transaction_type:
+        transaction_type = "expense" if signed < 0 else "income"
+    transaction_type = transaction_type.strip().lower()
+    if transaction_type not in ("income", "expense"):
+        raise RowError(f"invalid type {transaction_type!r}")
+
+    if amount < Decimal("0.01"):
+        raise RowError("amount must be at least 0.01")
+    return amount, transaction_type
+
+
+# Parsers yield (line number, row dict or RowError) one record at a time
+
+def parse_csv(lines, date_format=None):
+    """CSV with a header row: date, amount, and optionally type, category, note."""
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, RowError(f"unreadable row ({e})")
+            continue
+        try:
+            amount, transaction_type = parse_amount(row.get("amount"), row.get("type"))
+            yield reader.line_num, {
+                "date": parse_date(row.get("date"), date_format),
+                "amount": amount,
+                "transaction_type": transaction_type,
+                "category": (row.get("category") or "").strip(),
+                "note": (row.get("note") or row.get("description") or "").strip(),
+            }
+        except RowError as e:
+            yield reader.line_num, e
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _ofx_tags(stream, chunk_size=64 * 1024):
+    """(closing, tag, value) tokens of an OFX (SGML or XML) stream, read in chunks."""
+    buffer = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        # Keep the last, possibly incomplete, tag for the next round
+        cut = buffer.rfind("<")
+        for match in _OFX_TAG.finditer(buffer, 0, cut if cut > 0 else 0):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[cut:] if cut > 0 else buffer
+    for match in _OFX_TAG.finditer(buffer):
+        yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+
+
+def _ofx_date(value):
+    # YYYYMMDD[HHMMSS[.XXX]][[+-]TZ[:name]], the offset part is dropped
+    digits = re.match(r"\d+", value or "")
+    if not digits or len(digits.group()) < 8:
+        raise RowError(f"invalid date {value!r}")
+    digits = digits.group()[:14].ljust(14, "0")
+    return timezone.make_aware(datetime.strptime(digits, "%Y%m%d%H%M%S"))
+
+
+def parse_ofx(stream):
+    """Bank statement transactions (<STMTTRN> blocks) from an OFX file."""
+    record = None
+    number = 0
+    for closing, tag, value in _ofx_tags(stream):
+        if tag == "STMTTRN" and not closing:
+            record = {}
+            number += 1
+        elif tag == "STMTTRN" and closing and record is not None:
+            try:
+                amount, transaction_type = parse_amount(record.get("TRNAMT"))
+                yield number, {
+                    "date": _ofx_date(record.get("DTPOSTED")),
+                    "amount": amount,
+                    "transaction_type": transaction_type,
+                    "category": "",
+                    "note": record.get("NAME") or record.get("MEMO") or "",
+                }
+            except RowError as e:
+                yield number, e
+            record = None
+        elif record is not None and not closing and value:
+            record[tag] = value
+
+
+class CategoryCache:
+    """Resolves category names to ids, creating missing ones, without a query per row."""
+
+    def __init__(self, user):
+        self.user = user
+        self.ids = {
+            (name.casefold(), category_type): pk
+            for pk, name, category_type in Category.objects.filter(user=user).values_list(
+                "id", "name", "category_type"
+            )
+        }
+
+    def resolve(self, name, category_type):
+        if not name:
+            return None
+        key = (name.casefold(), category_type)
+        if key not in self.ids:
+            category = Category.objects.create(
+                user=self.user, name=name[:50], category_type=category_type
+            )
+            self.ids[key] = category.pk
+        return self.ids[key]
+
+
+def import_transactions(user, records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Write parsed records for `user` in batches, each batch in its own DB transaction.
+
+    Only one batch is held in memory at a time. `progress(result)` is called
+    after every batch, inside its DB transaction, so whatever it records
+    commits or rolls back together with the batch.
+    """
+    result = ImportResult()
+    categories = CategoryCache(user)
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        with transaction.atomic():
+            Transaction.objects.bulk_create(batch)
+            # bulk_create skips the save signals, so keep derived data in step here
+            rollups.record_bulk(batch)
+            ledger.post_bulk(user.pk, batch)
+            result.created += len(batch)
+            if progress:
+                progress(result)
+        caching.bump_version(user.pk)
+        batch.clear()
+
+    for line, record in records:
+        result.processed += 1
+        if isinstance(record, RowError):
+            result.reject(line, str(record))
+            continue
+
+        batch.append(Transaction(
+            user=user,
+            category_id=categories.resolve(record["category"], record["transaction_type"]),
+            transaction_type=record["transaction_type"],
+            amount=record["amount"],
+            date=record["date"],
+            note=record["note"],
+        ))
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    return result
@@ -0,0 +1,326 @@
+"""Background jobs stored in the database and run by the run_jobs worker.
+
+Handlers take the job and a `report(progress, total=None, message="", result=None)`
+callback and return a JSON-serializable result. Failed attempts are retried, so
+handlers are idempotent or resume from their reported progress.
+"""
+import io
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import exporters, importers, rollups
+from .models import Job
+
+logger = logging.getLogger("fintrack.jobs")
+
+# Jobs of one user running at the same time, further ones wait in the queue
+JOBS_PER_USER = getattr(settings, "JOBS_PER_USER", 1)
+
+# Worker threads per run_jobs process
+JOB_THREADS = getattr(settings, "JOB_THREADS", 4)
+
+# First retry delay in seconds, doubled on every further attempt
+RETRY_DELAY = getattr(settings, "JOB_RETRY_DELAY", 30)
+
+# A running job whose heartbeat is older than this many seconds has lost its worker
+STALE_AFTER = getattr(settings, "JOB_STALE_AFTER", 5 * 60)
+
+# Seconds between prune() runs of a worker
+PRUNE_INTERVAL = 60 * 60
+
+# Finished jobs, and the files of their exports, are deleted after this many days
+RETENTION_DAYS = getattr(settings, "JOB_RETENTION_DAYS", 7)
+
+# Uploaded statements and finished exports
+storage = FileSystemStorage(location=Path(getattr(settings, "JOB_FILES_DIR", settings.BASE_DIR / "job_files")))
+
+HANDLERS = {}
+FAILURE_HANDLERS = {}
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help, the job fails at once."""
+
+
+def handler(kind, on_failure=None):
+    """Register a handler for `kind`. `on_failure(job)` runs once the job has failed for good."""
+    def register(func):
+        HANDLERS[kind] = func
+        if on_failure:
+            FAILURE_HANDLERS[kind] = on_failure
+        return func
+    return register
+
+
+def _failed(job):
+    cleanup = FAILURE_HANDLERS.get(job.kind)
+    if cleanup:
+        try:
+            cleanup(job)
+        except Exception:
+            logger.exception("Cleanup of failed job %s failed", job.pk)
+
+
+def enqueue(kind, user=None, payload=None, max_attempts=3):
+    return Job.objects.create(kind=kind, user=user, payload=payload or {}, max_attempts=max_attempts)
+
+
+def claim(worker):
+    """Mark the oldest due job as running for `worker` and return it, None if there is none.
+
+    Jobs of users already at JOBS_PER_USER running jobs are skipped.
+    """
+    running = (
+        Job.objects.filter(user=OuterRef("user"), status="running")
+        .order_by()
+        .values("user")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status="queued", run_after__lte=now)
+            .alias(running=Coalesce(Subquery(running), 0))
+            .filter(Q(user=None) | Q(running__lt=JOBS_PER_USER))
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        Job.objects.filter(pk=job.pk).update(
+            status="running", worker=worker, attempts=F("attempts") + 1, heartbeat=now, started_at=now,
+        )
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale():
+    """Put running jobs whose worker stopped responding back in the queue, or fail them if out of attempts."""
+    now = timezone.now()
+    stale = Job.objects.filter(status="running", heartbeat__lt=now - timedelta(seconds=STALE_AFTER))
+    error = "The worker running this job stopped responding."
+    requeued = stale.filter(attempts__lt=F("max_attempts")).update(
+        status="queued", worker="", run_after=now, error=error,
+    )
+    failed = list(stale)
+    Job.objects.filter(pk__in=[job.pk for job in failed], status="running").update(
+        status="failed", finished_at=now, error=error,
+    )
+    for job in failed:
+        _failed(job)
+    return requeued + len(failed)
+
+
+def prune(days=None):
+    """Delete jobs finished more than `days` (RETENTION_DAYS) ago, with their files. Returns the number deleted."""
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS if days is None else days)
+    old = Job.objects.filter(status__in=("succeeded", "failed"), finished_at__lt=cutoff)
+    for job in old.only("kind", "payload", "result"):
+        for name in (job.payload.get("file"), (job.result or {}).get("file")):
+            if name:
+                storage.delete(name)
+    return old.delete()[0]
+
+
+def _reporter(job):
+    def report(progress, total=None, message="", result=None):
+        fields = {"progress": progress, "message": message[:255], "heartbeat": timezone.now()}
+        if total is not None:
+            fields["total"] = total
+        if result is not None:
+            fields["result"] = result
+        Job.objects.filter(pk=job.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(job, name, value)
+    return report
+
+
+def execute(job):
+    """Run a claimed job's handler and record its result, or schedule a retry after a failure."""
+    try:
+        result = HANDLERS[job.kind](job, _reporter(job))
+    except Exception as exc:
+        logger.exception("Job %s failed (attempt %s of %s)", job.pk, job.attempts, job.max_attempts)
+        now = timezone.now()
+        fields = {"error": f"{type(exc).__name__}: {exc}", "worker": ""}
+        if job.attempts < job.max_attempts and not isinstance(exc, PermanentError):
+            fields.update(status="queued", run_after=now + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1)))
+        else:
+            fields.update(status="failed", finished_at=now)
+    else:
+        fields = {"status": "succeeded", "result": result, "error": "", "finished_at": timezone.now()}
+    try:
+        Job.objects.filter(pk=job.pk).update(**fields)
+    except DatabaseError:
+        # Left running, requeue_stale picks it up once the heartbeat is old
+        logger.exception("Could not record the outcome of job %s", job.pk)
+        return job
+    for name, value in fields.items():
+        setattr(job, name, value)
+    if job.status == "failed":
+        _failed(job)
+    return job
+
+
+def run_next(worker="inline"):
+    """Claim one due job and run it in this thread. Returns the job, or None if nothing was due."""
+    job = claim(worker)
+    return execute(job) if job else None
+
+
+class Worker:
+    """Claims due jobs and runs them on a pool of `threads` threads until stopped."""
+
+    def __init__(self, threads=JOB_THREADS, poll_interval=1.0, name=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _run(self, job):
+        try:
+            execute(job)
+        finally:
+            # Pool threads would otherwise keep their connections open
+            connections.close_all()
+
+    def run(self, drain=False):
+        """Work until stop() is called, or with `drain`, until no job is due. Running jobs are finished first."""
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="fintrack-job") as pool:
+            running = {}
+            next_prune = time.monotonic()
+            while not self.stopping.is_set():
+                requeue_stale()
+                if time.monotonic() >= next_prune:
+                    prune()
+                    next_prune = time.monotonic() + PRUNE_INTERVAL
+                while len(running) < self.threads:
+                    job = claim(self.name)
+                    if job is None:
+                        break
+                    running[pool.submit(self._run, job)] = job.pk
+
+                if not running:
+                    if drain:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    future.result()
+                if running:
+                    Job.objects.filter(pk__in=running.values(), status="running").update(heartbeat=timezone.now())
+
+
+# Handlers
+
+def _delete_upload(job):
+    storage.delete(job.payload["file"])
+
+
+@handler("import", on_failure=_delete_upload)
+def import_statement(job, report):
+    """Payload: file (in `storage`), file_format (csv/ofx), date_format. A retry skips the records already imported."""
+    payload = job.payload
+    skip = job.progress
+    before = job.result or {"processed": 0, "created": 0, "rejected_count": 0, "rejected": []}
+
+    def summary(result):
+        return {
+            "processed": skip + result.processed,
+            "created": before["created"] + result.created,
+            "rejected_count": before["rejected_count"] + result.rejected_count,
+            "rejected": (before["rejected"] + [list(row) for row in result.rejected])[:importers.MAX_REJECTED_DETAILS],
+        }
+
+    def progress(result):
+        current = summary(result)
+        report(current["processed"], message=f"{current['created']} transaction(s) imported", result=current)
+
+    with storage.open(payload["file"], "rb") as raw:
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        if payload["file_format"] == "csv":
+            records = importers.parse_csv(stream, payload.get("date_format") or None)
+        else:
+            records = importers.parse_ofx(stream)
+        try:
+            result = importers.import_transactions(job.user, islice(records, skip, None), progress=progress)
+        except UnicodeDecodeError as exc:
+            raise PermanentError(f"The file is not UTF-8 text ({exc.reason}).") from exc
+    storage.delete(payload["file"])
+    return summary(result)
+
+
+EXPORTS = {
+    "transactions_csv": (exporters.transactions_csv, "transactions.csv", "text/csv"),
+    "transactions_json": (exporters.transactions_json, "transactions.json", "application/json"),
+    "account_json": (exporters.account_json, "fintrack-account.json", "application/json"),
+}
+
+# Exported rows between progress reports
+EXPORT_REPORT_EVERY = 10000
+
+
+def _export_file(job):
+    """(export function, stored name, download filename, content type) of an export job."""
+    func, filename, content_type = EXPORTS[job.payload["export"]]
+    if job.payload.get("gzip"):
+        filename += ".gz"
+        content_type = "application/gzip"
+    return func, f"exports/{job.pk}-{filename}", filename, content_type
+
+
+def _delete_partial_export(job):
+    storage.delete(_export_file(job)[1])
+
+
+@handler("export", on_failure=_delete_partial_export)
+def export(job, report):
+    """Payload: export (a key of EXPORTS), filters (start/end as ISO dates, category), gzip."""
+    payload = job.payload
+    func, name, filename, content_type = _export_file(job)
+    filters = dict(payload.get("filters", {}))
+    for key in ("start", "end"):
+        if filters.get(key):
+            filters[key] = date.fromisoformat(filters[key])
+
+    def counted(chunks):
+        for count, chunk in enumerate(chunks, 1):
+            if count % EXPORT_REPORT_EVERY == 0:
+                report(count, message=f"{count} row(s) written")
+            yield chunk
+
+    path = Path(storage.path(name))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as out:
+        for data in exporters.encode(counted(func(job.user, **filters)), payload.get("gzip")):
+            out.write(data)
+    return {"file": name, "filename": filename, "content_type": content_type, "size": path.stat().st_size}
+
+
+@handler("rebuild_rollups")
+def rebuild_rollups(job, report):
+    """Payload: user_ids (all users if missing). A user's own job only rebuilds their rollups."""
+    user_ids = [job.user_id] if job.user_id else job.payload.get("user_ids")
+    return {"rows": rollups.rebuild(user_ids)}
@@ -0,0 +1,142 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedTransaction, BalanceSnapshot, Debt, Goal, LedgerEntry, Transaction, UserProfile
+
+
+class InsufficientBalance(ValueError):
+    pass
+
+
+# How much each row adds to the user's balance
+
+def transaction_effect(transaction_type, amount):
+    return amount if transaction_type == "income" else -amount
+
+
+def debt_effect(debt_type, remaining_amount):
+    return remaining_amount if debt_type == "lent" else -remaining_amount
+
+
+def goal_effect(current_amount):
+    return -current_amount
+
+
+def post(user_id, amount, source, source_id=None, require_funds=False):
+    """Append a ledger entry and move the user's balance by `amount`.
+
+    With `require_funds`, a debit that would take the balance below zero raises InsufficientBalance.
+    """
+    amount = Decimal(amount)
+    if not amount:
+        return
+
+    with transaction.atomic():
+        profiles = UserProfile.objects.filter(user_id=user_id)
+        if require_funds and amount < 0:
+            profiles = profiles.filter(balance__gte=-amount)
+
+        if not profiles.update(balance=F("balance") + amount):
+            if require_funds and amount < 0:
+                raise InsufficientBalance("Not enough balance.")
+            # First write for a user without a profile yet
+            username = User.objects.filter(pk=user_id).values_list("username", flat=True).first()
+            UserProfile.objects.create(user_id=user_id, full_name=username or "", balance=amount)
+
+        LedgerEntry.objects.create(user_id=user_id, amount=amount, source=source, source_id=source_id)
+
+
+def post_bulk(user_id, transactions, source="import"):
+    """Ledger entries for many newly inserted transactions, with a single balance update."""
+    entries = [
+        LedgerEntry(
+            user_id=user_id,
+            amount=transaction_effect(t.transaction_type, Decimal(t.amount)),
+            source=source,
+            source_id=t.pk,
+        )
+        for t in transactions
+    ]
+    total = sum((entry.amount for entry in entries), Decimal("0"))
+
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create(entries)
+        if not UserProfile.objects.filter(user_id=user_id).update(balance=F("balance") + total):
+            username = User.objects.filter(pk=user_id).values_list("username", flat=True).first()
+            UserProfile.objects.create(user_id=user_id, full_name=username or "", balance=total)
+
+
+def balance(user_id):
+    """Current balance, a single-row lookup."""
+    value = UserProfile.objects.filter(user_id=user_id).values_list("balance", flat=True).first()
+    return value or Decimal("0")
+
+
+def balance_at(user_id, when):
+    """Balance as recorded at `when`: the latest snapshot before it plus the entries since."""
+    snapshot = (
+        BalanceSnapshot.objects.filter(user_id=user_id, as_of__lte=when)
+        .order_by("-as_of")
+        .first()
+    )
+    entries = LedgerEntry.objects.filter(user_id=user_id, created_at__lte=when)
+    start = Decimal("0")
+    if snapshot:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+        start = snapshot.balance
+    return start + (entries.aggregate(total=Sum("amount"))["total"] or 0)
+
+
+def take_snapshot(user_id):
+    """Record the user's balance at their latest ledger entry. Returns None if nothing changed."""
+    with transaction.atomic():
+        last = LedgerEntry.objects.filter(user_id=user_id).order_by("-id").values_list("id", flat=True).first()
+        previous = BalanceSnapshot.objects.filter(user_id=user_id).order_by("-as_of").first()
+        if last is None or (previous and previous.last_entry_id == last):
+            return None
+        return BalanceSnapshot.objects.create(
+            user_id=user_id,
+            as_of=timezone.now(),
+            last_entry_id=last,
+            balance=balance(user_id),
+        )
+
+
+def expected_balance(user_id):
+    """The balance recomputed from scratch: income - expense + lent - borrowed - goals."""
+    totals = {"income": 0, "expense": 0}
+    # Archived transactions still count, archiving leaves their ledger entries in place
+    for model in (Transaction, ArchivedTransaction):
+        sums = model.objects.filter(user_id=user_id).aggregate(
+            income=Sum("amount", filter=Q(transaction_type="income")),
+            expense=Sum("amount", filter=Q(transaction_type="expense")),
+        )
+        for name, total in sums.items():
+            # SQLite sums decimals as floats, round each part back to cents before adding them up
+            totals[name] += round(total or 0, 2)
+    debts = Debt.objects.filter(user_id=user_id).aggregate(
+        lent=Sum("remaining_amount", filter=Q(debt_type="lent")),
+        borrowed=Sum("remaining_amount", filter=Q(debt_type="borrowed")),
+    )
+    goals = Goal.objects.filter(user_id=user_id).aggregate(total=Sum("current_amount"))
+    return (
+        totals["income"] - totals["expense"]
+        + (debts["lent"] or 0) - (debts["borrowed"] or 0)
+        - (goals["total"] or 0)
+    )
+
+
+def reconcile(user_id, fix=True):
+    """Difference between the expected and the running balance, appended as an adjustment if `fix`."""
+    with transaction.atomic():
+        difference = expected_balance(user_id) - balance(user_id)
+        if difference and fix:
+            post(user_id, difference, "adjustment")
+    if difference and fix:
+        caching.bump_version(user_id)
+    return difference
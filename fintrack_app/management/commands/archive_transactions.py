@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import archive
+
+
+class Command(BaseCommand):
+    help = "Move old transactions into the archive table (safe to interrupt and rerun)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=archive.ARCHIVE_AFTER_DAYS,
+            help=f"Archive transactions dated more than this many days ago (default: {archive.ARCHIVE_AFTER_DAYS}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=archive.DEFAULT_BATCH_SIZE,
+                            help="Transactions per batch, each moved in its own DB transaction.")
+
+    def handle(self, *args, **options):
+        if options["older_than"] < 0:
+            raise CommandError("--older-than must not be negative.")
+
+        def progress(result):
+            self.stdout.write(f"{result.archived} transaction(s) archived in {result.batches} batch(es)")
+
+        result = archive.run(days=options["older_than"], batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result.archived} transaction(s) dated before {archive.cutoff(options['older_than']):%Y-%m-%d}."
+        ))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from fintrack_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compare dashboard latency and throughput through the WSGI and the ASGI handler under concurrent clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+        parser.add_argument("--transactions", type=int, default=10000, help="Transactions seeded for the user.")
+        parser.add_argument("--warm", action="store_true", help="Let the dashboard cache serve repeat requests.")
+        parser.add_argument("-o", "--output", help="Write the JSON results here.")
+
+    def handle(self, *args, **options):
+        results = benchmarks.serve_concurrency(
+            clients=options["clients"],
+            requests=options["requests"],
+            transactions=options["transactions"],
+            cold=not options["warm"],
+        )
+        for r in results["results"]:
+            self.stdout.write(
+                f"{r['mode']:<5} {r['requests_per_sec']:>8} req/s  median {r['median_ms']:>9} ms  "
+                f"p95 {r['p95_ms']:>9} ms  max {r['max_ms']:>9} ms"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,32 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from fintrack_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compare read throughput under concurrent writes with SQLite defaults vs SQLITE_PRAGMAS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per configuration.")
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--rows", type=int, default=100000, help="Rows loaded before the run.")
+        parser.add_argument("-o", "--output", help="Write the JSON results here.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for label, pragmas in (("default", None), ("tuned", {"journal_mode": "WAL", **settings.SQLITE_PRAGMAS})):
+            result = benchmarks.sqlite_concurrency(
+                pragmas, duration=options["duration"], readers=options["readers"], rows=options["rows"]
+            )
+            results[label] = result
+            self.stdout.write(
+                f"{label:<8} reads/s {result['reads_per_sec']:>10}  "
+                f"writes/s {result['writes_per_sec']:>10}  errors {result['errors']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
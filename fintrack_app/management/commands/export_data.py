@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from fintrack_app import exporters
+
+
+class Command(BaseCommand):
+    help = "Stream a user's transactions (CSV/JSON) or full account (JSON) to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--account", action="store_true", help="Export budgets, debts and goals too (JSON).")
+        parser.add_argument("--format", choices=["csv", "json"], default="csv")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--start", type=parse_date, help="YYYY-MM-DD, inclusive.")
+        parser.add_argument("--end", type=parse_date, help="YYYY-MM-DD, inclusive.")
+        parser.add_argument("--category", type=int, help="Category id.")
+        parser.add_argument("-o", "--output", help="Output path (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        filters = {name: options[name] for name in ("start", "end", "category")}
+        if options["account"]:
+            chunks = exporters.account_json(user, **filters)
+        elif options["format"] == "json":
+            chunks = exporters.transactions_json(user, **filters)
+        else:
+            chunks = exporters.transactions_csv(user, **filters)
+
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for data in exporters.encode(chunks, compress=options["gzip"]):
+                output.write(data)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
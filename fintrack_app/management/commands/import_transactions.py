@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import importers
+
+
+class Command(BaseCommand):
+    help = "Import a CSV or OFX bank statement into a user's transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ofx"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=importers.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--date-format", help="strptime format of CSV dates (default: ISO 8601).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "ofx"):
+            raise CommandError("Cannot tell the file format, pass --format.")
+
+        imported = 0
+
+        def progress(result):
+            nonlocal imported
+            imported = result.created
+            self.stdout.write(
+                f"{result.processed} rows read, {result.created} imported, {result.rejected_count} rejected"
+            )
+
+        try:
+            with path.open(encoding="utf-8-sig", newline="") as stream:
+                if file_format == "csv":
+                    records = importers.parse_csv(stream, options["date_format"])
+                else:
+                    records = importers.parse_ofx(stream)
+                result = importers.import_transactions(
+                    user, records, batch_size=options["batch_size"], progress=progress
+                )
+        except UnicodeDecodeError as exc:
+            raise CommandError(
+                f"The file is not UTF-8 text ({exc.reason}), {imported} transaction(s) were already imported."
+            )
+        except ValueError as exc:
+            raise CommandError(f"Cannot read the file ({exc}), {imported} transaction(s) were already imported.")
+
+        for line, reason in result.rejected:
+            self.stderr.write(f"Rejected row {line}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} transaction(s), rejected {result.rejected_count}."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import jobs, rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify with --check) the monthly rollups from raw transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only this user id (repeatable).")
+        parser.add_argument("--check", action="store_true", help="Report mismatches instead of rebuilding.")
+        parser.add_argument("--queue", action="store_true", help="Leave the rebuild to the run_jobs worker.")
+
+    def handle(self, *args, **options):
+        users = options["users"]
+
+        if options["check"]:
+            mismatches = rollups.check(users)
+            for (user_id, month, category_id, transaction_type), expected, actual in mismatches:
+                self.stdout.write(
+                    f"user={user_id} month={month:%Y-%m} category={category_id} type={transaction_type}: "
+                    f"expected {expected}, stored {actual}"
+                )
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollup bucket(s) out of date.")
+            self.stdout.write(self.style.SUCCESS("Rollups are up to date."))
+            return
+
+        if options["queue"]:
+            job = jobs.enqueue("rebuild_rollups", payload={"user_ids": users})
+            self.stdout.write(self.style.SUCCESS(f"Queued rollup rebuild as job {job.pk}."))
+            return
+
+        written = rollups.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup row(s)."))
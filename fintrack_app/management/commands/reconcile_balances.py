@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import ledger
+
+
+class Command(BaseCommand):
+    help = "Compare ledger balances with balances recomputed from transactions, debts and goals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Append an adjustment entry for each difference.")
+
+    def handle(self, *args, **options):
+        off = 0
+        for user_id, username in User.objects.values_list("id", "username").iterator():
+            difference = ledger.reconcile(user_id, fix=options["fix"])
+            if difference:
+                off += 1
+                self.stdout.write(f"{username}: ledger off by {difference}")
+
+        if off and not options["fix"]:
+            raise CommandError(f"{off} balance(s) out of step, rerun with --fix to adjust.")
+        self.stdout.write(self.style.SUCCESS("Balances reconciled."))
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from fintrack_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Time the dashboard, list views and aggregate queries at several data sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Comma separated transaction counts (default: 1000,10000,100000).")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--budget-months", type=int, help="Budget months per user (default: 36).")
+        parser.add_argument("--only", action="append", help="Run only this benchmark (repeatable).")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data instead of rolling it back.")
+        parser.add_argument("-o", "--output", help="Write the JSON results here.")
+        parser.add_argument("--compare", help="A previous JSON result to compare medians against.")
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(
+                f"{result['name']:<36} {result['size']:>9} rows  "
+                f"median {result['median_ms']:>9.2f} ms  {result['queries']:>3} queries"
+            )
+
+        results = benchmarks.run(
+            sizes=[int(size) for size in options["sizes"].split(",")],
+            repeat=options["repeat"],
+            categories=options["categories"],
+            names=options["only"],
+            keep=options["keep"],
+            progress=progress,
+            budget_months=options["budget_months"],
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["compare"]:
+            self.stdout.write("")
+            for name, size, old, new, change in benchmarks.compare(benchmarks.load(options["compare"]), results):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS
+                self.stdout.write(style(f"{name:<36} {size:>9} rows  {old:>9.2f} -> {new:>9.2f} ms ({change:+.1f}%)"))
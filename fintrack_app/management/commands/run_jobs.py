@@ -0,0 +1,34 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import caching, jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (imports, exports, rollup rebuilds) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=jobs.JOB_THREADS, help="Jobs run at the same time.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue checks.")
+        parser.add_argument("--drain", action="store_true", help="Exit once no job is due instead of waiting.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1:
+            raise CommandError("--threads must be at least 1.")
+        if not caching.is_shared():
+            raise CommandError(
+                "The default cache is local to this process, so the web workers would keep serving data "
+                "cached before this worker's writes. Configure a cache shared between processes."
+            )
+        worker = jobs.Worker(threads=options["threads"], poll_interval=options["poll_interval"])
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping after the running jobs finish...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f"Worker {worker.name} running with {worker.threads} thread(s).")
+        worker.run(drain=options["drain"])
+        self.stdout.write(self.style.SUCCESS("Worker stopped."))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fintrack_app import recurring
+
+
+class Command(BaseCommand):
+    help = "Create every due occurrence of recurring transactions (safe to rerun, run e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--until", help="Create occurrences up to this ISO date (default: today).")
+        parser.add_argument("--batch-size", type=int, default=recurring.DEFAULT_BATCH_SIZE, help="Rules per batch.")
+
+    def handle(self, *args, **options):
+        until = None
+        if options["until"]:
+            try:
+                until = date.fromisoformat(options["until"])
+            except ValueError:
+                raise CommandError(f"Invalid date {options['until']!r}.")
+
+        def progress(result):
+            self.stdout.write(f"{result.rules} rule(s) processed, {result.created} occurrence(s) created")
+
+        result = recurring.run(until=until, batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} occurrence(s) from {result.rules} due rule(s)."
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from fintrack_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Generate realistic synthetic users, categories and transactions with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--categories", type=int, default=10, help="Categories per user.")
+        parser.add_argument("--transactions", type=int, default=10000, help="Transactions per user.")
+        parser.add_argument("--years", type=int, default=3, help="How far back transaction dates go.")
+        parser.add_argument("--budget-months", type=int, help="Budget months per user (default: one per month of --years).")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--seed", type=int, help="Random seed, for repeatable data.")
+
+    def handle(self, *args, **options):
+        def progress(user, written):
+            self.stdout.write(f"{user.username}: {written} transactions")
+
+        user_ids = benchmarks.seed(
+            users=options["users"],
+            categories=options["categories"],
+            transactions=options["transactions"],
+            years=options["years"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            progress=progress,
+            budget_months=options["budget_months"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {len(user_ids)} user(s): ids {user_ids}"))
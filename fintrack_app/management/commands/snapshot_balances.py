@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from fintrack_app import ledger
+
+
+class Command(BaseCommand):
+    help = "Snapshot every user's ledger balance (run periodically) to keep point-in-time lookups short."
+
+    def handle(self, *args, **options):
+        taken = 0
+        for user_id in User.objects.values_list("id", flat=True).iterator():
+            if ledger.take_snapshot(user_id):
+                taken += 1
+        self.stdout.write(self.style.SUCCESS(f"Took {taken} snapshot(s)."))
@@ -0,0 +1,271 @@
+import cProfile
+import json
+import logging
+import mimetypes
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+logger = logging.getLogger("fintrack.performance")
+
+# Metrics of the request being handled, read by the template backend
+current_metrics = ContextVar("fintrack_request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # Async views may run queries on several threads at once
+        self.lock = threading.Lock()
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+
+
+class PerformanceMiddleware:
+    """SQL count/time, template time and view time per request.
+
+    Sent as a Server-Timing header and logged as one JSON line on the
+    "fintrack.performance" logger. Requests can be sampled for cProfile and
+    dumped when they take longer than PERFORMANCE_PROFILE_THRESHOLD_MS.
+    With PERFORMANCE_METRICS off the middleware unloads itself at startup.
+    Works in both sync and async stacks, so async views under ASGI are not
+    pushed back onto a thread by this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERFORMANCE_METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PERFORMANCE_PROFILE_SAMPLE_RATE", 0)
+        self.threshold = getattr(settings, "PERFORMANCE_PROFILE_THRESHOLD_MS", 500)
+        self.profile_dir = Path(getattr(settings, "PERFORMANCE_PROFILE_DIR", "profiles"))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _profiler(self):
+        return cProfile.Profile() if self.sample_rate and random.random() < self.sample_rate else None
+
+    @staticmethod
+    def _wrap_connections(stack, metrics):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(metrics.sql_wrapper))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        profiler = self._profiler()
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self._wrap_connections(stack, metrics)
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, profiler, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        profiler = self._profiler()
+
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            # Connections are per thread: wrap the ones the async ORM will use
+            await sync_to_async(self._wrap_connections)(stack, metrics)
+            if profiler:
+                profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+                await sync_to_async(stack.close)()
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, profiler, start)
+
+    def finish(self, request, response, metrics, profiler, start):
+        total = (time.perf_counter() - start) * 1000
+
+        db = metrics.db_time * 1000
+        template = metrics.template_time * 1000
+        # Parallel queries can add up to more than the wall time
+        view = max(total - db - template, 0)
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={db:.2f};desc="{metrics.queries} queries"',
+            f"tpl;dur={template:.2f}",
+            f"view;dur={view:.2f}",
+            f"total;dur={total:.2f}",
+        ])
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": metrics.queries,
+                "db_ms": round(db, 2),
+                "template_ms": round(template, 2),
+                "view_ms": round(view, 2),
+                "total_ms": round(total, 2),
+            }))
+
+        if profiler and total >= self.threshold:
+            self.dump_profile(profiler, request)
+        return response
+
+    def dump_profile(self, profiler, request):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+        path = self.profile_dir / f"{int(time.time() * 1000)}-{request.method}-{slug}.prof"
+        profiler.dump_stats(path)
+        logger.warning("Slow request profiled to %s", path)
+
+
+class StaticFile:
+    def __init__(self, path, content_type, immutable):
+        self.path = path
+        self.content_type = content_type
+        self.immutable = immutable
+        self.last_modified = path.stat().st_mtime
+        # Precompressed variants by content coding, best first
+        self.variants = {
+            coding: path.with_name(path.name + suffix)
+            for coding, suffix in (("br", ".br"), ("gzip", ".gz"))
+            if path.with_name(path.name + suffix).exists()
+        }
+
+
+class StaticFilesMiddleware:
+    """Serves collected files from STATIC_ROOT, without going through a view.
+
+    Hashed names from the static manifest (see fintrack_app/staticfiles.py)
+    are sent with a one year, immutable Cache-Control; plain names, which can
+    change in place, are cached for STATIC_MAX_AGE seconds and revalidated
+    with If-Modified-Since. A .br or .gz variant is sent instead of the file
+    when the client accepts that Content-Encoding. STATIC_ROOT is indexed
+    once at startup, so restart after collectstatic. Without collected files
+    the middleware unloads itself, and in DEBUG runserver serves
+    STATICFILES_DIRS as usual.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        root = getattr(settings, "STATIC_ROOT", None)
+        if not root or not Path(root).is_dir():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.max_age = getattr(settings, "STATIC_MAX_AGE", 60)
+        self.files = self._index(Path(root))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _index(self, root):
+        hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        files = {}
+        for path in root.rglob("*"):
+            if not path.is_file() or path.suffix in (".gz", ".br"):
+                continue
+            name = path.relative_to(root).as_posix()
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            files[self.prefix + name] = StaticFile(path, content_type, name in hashed)
+        return files
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """The response for a request of a collected file, None for anything else."""
+        if request.method not in ("GET", "HEAD"):
+            return None
+        file = self.files.get(request.path_info)
+        if file is None:
+            return None
+
+        if file.immutable:
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = f"public, max-age={self.max_age}"
+            if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), file.last_modified):
+                response = HttpResponseNotModified()
+                response["Cache-Control"] = cache_control
+                return response
+
+        path, coding = file.path, None
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        for candidate, variant in file.variants.items():
+            if candidate in accepted or "*" in accepted:
+                path, coding = variant, candidate
+                break
+
+        response = FileResponse(path.open("rb"), content_type=file.content_type)
+        # Named after the file actually opened, which may be the .gz
+        del response["Content-Disposition"]
+        response["Cache-Control"] = cache_control
+        response["Last-Modified"] = http_date(file.last_modified)
+        if file.variants:
+            response["Vary"] = "Accept-Encoding"
+        if coding:
+            response["Content-Encoding"] = coding
+        return response
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q above 0)."""
+    accepted = set()
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('fintrack_app', 'Transaction')
+    MonthlySummary = apps.get_model('fintrack_app', 'MonthlySummary')
+
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('user_id', 'month', 'category_id', 'transaction_type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    MonthlySummary.objects.bulk_create([MonthlySummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0003_userprofile_balance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='fintrack_app.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category', 'transaction_type'), name='unique_monthly_summary'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month', 'transaction_type'), name='unique_monthly_summary_uncategorized')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0004_monthlysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', '-month', 'id'], name='budget_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['user', 'name', 'id'], name='category_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['user', '-start_date', 'id'], name='debt_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', '-created_at', 'id'], name='goal_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', 'id'], name='transaction_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0005_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'month', 'monthly_limit'], name='budget_user_month_limit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['user', 'debt_type', 'remaining_amount'], name='debt_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_type', 'date', 'amount'], name='transaction_user_type_date_idx'),
+        ),
+    ]
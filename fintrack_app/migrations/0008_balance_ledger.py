@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def open_ledgers(apps, schema_editor):
+    # Start every user's ledger at the balance the dashboard used to compute
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('fintrack_app', 'UserProfile')
+    Transaction = apps.get_model('fintrack_app', 'Transaction')
+    Debt = apps.get_model('fintrack_app', 'Debt')
+    Goal = apps.get_model('fintrack_app', 'Goal')
+    LedgerEntry = apps.get_model('fintrack_app', 'LedgerEntry')
+
+    for user in User.objects.all().iterator():
+        totals = Transaction.objects.filter(user=user).aggregate(
+            income=Sum('amount', filter=Q(transaction_type='income')),
+            expense=Sum('amount', filter=Q(transaction_type='expense')),
+        )
+        debts = Debt.objects.filter(user=user).aggregate(
+            lent=Sum('remaining_amount', filter=Q(debt_type='lent')),
+            borrowed=Sum('remaining_amount', filter=Q(debt_type='borrowed')),
+        )
+        goals = Goal.objects.filter(user=user).aggregate(total=Sum('current_amount'))
+        balance = (
+            (totals['income'] or 0) - (totals['expense'] or 0)
+            + (debts['lent'] or 0) - (debts['borrowed'] or 0)
+            - (goals['total'] or 0)
+        )
+
+        profile, _ = UserProfile.objects.get_or_create(user=user, defaults={'full_name': user.username})
+        profile.balance = balance
+        profile.save(update_fields=['balance'])
+        if balance:
+            LedgerEntry.objects.create(user=user, amount=balance, source='opening')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0007_transaction_date_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('last_entry_id', models.PositiveIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'as_of'], name='snapshot_user_as_of_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('source', models.CharField(choices=[('opening', 'Opening Balance'), ('transaction', 'Transaction'), ('debt', 'Debt'), ('goal', 'Goal'), ('import', 'Import'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('source_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='ledger_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0008_balance_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', 'id', 'transaction_type', 'category', 'amount'], name='transaction_user_date_idx'),
+        ),
+    ]
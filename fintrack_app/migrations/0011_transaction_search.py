@@ -0,0 +1,86 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:14
+
+import django.db.models.deletion
+import fintrack_app.models
+from django.db import migrations, models
+
+
+# The search index as it was at this migration, fintrack_app.search keeps it up to date afterwards
+CATEGORY_NAME = "coalesce((SELECT name FROM fintrack_app_category WHERE id = new.category_id), '')"
+
+CREATE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transaction_search USING fts5("
+    "note, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS transaction_search_insert AFTER INSERT ON fintrack_app_transaction
+    BEGIN
+        INSERT INTO transaction_search (rowid, note, category) VALUES (new.id, new.note, {CATEGORY_NAME});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS transaction_search_update AFTER UPDATE OF note, category_id
+    ON fintrack_app_transaction
+    WHEN old.note IS NOT new.note OR old.category_id IS NOT new.category_id
+    BEGIN
+        UPDATE transaction_search SET note = new.note, category = {CATEGORY_NAME} WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_delete AFTER DELETE ON fintrack_app_transaction
+    BEGIN
+        DELETE FROM transaction_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_category_rename AFTER UPDATE OF name
+    ON fintrack_app_category
+    WHEN old.name IS NOT new.name
+    BEGIN
+        UPDATE transaction_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM fintrack_app_transaction WHERE category_id = new.id);
+    END""",
+    "DELETE FROM transaction_search",
+    """INSERT INTO transaction_search (rowid, note, category)
+    SELECT t.id, t.note, coalesce(c.name, '')
+    FROM fintrack_app_transaction t LEFT JOIN fintrack_app_category c ON c.id = t.category_id""",
+    "INSERT INTO transaction_search (transaction_search) VALUES ('optimize')",
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER IF EXISTS transaction_search_insert",
+    "DROP TRIGGER IF EXISTS transaction_search_update",
+    "DROP TRIGGER IF EXISTS transaction_search_delete",
+    "DROP TRIGGER IF EXISTS transaction_search_category_rename",
+    "DROP TABLE IF EXISTS transaction_search",
+]
+
+
+def build_index(apps, schema_editor):
+    # Creates the FTS5 table and triggers, and indexes the existing transactions
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in CREATE_INDEX:
+            schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in DROP_INDEX:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0010_recurring_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='fintrack_app.transaction')),
+                ('document', fintrack_app.models.SearchDocumentField(db_column='transaction_search')),
+                ('note', models.TextField()),
+                ('category', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'transaction_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The archive's search triggers as they were at this migration
+CATEGORY_NAME = "coalesce((SELECT name FROM fintrack_app_category WHERE id = new.category_id), '')"
+
+ARCHIVE_TRIGGERS = {
+    "archive_search_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_insert AFTER INSERT ON fintrack_app_archivedtransaction
+        BEGIN
+            INSERT INTO transaction_search (rowid, note, category) VALUES (new.id, new.note, {CATEGORY_NAME});
+        END""",
+    "archive_search_update": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_update AFTER UPDATE OF note, category_id
+        ON fintrack_app_archivedtransaction
+        WHEN old.note IS NOT new.note OR old.category_id IS NOT new.category_id
+        BEGIN
+            UPDATE transaction_search SET note = new.note, category = {CATEGORY_NAME} WHERE rowid = new.id;
+        END""",
+    "archive_search_delete": """
+        CREATE TRIGGER IF NOT EXISTS archive_search_delete AFTER DELETE ON fintrack_app_archivedtransaction
+        BEGIN
+            DELETE FROM transaction_search WHERE rowid = old.id;
+        END""",
+    "archive_search_category_rename": """
+        CREATE TRIGGER IF NOT EXISTS archive_search_category_rename AFTER UPDATE OF name
+        ON fintrack_app_category
+        WHEN old.name IS NOT new.name
+        BEGIN
+            UPDATE transaction_search SET category = new.name
+            WHERE rowid IN (SELECT id FROM fintrack_app_archivedtransaction WHERE category_id = new.id);
+        END""",
+}
+
+
+def index_archive(apps, schema_editor):
+    # Adds the archive's search triggers, the archive starts out empty
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in ARCHIVE_TRIGGERS.values():
+            schema_editor.execute(sql)
+
+
+def unindex_archive(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for name in ARCHIVE_TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(
+            "DELETE FROM transaction_search WHERE rowid IN (SELECT id FROM fintrack_app_archivedtransaction)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0011_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date', models.DateTimeField()),
+                ('note', models.TextField(blank=True)),
+                ('occurrence_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='fintrack_app.category')),
+                ('recurring', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='fintrack_app.recurringtransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['user', '-date', 'id'], name='archived_user_date_idx')],
+            },
+        ),
+        migrations.RunPython(index_archive, unindex_archive),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:20
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # New users get their profile from a post_save signal, backfill the ones created before it
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('fintrack_app', 'UserProfile')
+
+    UserProfile.objects.bulk_create([
+        UserProfile(user_id=pk, full_name=username)
+        for pk, username in User.objects.filter(userprofile=None).values_list('pk', 'username')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintrack_app', '0013_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # Persistent in the database file, so set once here rather than on every connection
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=WAL')
+
+
+def disable_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    # journal_mode cannot change inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('fintrack_app', '0014_create_missing_profiles'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, disable_wal),
+    ]
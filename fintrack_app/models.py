@@ -1,10 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save
 from django.db.models import Sum
 from django.dispatch import receiver
+from django.utils import timezone
 
 class TimeStampModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -29,6 +30,12 @@ class Category(TimeStampModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
     category_type = models.CharField(max_length=10, choices=CATEGORY_TYPE)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the category list
+            models.Index(fields=["user", "name", "id"], name="category_user_name_idx"),
+        ]
    
     def __str__(self):
         return f"{self.name} ({self.get_category_type_display()})"
@@ -43,15 +50,158 @@ class Transaction(TimeStampModel):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPE)
     amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0.01)])
-    date = models.DateTimeField(auto_now_add=True)
+    date = models.DateTimeField(default=timezone.now)
+    note = models.TextField(blank=True)
+    # Set on occurrences created by the recurring scheduler (see recurring.py)
+    recurring = models.ForeignKey("RecurringTransaction", on_delete=models.SET_NULL, null=True, blank=True)
+    occurrence_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            # Each scheduled date of a rule is materialized at most once
+            models.UniqueConstraint(fields=["recurring", "occurrence_date"], name="unique_recurring_occurrence"),
+        ]
+        indexes = [
+            # Keyset pagination of the transaction list, covering for analytics
+            models.Index(
+                fields=["user", "-date", "id", "transaction_type", "category", "amount"],
+                name="transaction_user_date_idx",
+            ),
+            # Per-type sums over a date range, amount included so the table is never touched
+            models.Index(fields=["user", "transaction_type", "date", "amount"], name="transaction_user_type_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Together with the rollup and ledger writes of the save signals
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.amount} ({self.get_transaction_type_display()})"
+
+class SearchDocumentField(models.TextField):
+    """FTS5's hidden column named after its table, the left-hand side of a whole-row MATCH."""
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", (*lhs_params, *rhs_params)
+
+
+class TransactionSearch(models.Model):
+    """The FTS5 index over transaction notes and category names, kept in step by triggers (see search.py)."""
+    transaction = models.OneToOneField(
+        Transaction, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING, related_name="search"
+    )
+    document = SearchDocumentField(db_column="transaction_search")
+    note = models.TextField()
+    category = models.TextField()
+    # bm25 score, lower is a better match. Only available in a query filtering on document__match
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "transaction_search"
+
+class ArchivedTransaction(models.Model):
+    """A transaction moved out of the hot table by archive_transactions (see archive.py). Read-only.
+
+    Rows keep their id and timestamps. Their amounts stay in the monthly
+    rollups and the balance ledger, which are not touched by archiving.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    date = models.DateTimeField()
     note = models.TextField(blank=True)
+    recurring = models.ForeignKey("RecurringTransaction", on_delete=models.SET_NULL, null=True, blank=True)
+    occurrence_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["user", "-date", "id"], name="archived_user_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.amount} ({self.get_transaction_type_display()})"
 
+class RecurringTransaction(TimeStampModel):
+    """A transaction repeated on a schedule, materialized by the run_recurring command."""
+    FREQUENCY = (
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+        ("monthly", "Monthly"),
+        ("yearly", "Yearly"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0.01)])
+    note = models.TextField(blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY, default="monthly")
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    # First occurrence not created yet, the scheduler only looks at rules where this is due
+    next_date = models.DateField(blank=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["next_date"]
+        indexes = [
+            models.Index(fields=["active", "next_date", "id"], name="recurring_due_idx"),
+            models.Index(fields=["user", "next_date"], name="recurring_user_next_idx"),
+        ]
+
+    def clean(self):
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError({"end_date": "End date cannot be before the start date."})
+
+    def save(self, *args, **kwargs):
+        if self.next_date is None:
+            self.next_date = self.start_date
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.amount} {self.get_frequency_display().lower()} ({self.get_transaction_type_display()})"
+
+class MonthlySummary(models.Model):
+    """Per-user totals for one month, category and transaction type (maintained by rollups.py)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month", "category", "transaction_type"],
+                name="unique_monthly_summary",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "month", "transaction_type"],
+                condition=models.Q(category__isnull=True),
+                name="unique_monthly_summary_uncategorized",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month.strftime('%B %Y')} {self.transaction_type}: {self.total}"
+
 class Budget(TimeStampModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     monthly_limit = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0.01)])
@@ -59,9 +209,23 @@ class Budget(TimeStampModel):
 
     class Meta:
         ordering = ["-month"]
+        indexes = [
+            models.Index(fields=["user", "-month", "id"], name="budget_user_month_idx"),
+            # Monthly limit lookups by month range
+            models.Index(fields=["user", "month", "monthly_limit"], name="budget_user_month_limit_idx"),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.month.strftime('%B %Y')}"
+
+    # remaining and percent_used need `spent`, annotated by rollups.with_budget_actuals()
+    @property
+    def remaining(self):
+        return self.monthly_limit - self.spent
+
+    @property
+    def percent_used(self):
+        return self.spent * 100 / self.monthly_limit if self.monthly_limit else 0
  
 class Debt(TimeStampModel):
     DEBT_TYPE = (
@@ -79,6 +243,15 @@ class Debt(TimeStampModel):
 
     class Meta:
         ordering = ["-start_date"]
+        indexes = [
+            models.Index(fields=["user", "-start_date", "id"], name="debt_user_start_idx"),
+            # Borrowed / lent totals
+            models.Index(fields=["user", "debt_type", "remaining_amount"], name="debt_user_type_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} : {self.remaining_amount}"
@@ -99,6 +272,9 @@ class Goal(TimeStampModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "id"], name="goal_user_created_idx"),
+        ]
 
     def clean(self):
         if self.current_amount > self.target_amount:
@@ -106,6 +282,95 @@ class Goal(TimeStampModel):
                 "Current amount cannot exceed target amount."
             })
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.title} ({self.current_amount}/{self.target_amount})"
-    
\ No newline at end of file
+
+class LedgerEntry(models.Model):
+    """Append-only record of every change to a user's balance (see ledger.py)."""
+    SOURCE = (
+        ("opening", "Opening Balance"),
+        ("transaction", "Transaction"),
+        ("debt", "Debt"),
+        ("goal", "Goal"),
+        ("import", "Import"),
+        ("recurring", "Recurring"),
+        ("adjustment", "Adjustment"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    source = models.CharField(max_length=20, choices=SOURCE)
+    source_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="ledger_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.amount:+} ({self.get_source_display()})"
+
+class BalanceSnapshot(models.Model):
+    """A user's balance as of a ledger entry, so point-in-time lookups only sum the tail."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    as_of = models.DateTimeField()
+    last_entry_id = models.PositiveIntegerField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "as_of"], name="snapshot_user_as_of_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.balance} @ {self.as_of}"
+    
+class Job(TimeStampModel):
+    """Background work run by the run_jobs worker (see jobs.py)."""
+    KIND = (
+        ("import", "Import"),
+        ("export", "Export"),
+        ("rebuild_rollups", "Rollup Rebuild"),
+    )
+    STATUS = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+
+    # None for maintenance jobs
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after", "id"], name="job_queue_idx"),
+            models.Index(fields=["user", "status"], name="job_user_status_idx"),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,113 @@
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
+
+TOKEN_SALT = "fintrack.pagination"
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_token is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """Paginates on a unique ordering, e.g. ("-date", "id"), with signed tokens of the edge rows."""
+
+    def __init__(self, queryset, ordering, page_size):
+        self.queryset = queryset
+        self.ordering = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+        self.page_size = page_size
+        self.model_fields = [queryset.model._meta.get_field(name) for name, _ in self.ordering]
+
+    def _order_by(self, reverse):
+        return [
+            f"-{name}" if desc != reverse else name
+            for name, desc in self.ordering
+        ]
+
+    def _beyond(self, values, reverse):
+        condition = None
+        equal = Q()
+        for (name, desc), value in zip(self.ordering, values):
+            lookup = "lt" if desc != reverse else "gt"
+            step = equal & Q(**{f"{name}__{lookup}": value})
+            condition = step if condition is None else condition | step
+            equal &= Q(**{name: value})
+
+        # Lets the index be range-scanned
+        name, desc = self.ordering[0]
+        bound = Q(**{f"{name}__{'lte' if desc != reverse else 'gte'}": values[0]})
+        return bound & condition
+
+    def encode(self, obj):
+        return signing.dumps(
+            [field.value_to_string(obj) for field in self.model_fields],
+            salt=TOKEN_SALT,
+        )
+
+    def decode(self, token):
+        try:
+            raw = signing.loads(token, salt=TOKEN_SALT)
+            if len(raw) != len(self.model_fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.model_fields, raw)]
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404("Invalid page token.")
+
+    def page(self, after=None, before=None):
+        reverse = bool(before)
+        queryset = self.queryset.order_by(*self._order_by(reverse))
+
+        token = before or after
+        if token:
+            queryset = queryset.filter(self._beyond(self.decode(token), reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(after)
+
+        if not rows:
+            return KeysetPage([])
+
+        return KeysetPage(
+            rows,
+            next_token=self.encode(rows[-1]) if has_next else None,
+            previous_token=self.encode(rows[0]) if has_previous else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """ListView mixin: paginate with opaque ?after= / ?before= tokens."""
+    page_size = 25
+    keyset_ordering = ("-id",)
+
+    def get_context_data(self, **kwargs):
+        paginator = KeysetPaginator(self.object_list, self.keyset_ordering, self.page_size)
+        page = paginator.page(
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        kwargs["object_list"] = page.object_list
+        context = super().get_context_data(**kwargs)
+        context["page"] = page
+        return context
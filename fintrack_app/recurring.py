@@ -0,0 +1,152 @@
+"""Materializes due occurrences of recurring transactions in batches.
+
+Every created Transaction carries its rule and scheduled date, which are
+unique together, and a rule's next_date moves forward in the same DB
+transaction as its occurrences are inserted. Rerunning, or catching up after
+the scheduler was down, therefore only creates the dates that are missing.
+"""
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import caching, ledger, rollups
+from .models import RecurringTransaction, Transaction
+
+logger = logging.getLogger("fintrack.recurring")
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class ScheduleResult:
+    rules: int = 0
+    created: int = 0
+
+
+def _add_months(day, months, anchor_day):
+    # Monthly rules keep their day of month, clamped in shorter months (Jan 31, Feb 28, Mar 31)
+    months += day.year * 12 + day.month - 1
+    year, month = divmod(months, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, day):
+    if rule.frequency == "daily":
+        return day + timedelta(days=rule.interval)
+    if rule.frequency == "weekly":
+        return day + timedelta(weeks=rule.interval)
+    months = rule.interval * (12 if rule.frequency == "yearly" else 1)
+    return _add_months(day, months, rule.start_date.day)
+
+
+def due_dates(rule, until):
+    """Scheduled dates from the rule's next_date up to `until` (inclusive), and the next one after them."""
+    last = min(until, rule.end_date) if rule.end_date else until
+    dates = []
+    day = rule.next_date
+    while day <= last:
+        dates.append(day)
+        day = next_occurrence(rule, day)
+    return dates, day
+
+
+def _occurrence_datetime(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _materialize(rules, until):
+    """Create the due occurrences of one batch of rules, returns how many were created."""
+    existing = set(
+        Transaction.objects.filter(
+            recurring_id__in=[rule.pk for rule in rules],
+            occurrence_date__gte=min(rule.next_date for rule in rules),
+        ).values_list("recurring_id", "occurrence_date")
+    )
+
+    created = []
+    for rule in rules:
+        dates, rule.next_date = due_dates(rule, until)
+        if rule.end_date and rule.next_date > rule.end_date:
+            rule.active = False
+        created.extend(
+            Transaction(
+                user_id=rule.user_id,
+                category_id=rule.category_id,
+                transaction_type=rule.transaction_type,
+                amount=rule.amount,
+                date=_occurrence_datetime(day),
+                note=rule.note,
+                recurring=rule,
+                occurrence_date=day,
+            )
+            for day in dates
+            if (rule.pk, day) not in existing
+        )
+
+    by_user = {}
+    for t in created:
+        by_user.setdefault(t.user_id, []).append(t)
+    # One UPDATE per date rather than bulk_update's CASE over every rule
+    moved = {}
+    for rule in rules:
+        moved.setdefault((rule.next_date, rule.active), []).append(rule.pk)
+
+    with transaction.atomic():
+        # A run overlapping this one fails here on unique_recurring_occurrence instead of duplicating,
+        # see _materialize_each
+        Transaction.objects.bulk_create(created)
+        for (next_date, active), pks in moved.items():
+            RecurringTransaction.objects.filter(pk__in=pks).update(next_date=next_date, active=active)
+        rollups.record_bulk(created)
+        for user_id, transactions in by_user.items():
+            ledger.post_bulk(user_id, transactions, source="recurring")
+
+    for user_id in by_user:
+        caching.bump_version(user_id)
+    return len(created)
+
+
+def _materialize_each(pks, until):
+    """Materialize the rules one by one from their current state, skipping those that still conflict."""
+    created = 0
+    for rule in RecurringTransaction.objects.filter(pk__in=pks, active=True, next_date__lte=until).order_by("pk"):
+        try:
+            created += _materialize([rule], until)
+        except IntegrityError:
+            logger.warning("Skipped recurring transaction %s, its occurrences were created concurrently", rule.pk)
+    return created
+
+
+def run(until=None, batch_size=DEFAULT_BATCH_SIZE, user_ids=None, progress=None):
+    """Create every occurrence due up to `until` (today by default) for all active rules.
+
+    Rules are read in primary key order, `batch_size` at a time, and each
+    batch is written in its own DB transaction. `progress(result)` is called
+    after every batch.
+    """
+    until = until or timezone.localdate()
+    result = ScheduleResult()
+    due = RecurringTransaction.objects.filter(active=True, next_date__lte=until).order_by("pk")
+    if user_ids is not None:
+        due = due.filter(user_id__in=user_ids)
+
+    last_pk = 0
+    while True:
+        rules = list(due.filter(pk__gt=last_pk)[:batch_size])
+        if not rules:
+            break
+        last_pk = rules[-1].pk
+        result.rules += len(rules)
+        try:
+            result.created += _materialize(rules, until)
+        except IntegrityError:
+            # Another run created some of the occurrences in the meantime
+            result.created += _materialize_each([rule.pk for rule in rules], until)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from . import caching
+from .analytics import BucketTrunc
+from .models import ArchivedTransaction, MonthlySummary, Transaction
+
+# Fields needed to work out which rollup row a transaction belongs to
+ROLLUP_FIELDS = ("user_id", "category_id", "transaction_type", "amount", "date")
+
+
+def month_of(value):
+    """First day of the (local) month a transaction date falls in."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().replace(day=1)
+
+
+def _backdated(value):
+    # Inside a period analytics caches as completed
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date() < timezone.localdate()
+
+
+def _key(row):
+    return (row["user_id"], month_of(row["date"]), row["category_id"], row["transaction_type"])
+
+
+def _apply(user_id, month, category_id, transaction_type, amount, count):
+    rows = MonthlySummary.objects.filter(
+        user_id=user_id,
+        month=month,
+        category_id=category_id,
+        transaction_type=transaction_type,
+    )
+    updated = rows.update(total=F("total") + amount, count=F("count") + count)
+
+    if not updated and count > 0:
+        MonthlySummary.objects.create(
+            user_id=user_id,
+            month=month,
+            category_id=category_id,
+            transaction_type=transaction_type,
+            total=amount,
+            count=count,
+        )
+    elif count < 0:
+        # Drop buckets that no longer hold any transaction
+        rows.filter(count__lte=0).delete()
+
+
+def snapshot(instance):
+    """Rollup-relevant values of a transaction, as a plain dict."""
+    return {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+
+
+def stored_snapshot(pk):
+    """Rollup-relevant values of a transaction as currently saved in the database."""
+    return Transaction.objects.filter(pk=pk).values(*ROLLUP_FIELDS).first()
+
+
+def record_change(previous, current):
+    """Move a transaction's amount from its previous bucket to its current one.
+
+    `previous` is None for new rows and `current` is None for deleted rows.
+    """
+    with transaction.atomic():
+        if previous is not None:
+            _apply(*_key(previous), -previous["amount"], -1)
+        if current is not None:
+            _apply(*_key(current), current["amount"], 1)
+
+    changed = [row for row in (previous, current) if row is not None]
+    if any(_backdated(row["date"]) for row in changed):
+        caching.bump_history(changed[0]["user_id"])
+
+
+def record_bulk(transactions):
+    """Add many newly inserted transactions, one update per bucket."""
+    buckets = defaultdict(lambda: [Decimal("0"), 0])
+    backdated = set()
+    for t in transactions:
+        bucket = buckets[_key(snapshot(t))]
+        bucket[0] += Decimal(t.amount)
+        bucket[1] += 1
+        if _backdated(t.date):
+            backdated.add(t.user_id)
+
+    with transaction.atomic():
+        for key, (amount, count) in buckets.items():
+            _apply(*key, amount, count)
+
+    for user_id in backdated:
+        caching.bump_history(user_id)
+
+
+def merge_category(category):
+    """Fold a category's rollups into the uncategorized bucket before it is deleted."""
+    with transaction.atomic():
+        for row in MonthlySummary.objects.filter(category=category):
+            merged = MonthlySummary.objects.filter(
+                user_id=row.user_id,
+                month=row.month,
+                category=None,
+                transaction_type=row.transaction_type,
+            ).update(total=F("total") + row.total, count=F("count") + row.count)
+
+            if merged:
+                row.delete()
+            else:
+                # Re-point instead of inserting, the owner may be in the middle of a cascade delete
+                MonthlySummary.objects.filter(pk=row.pk).update(category=None)
+
+    caching.bump_history(category.user_id)
+
+
+def _computed(user_ids=None):
+    # Archived transactions stay in the rollups, so they are summed in with the hot ones
+    buckets = {}
+    for model in (Transaction, ArchivedTransaction):
+        transactions = model.objects.all()
+        if user_ids is not None:
+            transactions = transactions.filter(user_id__in=user_ids)
+
+        rows = (
+            transactions.order_by()
+            .annotate(month=TruncMonth("date", output_field=DateField()))
+            .values("user_id", "month", "category_id", "transaction_type")
+            .annotate(total=Sum("amount"), count=Count("id"))
+        )
+        for row in rows:
+            key = (row["user_id"], row["month"], row["category_id"], row["transaction_type"])
+            if key in buckets:
+                buckets[key]["total"] += row["total"]
+                buckets[key]["count"] += row["count"]
+            else:
+                buckets[key] = row
+    return list(buckets.values())
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute rollups from raw transactions, archived ones included. Returns the number of rows written."""
+    with transaction.atomic():
+        rows = [MonthlySummary(**row) for row in _computed(user_ids)]
+        existing = MonthlySummary.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        MonthlySummary.objects.bulk_create(rows, batch_size=batch_size)
+
+    if user_ids is None:
+        user_ids = {row.user_id for row in rows}
+    for user_id in user_ids:
+        caching.bump_history(user_id)
+    return len(rows)
+
+
+def check(user_ids=None):
+    """Compare stored rollups with raw transactions. Returns a list of mismatched buckets."""
+    def keyed(rows):
+        return {
+            (r["user_id"], r["month"], r["category_id"], r["transaction_type"]): (r["total"], r["count"])
+            for r in rows
+        }
+
+    stored = MonthlySummary.objects.all()
+    if user_ids is not None:
+        stored = stored.filter(user_id__in=user_ids)
+
+    expected = keyed(_computed(user_ids))
+    actual = keyed(stored.values("user_id", "month", "category_id", "transaction_type", "total", "count"))
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        if expected.get(key) != actual.get(key):
+            mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
+
+
+def with_budget_actuals(budgets):
+    """Annotate budgets with `spent`, the expense total of their month (see Budget.remaining).
+
+    The spend is a correlated lookup on the rollups' (user, month) index, so
+    the whole list, however many months it spans, is a single query.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    spent = (
+        MonthlySummary.objects.filter(
+            user=OuterRef("user"),
+            month=OuterRef("month_start"),
+            transaction_type="expense",
+        )
+        .order_by()
+        .values("user")
+        .annotate(total=Sum("total"))
+        .values("total")
+    )
+    return budgets.annotate(
+        # Budgets may be dated any day of their month, rollups are keyed on the first
+        month_start=BucketTrunc("month", "month"),
+        spent=Coalesce(Subquery(spent, output_field=money), Value(Decimal("0")), output_field=money),
+    )
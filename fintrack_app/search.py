@@ -0,0 +1,237 @@
+"""Full-text search over transaction notes and category names.
+
+On SQLite the text lives in the `transaction_search` FTS5 table, one row per
+transaction with the transaction's id as rowid. Triggers keep it in step with
+every write, bulk_create and raw updates included, and a category rename
+rewrites the name on all of its transactions. Archived transactions keep their
+ids and are indexed in the same table by triggers on the archive. Other
+databases fall back to icontains filters.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedTransaction, Transaction, TransactionSearch
+
+TABLE = "transaction_search"
+
+ARCHIVE_TABLE = ArchivedTransaction._meta.db_table
+
+# Terms beyond this are ignored, each one narrows the match further anyway
+MAX_TERMS = 8
+
+# bm25 costs a couple of microseconds per matching row and has to score every
+# match before the best can be picked. Queries matching more rows than this
+# (over all users) come back newest first instead, a common word scores
+# nearly the same on every row anyway
+RANKED_MATCHES = 10000
+
+_CATEGORY_NAME = "coalesce((SELECT name FROM fintrack_app_category WHERE id = new.category_id), '')"
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "note, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+TRIGGERS = {
+    "transaction_search_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS transaction_search_insert AFTER INSERT ON fintrack_app_transaction
+        BEGIN
+            INSERT INTO {TABLE} (rowid, note, category) VALUES (new.id, new.note, {_CATEGORY_NAME});
+        END""",
+    "transaction_search_update": f"""
+        CREATE TRIGGER IF NOT EXISTS transaction_search_update AFTER UPDATE OF note, category_id
+        ON fintrack_app_transaction
+        WHEN old.note IS NOT new.note OR old.category_id IS NOT new.category_id
+        BEGIN
+            UPDATE {TABLE} SET note = new.note, category = {_CATEGORY_NAME} WHERE rowid = new.id;
+        END""",
+    "transaction_search_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS transaction_search_delete AFTER DELETE ON fintrack_app_transaction
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+        END""",
+    "transaction_search_category_rename": f"""
+        CREATE TRIGGER IF NOT EXISTS transaction_search_category_rename AFTER UPDATE OF name
+        ON fintrack_app_category
+        WHEN old.name IS NOT new.name
+        BEGIN
+            UPDATE {TABLE} SET category = new.name
+            WHERE rowid IN (SELECT id FROM fintrack_app_transaction WHERE category_id = new.id);
+        END""",
+}
+
+# Same as above for the archive, installed once its table exists (migration 0012)
+ARCHIVE_TRIGGERS = {
+    "archive_search_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_insert AFTER INSERT ON {ARCHIVE_TABLE}
+        BEGIN
+            INSERT INTO {TABLE} (rowid, note, category) VALUES (new.id, new.note, {_CATEGORY_NAME});
+        END""",
+    "archive_search_update": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_update AFTER UPDATE OF note, category_id ON {ARCHIVE_TABLE}
+        WHEN old.note IS NOT new.note OR old.category_id IS NOT new.category_id
+        BEGIN
+            UPDATE {TABLE} SET note = new.note, category = {_CATEGORY_NAME} WHERE rowid = new.id;
+        END""",
+    "archive_search_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_delete AFTER DELETE ON {ARCHIVE_TABLE}
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+        END""",
+    "archive_search_category_rename": f"""
+        CREATE TRIGGER IF NOT EXISTS archive_search_category_rename AFTER UPDATE OF name
+        ON fintrack_app_category
+        WHEN old.name IS NOT new.name
+        BEGIN
+            UPDATE {TABLE} SET category = new.name
+            WHERE rowid IN (SELECT id FROM {ARCHIVE_TABLE} WHERE category_id = new.id);
+        END""",
+}
+
+_FILL = """INSERT INTO {index} (rowid, note, category)
+    SELECT t.id, t.note, coalesce(c.name, '')
+    FROM {table} t LEFT JOIN fintrack_app_category c ON c.id = t.category_id"""
+
+REBUILD = [
+    f"DELETE FROM {TABLE}",
+    _FILL.format(index=TABLE, table="fintrack_app_transaction"),
+]
+
+ARCHIVE_REBUILD = [
+    f"DELETE FROM {TABLE} WHERE rowid IN (SELECT id FROM {ARCHIVE_TABLE})",
+    _FILL.format(index=TABLE, table=ARCHIVE_TABLE),
+]
+
+OPTIMIZE = f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')"
+
+
+def available(using=connection):
+    return using.vendor == "sqlite"
+
+
+def _existing(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE (type = 'table' AND name IN (%s, %s)) OR type = 'trigger'",
+        [TABLE, ARCHIVE_TABLE],
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def install(using=connection, rebuild=False):
+    """Create the index table and its triggers where missing. Returns True if anything was created.
+
+    SQLite drops a table's triggers when Django rebuilds it during a
+    migration, so this also runs after every migrate (see apps.py). If any
+    part was missing, or with `rebuild`, the index is refilled from scratch,
+    or only the archive's rows if only the archive's triggers were missing.
+    """
+    if not available(using):
+        return False
+    with using.cursor() as cursor:
+        existing = _existing(cursor)
+        archive = ARCHIVE_TABLE in existing
+        missing = [name for name in (TABLE, *TRIGGERS) if name not in existing]
+        archive_missing = [name for name in ARCHIVE_TRIGGERS if archive and name not in existing]
+        cursor.execute(CREATE_TABLE)
+        for sql in (*TRIGGERS.values(), *(ARCHIVE_TRIGGERS.values() if archive else ())):
+            cursor.execute(sql)
+
+        statements = []
+        if missing or rebuild:
+            statements = REBUILD + (ARCHIVE_REBUILD if archive else [])
+        elif archive_missing:
+            # Only the archive's rows can be stale
+            statements = ARCHIVE_REBUILD
+        for sql in statements:
+            cursor.execute(sql)
+        if statements:
+            cursor.execute(OPTIMIZE)
+    return bool(missing or archive_missing)
+
+
+def uninstall(using=connection):
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for name in (*TRIGGERS, *ARCHIVE_TRIGGERS):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def uninstall_archive(using=connection):
+    """Drop the archive's triggers and its rows from the index, before the archive table is dropped."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for name in ARCHIVE_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        if TABLE in _existing(cursor):
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN (SELECT id FROM {ARCHIVE_TABLE})")
+
+
+def ensure_installed(using="default", **kwargs):
+    """post_migrate receiver, puts back triggers a table rebuild dropped."""
+    db = connections[using]
+    # Before the migration that introduces the index, there is nothing to keep in step
+    applied = MigrationRecorder(db).applied_migrations()
+    if ("fintrack_app", "0011_transaction_search") in applied:
+        install(db)
+
+
+def match_query(text):
+    """An FTS5 query matching rows containing every word of `text`, each also as a prefix.
+
+    Words are quoted, so FTS5 syntax in user input (AND, NEAR, column
+    filters, ...) is taken literally. Returns "" when there is nothing to match.
+    """
+    terms = re.findall(r"\w+", text or "")[:MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def search(user, text="", start=None, end=None, min_amount=None, max_amount=None,
+           transaction_type=None, category=None, archived=False):
+    """The user's transactions matching `text` and the filters, best match first.
+
+    `start` and `end` are dates, both inclusive. Without search text, or
+    when it matches more than RANKED_MATCHES rows, the filtered transactions
+    come newest first. With `archived`, the user's archived transactions are
+    searched instead, always newest first.
+    """
+    model = ArchivedTransaction if archived else Transaction
+    queryset = model.objects.filter(user=user).select_related("category")
+    if start:
+        queryset = queryset.filter(date__gte=_day_start(start))
+    if end:
+        queryset = queryset.filter(date__lt=_day_start(end + timedelta(days=1)))
+    if min_amount is not None:
+        queryset = queryset.filter(amount__gte=min_amount)
+    if max_amount is not None:
+        queryset = queryset.filter(amount__lte=max_amount)
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+    if category:
+        queryset = queryset.filter(category_id=category)
+
+    query = match_query(text)
+    if not query:
+        return queryset.order_by("-date", "id")
+    if not available():
+        for term in re.findall(r"\w+", text)[:MAX_TERMS]:
+            queryset = queryset.filter(Q(note__icontains=term) | Q(category__name__icontains=term))
+        return queryset.order_by("-date", "id")
+    matches = TransactionSearch.objects.filter(document__match=query)
+    # The index has no relation to the archive for the ranked join, nor does the cold path need one
+    if archived or matches.count() > RANKED_MATCHES:
+        # Matched once into a set and checked while walking the date index. A join would
+        # probe the index per row instead, which rebuilds long prefix matches every time
+        return queryset.filter(id__in=matches.values("transaction_id")).order_by("-date", "id")
+    return queryset.filter(search__document__match=query).order_by("search__rank", "-date", "id")
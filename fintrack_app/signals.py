@@ -0,0 +1,138 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import auth, caching, ledger, rollups
+from .models import UserProfile, Category, Transaction, Budget, Debt, Goal, RecurringTransaction
+
+
+def _user_deletion(origin):
+    # Rows removed because their user is being deleted need no bookkeeping
+    return isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User)
+
+
+# Users
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # By id, so the instance does not keep a copy of the profile
+        UserProfile.objects.create(user_id=instance.pk, full_name=instance.username)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    auth.forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        auth.forget_user(user.pk)
+
+
+# Monthly rollups
+
+@receiver(pre_save, sender=Transaction)
+def remember_transaction_state(sender, instance, **kwargs):
+    instance._previous_state = rollups.stored_snapshot(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, **kwargs):
+    rollups.record_change(instance._previous_state, rollups.snapshot(instance))
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    # The user's rollups are deleted with them
+    if not _user_deletion(origin):
+        rollups.record_change(rollups.snapshot(instance), None)
+
+
+@receiver(pre_delete, sender=Category)
+def merge_rollup_on_category_delete(sender, instance, **kwargs):
+    rollups.merge_category(instance)
+
+
+# Balance ledger
+
+@receiver(post_save, sender=Transaction)
+def post_transaction(sender, instance, **kwargs):
+    previous = instance._previous_state
+    old = ledger.transaction_effect(previous["transaction_type"], previous["amount"]) if previous else 0
+    new = ledger.transaction_effect(instance.transaction_type, instance.amount)
+    ledger.post(instance.user_id, new - old, "transaction", instance.pk)
+
+
+@receiver(post_delete, sender=Transaction)
+def reverse_transaction(sender, instance, origin=None, **kwargs):
+    if not _user_deletion(origin):
+        ledger.post(instance.user_id, -ledger.transaction_effect(instance.transaction_type, instance.amount),
+                    "transaction", instance.pk)
+
+
+@receiver(pre_save, sender=Debt)
+def remember_debt_state(sender, instance, **kwargs):
+    instance._previous_state = (
+        Debt.objects.filter(pk=instance.pk).values("debt_type", "remaining_amount").first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Debt)
+def post_debt(sender, instance, **kwargs):
+    previous = instance._previous_state
+    old = ledger.debt_effect(previous["debt_type"], previous["remaining_amount"]) if previous else 0
+    new = ledger.debt_effect(instance.debt_type, instance.remaining_amount)
+    ledger.post(instance.user_id, new - old, "debt", instance.pk)
+
+
+@receiver(post_delete, sender=Debt)
+def reverse_debt(sender, instance, origin=None, **kwargs):
+    if not _user_deletion(origin):
+        ledger.post(instance.user_id, -ledger.debt_effect(instance.debt_type, instance.remaining_amount),
+                    "debt", instance.pk)
+
+
+@receiver(pre_save, sender=Goal)
+def remember_goal_state(sender, instance, **kwargs):
+    instance._previous_state = (
+        Goal.objects.filter(pk=instance.pk).values("current_amount").first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Goal)
+def post_goal(sender, instance, **kwargs):
+    previous = instance._previous_state
+    old = ledger.goal_effect(previous["current_amount"]) if previous else 0
+    # Money put into a goal has to be available
+    ledger.post(instance.user_id, ledger.goal_effect(instance.current_amount) - old, "goal", instance.pk,
+                require_funds=True)
+
+
+@receiver(post_delete, sender=Goal)
+def reverse_goal(sender, instance, origin=None, **kwargs):
+    if not _user_deletion(origin):
+        ledger.post(instance.user_id, -ledger.goal_effect(instance.current_amount), "goal", instance.pk)
+
+
+# Per-user cache versions
+
+def bump_user_version(sender, instance, **kwargs):
+    caching.bump_version(instance.user_id)
+
+
+for model in (Transaction, Category, Budget, Debt, Goal, UserProfile, RecurringTransaction):
+    post_save.connect(bump_user_version, sender=model, dispatch_uid=f"bump_version_{model.__name__}_save")
+    post_delete.connect(bump_user_version, sender=model, dispatch_uid=f"bump_version_{model.__name__}_delete")
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_version(sender, instance, **kwargs):
+    caching.bump_categories(instance.user_id)
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def optimize_connections(**kwargs):
+    """Run PRAGMA optimize on persistent SQLite connections, at most once per interval.
+
+    Connected to request_finished. SQLite recommends running it periodically on
+    long-lived connections so the planner statistics follow the data.
+    """
+    interval = getattr(settings, "SQLITE_OPTIMIZE_INTERVAL", None)
+    if not interval:
+        return
+
+    now = time.monotonic()
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor != "sqlite" or connection.connection is None or connection.in_atomic_block:
+            continue
+        last = getattr(connection, "_fintrack_optimized_at", None)
+        if last is None:
+            # Counting starts when the connection is first seen
+            connection._fintrack_optimized_at = now
+        elif now - last >= interval:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA optimize")
+            connection._fintrack_optimized_at = now
@@ -0,0 +1,120 @@
+"""Fingerprinted, precompressed static files.
+
+`collectstatic` with CompressedManifestStaticFilesStorage copies every file
+to STATIC_ROOT under a name with a content hash (css/bootstrap.min.css ->
+css/bootstrap.min.1a2b3c4d5e6f.css), records the mapping in staticfiles.json
+and writes .gz (and .br when the brotli package is installed) variants next
+to each compressible file. `{% static %}` then renders the hashed names,
+which StaticFilesMiddleware serves as immutable, so browsers keep them until
+the content, and with it the name, changes.
+
+The fintrack.E001/E002 checks make sure base.html only loads assets through
+`{% static %}` and, once collected, only names that have a hashed copy.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.checks import Error, Tags, register
+from django.core.files.base import ContentFile
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files worth compressing, images and fonts are compressed already
+COMPRESSIBLE = (".css", ".js", ".json", ".map", ".svg", ".txt", ".xml", ".html")
+
+# Smaller files gain nothing once the headers are counted
+MIN_COMPRESS_SIZE = 256
+
+# Templates the static reference check reads
+CHECKED_TEMPLATES = getattr(settings, "STATIC_CHECKED_TEMPLATES", ["fintrack_app/base.html"])
+
+
+def encoders():
+    """(suffix, compress) pairs of the precompressed variants that are written."""
+    found = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        found.insert(0, (".br", lambda data: brotli.compress(data, quality=11)))
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # The vendored Bootstrap files point at source maps that are not shipped
+    patterns = tuple(
+        (glob, tuple(pattern for pattern in patterns
+                     if "sourceMappingURL" not in (pattern if isinstance(pattern, str) else pattern[0])))
+        for glob, patterns in ManifestStaticFilesStorage.patterns
+    )
+
+    def stored_name(self, name):
+        # Without a manifest (DEBUG off, collectstatic not run, e.g. in tests) keep the plain name
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        written = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                written.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(written):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write the compressed variants of `name` that are smaller than the file itself."""
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in encoders():
+            compressed = compress(data)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            # Not worth a separate file below a 5% saving
+            if len(compressed) < len(data) * 0.95:
+                self._save(name + suffix, ContentFile(compressed))
+
+
+_STATIC_TAG = re.compile(r"""{%\s*static\s+(['"])(?P<name>[^'"]+)\1""")
+_LITERAL_URL = re.compile(r"""(?:href|src)\s*=\s*(['"])(?P<url>[^'"]*)\1""")
+
+
+@register(Tags.staticfiles)
+def check_static_references(app_configs, **kwargs):
+    """Static assets in CHECKED_TEMPLATES must go through {% static %} and have a hashed copy."""
+    errors = []
+    # Empty, or missing for other storages, until there is a manifest
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+
+    for template_name in CHECKED_TEMPLATES:
+        try:
+            origin = get_template(template_name).origin
+        except TemplateDoesNotExist:
+            continue
+        source = origin.loader.get_contents(origin)
+        for match in _LITERAL_URL.finditer(source):
+            if match["url"].startswith(settings.STATIC_URL):
+                errors.append(Error(
+                    f"{template_name} links {match['url']} directly, so it is served without a content hash.",
+                    hint="Use {% static %} for files under STATIC_URL.",
+                    id="fintrack.E001",
+                ))
+        if hashed_files:
+            for match in _STATIC_TAG.finditer(source):
+                if match["name"] not in hashed_files:
+                    errors.append(Error(
+                        f"{template_name} loads {match['name']}, which has no hashed copy in the static manifest.",
+                        hint="Run collectstatic, or fix the file name.",
+                        id="fintrack.E002",
+                    ))
+    return errors
@@ -0,0 +1,36 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from .middleware import current_metrics
+
+
+class InstrumentedTemplate:
+    """Wraps a backend template so its render time is added to the request metrics."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, timed by PerformanceMiddleware."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
@@ -1,3 +1,1686 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+import csv
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from datetime import date
+
+from . import (
+    analytics, archive, auth, benchmarks, caching, forecasting, goals, importers, jobs, ledger, recurring, rollups, search,
+    staticfiles, views,
+)
+from .middleware import StaticFilesMiddleware
+from .models import (
+    UserProfile, Category, Transaction, MonthlySummary, Budget, Debt, Goal, LedgerEntry, RecurringTransaction,
+    ArchivedTransaction, TransactionSearch, Job,
+)
+
+
+class MonthlyRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        self.rent = Category.objects.create(user=self.user, name="Rent", category_type="expense")
+
+    def add(self, amount, category=None, transaction_type="expense"):
+        return Transaction.objects.create(
+            user=self.user,
+            category=category,
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+        )
+
+    def totals(self, **filters):
+        return {
+            (s.category_id, s.transaction_type): (s.total, s.count)
+            for s in MonthlySummary.objects.filter(user=self.user, **filters)
+        }
+
+    def test_create_update_delete_keep_rollups_in_sync(self):
+        t = self.add("10.00", self.food)
+        self.add("5.50", self.food)
+        self.assertEqual(self.totals(), {(self.food.pk, "expense"): (Decimal("15.50"), 2)})
+
+        t.amount = Decimal("20.00")
+        t.category = self.rent
+        t.save()
+        self.assertEqual(self.totals(), {
+            (self.food.pk, "expense"): (Decimal("5.50"), 1),
+            (self.rent.pk, "expense"): (Decimal("20.00"), 1),
+        })
+
+        t.transaction_type = "income"
+        t.save()
+        self.assertIn((self.rent.pk, "income"), self.totals())
+        self.assertNotIn((self.rent.pk, "expense"), self.totals())
+
+        t.delete()
+        self.assertEqual(self.totals(), {(self.food.pk, "expense"): (Decimal("5.50"), 1)})
+        self.assertEqual(rollups.check(), [])
+
+    def test_category_delete_merges_into_uncategorized(self):
+        self.add("3.00")
+        self.add("7.00", self.food)
+        self.add("1.00", self.rent)
+
+        self.food.delete()
+        self.assertEqual(self.totals(category=None), {(None, "expense"): (Decimal("10.00"), 2)})
+
+        self.rent.delete()
+        self.assertEqual(self.totals(), {(None, "expense"): (Decimal("11.00"), 3)})
+        self.assertEqual(rollups.check(), [])
+
+    def test_user_delete_cascades(self):
+        self.add("3.00", self.food)
+        self.user.delete()
+        self.assertFalse(MonthlySummary.objects.exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        self.add("4.00", self.food)
+        MonthlySummary.objects.update(total=Decimal("99.00"))
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", "--check", stdout=StringIO())
+
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertEqual(rollups.check(), [])
+
+    def test_dashboard_reads_rollups(self):
+        self.add("100.00", transaction_type="income")
+        self.add("40.00", self.food)
+
+        self.client.login(username="alice", password="pass12345")
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(response.context["income"], Decimal("100.00"))
+        self.assertEqual(response.context["expense"], Decimal("40.00"))
+        self.assertEqual(response.context["monthly_expense"], Decimal("40.00"))
+
+
+class DashboardQueryCountTests(TestCase):
+    # Upper bound on dashboard queries, including session, user and profile lookups
+    MAX_QUERIES = 12
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("bob", password="pass12345")
+        self.client.login(username="bob", password="pass12345")
+        # First visit creates the profile, measure steady-state loads only
+        self.client.get(reverse("dashboard"))
+
+    def seed(self, transactions, categories):
+        cats = Category.objects.bulk_create([
+            Category(user=self.user, name=f"Cat {i}", category_type="expense")
+            for i in range(categories)
+        ])
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user,
+                category=cats[i % categories],
+                transaction_type="income" if i % 3 == 0 else "expense",
+                amount=Decimal("1.00") + i % 50,
+            )
+            for i in range(transactions)
+        ], batch_size=1000)
+        Debt.objects.create(user=self.user, title="Loan", debt_type="borrowed",
+                            total_amount=100, remaining_amount=50, start_date="2026-01-01")
+        Goal.objects.create(user=self.user, title="Trip", goal_type="savings", target_amount=500)
+        rollups.rebuild([self.user.pk])
+
+    def dashboard_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.seed(transactions=10, categories=2)
+        small = self.dashboard_queries()
+
+        self.seed(transactions=10000, categories=40)
+        large = self.dashboard_queries()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.MAX_QUERIES)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caching.reset_stats()
+        self.user = User.objects.create_user("carol", password="pass12345")
+        self.client.login(username="carol", password="pass12345")
+
+    def load(self):
+        return self.client.get(reverse("dashboard")).context
+
+    def test_repeat_load_is_a_hit(self):
+        self.load()
+        version = caching.data_version(self.user.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            self.load()
+
+        self.assertEqual(caching.stats(), {"dashboard_miss": 1, "dashboard_hit": 1})
+        self.assertEqual(caching.data_version(self.user.pk), version)
+        # Session, user and profile come from the cache too
+        self.assertEqual(len(ctx.captured_queries), 0, [q["sql"] for q in ctx.captured_queries])
+
+    def test_every_owned_model_invalidates(self):
+        self.load()
+        writes = [
+            lambda: Category.objects.create(user=self.user, name="Pay", category_type="income"),
+            lambda: Transaction.objects.create(user=self.user, transaction_type="income", amount=50),
+            lambda: Budget.objects.create(user=self.user, monthly_limit=10, month="2026-01-01"),
+            lambda: Debt.objects.create(user=self.user, title="Car", debt_type="lent",
+                                        total_amount=10, remaining_amount=5, start_date="2026-01-01"),
+            lambda: Goal.objects.create(user=self.user, title="Bike", goal_type="purchase", target_amount=10),
+            lambda: self.user.userprofile.save(),
+        ]
+        for write in writes:
+            before = caching.data_version(self.user.pk)
+            write()
+            self.assertNotEqual(caching.data_version(self.user.pk), before)
+
+        self.assertEqual(self.load()["income"], Decimal("50.00"))
+
+    def test_other_users_writes_do_not_invalidate(self):
+        other = User.objects.create_user("dave")
+        self.load()
+        Transaction.objects.create(user=other, transaction_type="income", amount=5)
+        self.load()
+        self.assertEqual(caching.stats()["dashboard_hit"], 1)
+
+    def test_fragments_follow_the_data_version(self):
+        fragment_cache = self.load()["fragment_cache"]
+        key = make_template_fragment_key("dashboard_transactions", [self.user.pk, fragment_cache["version"]])
+        self.assertIn("No transactions yet.", cache.get(key))
+
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("321"))
+        response = self.client.get(reverse("dashboard"))
+        self.assertNotEqual(response.context["fragment_cache"]["version"], fragment_cache["version"])
+        self.assertContains(response, "Rs. 321")
+        self.assertNotContains(response, "No transactions yet.")
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("hank", password="pass12345")
+        self.client.login(username="hank", password="pass12345")
+
+    def test_profile_is_created_with_the_user(self):
+        self.assertEqual(UserProfile.objects.get(user=self.user).full_name, "hank")
+
+    def test_warm_request_needs_no_queries_for_auth_and_profile(self):
+        self.client.get(reverse("goal-add"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("goal-add"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 0, [q["sql"] for q in ctx.captured_queries])
+
+    def test_cached_profile_follows_the_balance(self):
+        self.assertEqual(auth.load_user(self.user.pk).userprofile.balance, 0)
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("75"))
+        with CaptureQueriesContext(connection) as ctx:
+            user = auth.load_user(self.user.pk)
+        self.assertEqual(user.userprofile.balance, Decimal("75"))
+        # Only the profile is read again
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.client.get(reverse("goal-add"))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("goal-add"))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('goal-add')}", fetch_redirect_response=False)
+
+    def test_logout_drops_the_cached_user(self):
+        self.client.get(reverse("goal-add"))
+        self.assertIsNotNone(cache.get(caching.user_key(self.user.pk)))
+        self.client.post(reverse("logout"))
+        self.assertIsNone(cache.get(caching.user_key(self.user.pk)))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_is_not_used(self):
+        auth.load_user(self.user.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(auth.load_user(self.user.pk).userprofile.full_name, "hank")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([error.id for error in auth.check_session_cache(None)], ["fintrack.E003"])
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse("goal-add"))
+        self.user.set_password("changed12345")
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("goal-add")).status_code, 302)
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(prefix="fintrack-cache-"),
+    }
+})
+class FileBasedDashboardCacheTests(DashboardCacheTests):
+    pass
+
+
+class SharedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caching.reset_stats()
+        self.user = User.objects.create_user("ivan", password="pass12345")
+        self.client.login(username="ivan", password="pass12345")
+
+    def test_write_in_another_process_invalidates_the_dashboard(self):
+        self.client.get(reverse("dashboard"))
+        subprocess.run(
+            [sys.executable, "-c",
+             f"import django; django.setup(); from fintrack_app import caching; caching.bump_version({self.user.pk})"],
+            cwd=settings.BASE_DIR, env={**os.environ, "DJANGO_SETTINGS_MODULE": "FinTrack.settings"}, check=True,
+        )
+        self.client.get(reverse("dashboard"))
+        self.assertEqual(caching.stats(), {"dashboard_miss": 2})
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual(caching.check_shared_cache(None), [])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertEqual([error.id for error in caching.check_shared_cache(None)], ["fintrack.W001"])
+
+
+class DashboardChartsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("nina", password="pass12345")
+        self.client.login(username="nina", password="pass12345")
+        food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        Transaction.objects.create(user=self.user, category=food, transaction_type="expense", amount=Decimal("40"))
+        Debt.objects.create(user=self.user, title="Car", debt_type="borrowed", start_date="2026-01-01",
+                            total_amount=Decimal("100"), remaining_amount=Decimal("60"))
+
+    def test_series_are_not_rendered_into_the_page(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertNotIn("debt_labels", response.context)
+        self.assertContains(response, f'data-url="{reverse("dashboard-charts")}"')
+
+    def test_chart_data(self):
+        response = self.client.get(reverse("dashboard-charts"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(response.json()["category_expenses"], {"labels": ["Food"], "values": [40.0]})
+        self.assertEqual(response.json()["debts"], {"labels": ["Car"], "values": [60.0], "types": ["borrowed"]})
+
+    def test_not_modified_until_data_changes(self):
+        etag = self.client.get(reverse("dashboard-charts"))["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("dashboard-charts"), headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        # Session and user come from the cache, and there is no aggregation
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("5"))
+        response = self.client.get(reverse("dashboard-charts"), headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("owen", password="pass12345")
+        self.client.login(username="owen", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+
+    def add(self, when, amount, transaction_type="expense", category=None):
+        return Transaction.objects.create(
+            user=self.user, category=category, transaction_type=transaction_type, amount=Decimal(amount),
+            date=timezone.make_aware(datetime.fromisoformat(when)),
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse("analytics-series"), params)
+
+    def test_monthly_series_is_gap_filled(self):
+        self.add("2025-01-10 12:00", "10.00", category=self.food)
+        self.add("2025-01-20 12:00", "500.00", transaction_type="income")
+        self.add("2025-03-05 12:00", "7.50", category=self.food)
+
+        data = self.get(start="2025-01-01", end="2025-04-30").json()
+        self.assertEqual(data["buckets"], ["2025-01-01", "2025-02-01", "2025-03-01", "2025-04-01"])
+        self.assertEqual(data["expense"], [10.0, 0.0, 7.5, 0.0])
+        self.assertEqual(data["income"], [500.0, 0.0, 0.0, 0.0])
+        self.assertEqual(data["categories"][0], {
+            "id": self.food.pk, "name": "Food", "transaction_type": "expense", "values": [10.0, 0.0, 7.5, 0.0],
+        })
+
+    def test_partial_months_and_granularities(self):
+        for day in ("2025-01-31", "2025-02-01", "2025-02-14", "2025-03-01"):
+            self.add(f"{day} 09:00", "1.00")
+
+        # Edges fall mid-month, so only February comes from the rollups
+        monthly = self.get(start="2025-01-31", end="2025-03-01").json()
+        self.assertEqual(monthly["expense"], [1.0, 2.0, 1.0])
+
+        weekly = self.get(start="2025-01-27", end="2025-02-16", granularity="week").json()
+        self.assertEqual(weekly["buckets"], ["2025-01-27", "2025-02-03", "2025-02-10"])
+        self.assertEqual(weekly["expense"], [2.0, 0.0, 1.0])
+
+        daily = self.get(start="2025-02-13", end="2025-02-15", granularity="day").json()
+        self.assertEqual(daily["expense"], [0.0, 1.0, 0.0])
+
+        yearly = self.get(start="2024-06-01", end="2025-12-31", granularity="year").json()
+        self.assertEqual(yearly["expense"], [0.0, 4.0])
+
+    def test_buckets_follow_the_current_time_zone(self):
+        self.add("2025-02-28 20:00", "1.00")
+        params = {"start": "2025-02-28", "end": "2025-03-01", "granularity": "day"}
+        self.assertEqual(self.get(**params).json()["expense"], [1.0, 0.0])
+        cache.clear()
+        with timezone.override("Asia/Kathmandu"):
+            self.assertEqual(self.get(**params).json()["expense"], [0.0, 1.0])
+
+    def test_completed_periods_are_cached_until_a_backdated_write(self):
+        self.add("2025-05-05 12:00", "3.00")
+        params = {"start": "2025-05-01", "end": str(timezone.localdate())}
+        self.get(**params)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(**params)
+        history_queries = [q for q in ctx.captured_queries if "monthlysummary" in q["sql"]]
+        self.assertEqual(history_queries, [])
+
+        # Today's writes only touch the open period
+        version = caching.history_version(self.user.pk)
+        Transaction.objects.create(user=self.user, transaction_type="expense", amount=Decimal("2.00"))
+        self.assertEqual(caching.history_version(self.user.pk), version)
+        self.assertEqual(self.get(**params).json()["expense"][-1], 2.0)
+
+        self.add("2025-05-06 12:00", "4.00")
+        self.assertEqual(self.get(**params).json()["expense"][0], 7.0)
+
+    def test_invalid_ranges(self):
+        self.assertEqual(self.get(start="2025-02-01", end="2025-01-01").status_code, 400)
+        self.assertEqual(self.get(start="1990-01-01", end="2025-01-01", granularity="day").status_code, 400)
+        self.assertEqual(self.get(granularity="hour").status_code, 400)
+
+
+class BudgetActualsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("pia", password="pass12345")
+        self.client.login(username="pia", password="pass12345")
+
+    def spend(self, when, amount, transaction_type="expense"):
+        Transaction.objects.create(
+            user=self.user, transaction_type=transaction_type, amount=Decimal(amount),
+            date=timezone.make_aware(datetime.fromisoformat(when)),
+        )
+
+    def test_every_month_in_one_query(self):
+        for month in range(1, 13):
+            Budget.objects.create(user=self.user, monthly_limit=Decimal("200"), month=f"2024-{month:02d}-01")
+        # Budgets can be dated mid-month
+        Budget.objects.create(user=self.user, monthly_limit=Decimal("50"), month="2025-01-15")
+        self.spend("2024-03-02 10:00", "150.00")
+        self.spend("2024-03-20 10:00", "100.00")
+        self.spend("2024-03-21 10:00", "999.00", transaction_type="income")
+        self.spend("2025-01-31 10:00", "10.00")
+
+        budgets = rollups.with_budget_actuals(Budget.objects.filter(user=self.user))
+        with self.assertNumQueries(1):
+            actuals = {b.month.isoformat(): (b.spent, b.remaining, b.percent_used) for b in budgets}
+
+        self.assertEqual(actuals["2024-03-01"], (Decimal("250"), Decimal("-50"), Decimal("125")))
+        self.assertEqual(actuals["2024-04-01"], (Decimal("0"), Decimal("200"), Decimal("0")))
+        self.assertEqual(actuals["2025-01-15"], (Decimal("10"), Decimal("40"), Decimal("20")))
+
+    def test_budget_list_shows_actuals(self):
+        Budget.objects.create(user=self.user, monthly_limit=Decimal("100"), month="2024-03-01")
+        self.spend("2024-03-02 10:00", "25.00")
+
+        response = self.client.get(reverse("budget-list"))
+        self.assertContains(response, "Rs. 25.00")
+        self.assertContains(response, "Rs. 75.00")
+        self.assertContains(response, "25%")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("erin", password="pass12345")
+        self.client.login(username="erin", password="pass12345")
+        food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=food, transaction_type="expense", amount=i + 1)
+            for i in range(60)
+        ])
+        # Plenty of ties on date, the id must break them
+        Transaction.objects.filter(pk__in=Transaction.objects.values("pk")[:30]).update(date="2026-01-01T00:00:00Z")
+        self.expected = list(Transaction.objects.order_by("-date", "id").values_list("pk", flat=True))
+
+    def get(self, **params):
+        return self.client.get(reverse("transaction-list"), params)
+
+    def test_walk_forward_and_back(self):
+        seen = []
+        pages = []
+        page = self.get().context["page"]
+        while True:
+            pages.append(page)
+            seen += [t.pk for t in page.object_list]
+            if not page.has_next:
+                break
+            page = self.get(after=page.next_token).context["page"]
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous)
+
+        back = self.get(before=pages[-1].previous_token).context["page"]
+        self.assertEqual([t.pk for t in back.object_list], [t.pk for t in pages[-2].object_list])
+
+    def test_constant_queries_without_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get()
+        sql = [q["sql"] for q in ctx.captured_queries]
+        # user with profile (the session is cached), one page query that also joins the category
+        self.assertEqual(len(sql), 2)
+        self.assertFalse(any("COUNT(" in q.upper() for q in sql))
+
+    def test_tampered_token_is_404(self):
+        self.assertEqual(self.get(after="not-a-token").status_code, 404)
+
+
+class QueryPlanTests(TestCase):
+    """Key dashboard and list queries must be index searches, never full table scans."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("frank", password="pass12345")
+        self.client.login(username="frank", password="pass12345")
+        food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        for i in range(30):
+            Transaction.objects.create(user=self.user, category=food, transaction_type="expense", amount=i + 1)
+        Budget.objects.create(user=self.user, monthly_limit=100, month="2026-01-01")
+        Debt.objects.create(user=self.user, title="Loan", debt_type="borrowed",
+                            total_amount=100, remaining_amount=50, start_date="2026-01-01")
+        Goal.objects.create(user=self.user, title="Trip", goal_type="savings", target_amount=500)
+
+    def captured_selects(self, *urls):
+        with CaptureQueriesContext(connection) as ctx:
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        return [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+
+    def assertNoTableScans(self, statements):
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail:
+                        self.fail(f"Full table scan ({detail}) in: {sql}")
+
+    def test_dashboard_queries_use_indexes(self):
+        self.assertNoTableScans(self.captured_selects(reverse("dashboard")))
+
+    def test_list_queries_use_indexes(self):
+        urls = [reverse(name) for name in (
+            "transaction-list", "budget-list", "debt-list", "goal-list", "category-list",
+        )]
+        page = self.client.get(urls[0], {}).context["page"]
+        deep = f"{urls[0]}?after={page.next_token}"
+        self.assertNoTableScans(self.captured_selects(*urls, deep))
+
+
+OFX_SAMPLE = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20260105120000[-5:EST]
+<TRNAMT>-42.10
+<NAME>Grocery Store
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260110<TRNAMT>1500.00<NAME>Payroll</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>bad<TRNAMT>-1</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def use_temporary_job_storage(testcase):
+    """Keep job uploads and exports in a temporary directory for the test."""
+    directory = tempfile.TemporaryDirectory()
+    testcase.addCleanup(directory.cleanup)
+    original = jobs.storage
+    jobs.storage = FileSystemStorage(location=directory.name)
+    testcase.addCleanup(setattr, jobs, "storage", original)
+
+
+class ImportTests(TestCase):
+    CSV = (
+        "Date,Amount,Type,Category,Note\n"
+        "2025-01-03,12.50,expense,Food,lunch\n"
+        "2025-01-04,-8.00,,food,snack\n"
+        "2025-02-01,2000,income,Salary,\n"
+        "not-a-date,5,expense,Food,\n"
+        "2025-02-02,abc,expense,Food,\n"
+        "2025-02-03,0,expense,Food,\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user("gina", password="pass12345")
+        Category.objects.create(user=self.user, name="Food", category_type="expense")
+
+    def test_csv_import_in_batches(self):
+        batches = []
+        result = importers.import_transactions(
+            self.user,
+            importers.parse_csv(StringIO(self.CSV)),
+            batch_size=2,
+            progress=lambda r: batches.append(r.created),
+        )
+
+        self.assertEqual((result.processed, result.created, result.rejected_count), (6, 3, 3))
+        self.assertEqual([line for line, _ in result.rejected], [5, 6, 7])
+        self.assertEqual(batches, [2, 3])
+        # "food" resolves to the existing category, Salary is created once
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            Transaction.objects.filter(user=self.user, category__name="Food").count(), 2
+        )
+        self.assertEqual(Transaction.objects.get(note="snack").transaction_type, "expense")
+        self.assertEqual(rollups.check(), [])
+
+    def test_ofx_parsing(self):
+        records = list(importers.parse_ofx(StringIO(OFX_SAMPLE)))
+        self.assertEqual(len(records), 3)
+        first = records[0][1]
+        self.assertEqual((first["amount"], first["transaction_type"], first["note"]),
+                         (Decimal("42.10"), "expense", "Grocery Store"))
+        self.assertEqual(first["date"].date().isoformat(), "2026-01-05")
+        self.assertEqual(records[1][1]["transaction_type"], "income")
+        self.assertIsInstance(records[2][1], importers.RowError)
+
+    def test_unusable_amounts_and_rows_are_rejected(self):
+        csv_text = (
+            "Date,Amount,Type\n"
+            "2025-01-01,NaN,expense\n"
+            "2025-01-02,sNaN,\n"
+            "2025-01-03,-Infinity,\n"
+            "2025-01-04,1e400,income\n"
+            "2025-01-05,12345678901.00,income\n"
+            f"2025-01-06,5,{'x' * 200}\n"
+            "2025-01-07,9999999999.99,income\n"
+        )
+        limit = csv.field_size_limit(100)
+        self.addCleanup(csv.field_size_limit, limit)
+        result = importers.import_transactions(self.user, importers.parse_csv(StringIO(csv_text)))
+
+        self.assertEqual((result.processed, result.created, result.rejected_count), (7, 1, 6))
+        reasons = [reason for _, reason in result.rejected]
+        self.assertEqual(sum("invalid amount" in reason for reason in reasons), 4)
+        self.assertIn("too large", reasons[4])
+        self.assertIn("unreadable row", reasons[5])
+
+    def test_ofx_parsing_across_chunk_boundaries(self):
+        whole = list(importers._ofx_tags(StringIO(OFX_SAMPLE)))
+        chunked = list(importers._ofx_tags(StringIO(OFX_SAMPLE), chunk_size=7))
+        self.assertEqual(whole, chunked)
+
+    def test_upload_view(self):
+        self.client.login(username="gina", password="pass12345")
+        upload = SimpleUploadedFile("statement.csv", self.CSV.encode())
+        use_temporary_job_storage(self)
+        response = self.client.post(reverse("transaction-import"), {"file": upload, "file_format": "csv"})
+
+        job = Job.objects.get(user=self.user, kind="import")
+        self.assertRedirects(response, reverse("job-detail", args=[job.pk]))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 0)
+
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result["created"], 3)
+        self.assertFalse(jobs.storage.exists(job.payload["file"]))
+        self.assertContains(self.client.get(reverse("job-detail", args=[job.pk])), "invalid date")
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ofx", delete=False) as f:
+            f.write(OFX_SAMPLE)
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command("import_transactions", "gina", f.name, stdout=out, stderr=StringIO())
+        self.assertIn("Imported 2 transaction(s), rejected 1.", out.getvalue())
+
+    def test_command_reports_what_was_imported_before_undecodable_bytes(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv", delete=False) as f:
+            f.write(b"Date,Amount\n" + b"2026-01-01,5\n" * 2000 + b"2026-01-02,\xe9\n")
+        self.addCleanup(os.unlink, f.name)
+        with self.assertRaises(CommandError) as raised:
+            call_command("import_transactions", "gina", f.name, "--batch-size", "100", stdout=StringIO())
+        imported = Transaction.objects.filter(user=self.user).count()
+        self.assertGreater(imported, 0)
+        self.assertEqual(
+            str(raised.exception),
+            f"The file is not UTF-8 text (invalid continuation byte), {imported} transaction(s) were already imported.",
+        )
+
+
+class RecurringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("rita", password="pass12345")
+        self.rent = Category.objects.create(user=self.user, name="Rent", category_type="expense")
+
+    def rule(self, **kwargs):
+        fields = dict(user=self.user, category=self.rent, transaction_type="expense", amount=Decimal("900"),
+                      note="Rent", frequency="monthly", start_date=date(2026, 1, 31))
+        fields.update(kwargs)
+        return RecurringTransaction.objects.create(**fields)
+
+    def test_catches_up_and_keeps_the_day_of_month(self):
+        rule = self.rule()
+        result = recurring.run(until=date(2026, 4, 30))
+
+        self.assertEqual(result.created, 4)
+        self.assertEqual(
+            list(Transaction.objects.filter(recurring=rule).order_by("occurrence_date")
+                 .values_list("occurrence_date", flat=True)),
+            [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)],
+        )
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, date(2026, 5, 31))
+        # Derived data is kept in step, as for single saves
+        self.assertFalse(rollups.check([self.user.pk]))
+        self.assertEqual(ledger.balance(self.user.pk), Decimal("-3600"))
+        self.assertEqual(ledger.expected_balance(self.user.pk), Decimal("-3600"))
+
+    def test_reruns_create_nothing(self):
+        rule = self.rule(frequency="weekly", interval=2, start_date=date(2026, 3, 2))
+        recurring.run(until=date(2026, 3, 31))
+        self.assertEqual(recurring.run(until=date(2026, 3, 31)).created, 0)
+
+        # Even with the rule's position lost, already created dates are skipped
+        RecurringTransaction.objects.filter(pk=rule.pk).update(next_date=rule.start_date)
+        self.assertEqual(recurring.run(until=date(2026, 3, 31)).created, 0)
+        self.assertEqual(Transaction.objects.filter(recurring=rule).count(), 3)
+
+    def test_overlapping_run_does_not_abort_the_batch(self):
+        rent = self.rule(start_date=date(2026, 1, 1))
+        salary = self.rule(transaction_type="income", amount=Decimal("2000"), start_date=date(2026, 1, 1), note="Salary")
+        bulk_create = Transaction.objects.bulk_create
+        calls = []
+
+        def concurrent_run(objs, *args, **kwargs):
+            # The first time, an occurrence appears after this run read the existing ones
+            if not calls:
+                calls.append(objs)
+                Transaction.objects.create(user=self.user, transaction_type="expense", amount=Decimal("900"),
+                                           date=timezone.now(), recurring=rent, occurrence_date=date(2026, 1, 1))
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Transaction.objects, "bulk_create", side_effect=concurrent_run):
+            result = recurring.run(until=date(2026, 3, 1))
+
+        self.assertEqual(result.created, 6)
+        for rule in (rent, salary):
+            self.assertEqual(
+                list(Transaction.objects.filter(recurring=rule).order_by("occurrence_date")
+                     .values_list("occurrence_date", flat=True)),
+                [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)],
+            )
+        self.assertFalse(rollups.check([self.user.pk]))
+
+    def test_views(self):
+        self.client.login(username="rita", password="pass12345")
+        data = {"category": self.rent.pk, "transaction_type": "expense", "amount": "900", "note": "Rent",
+                "frequency": "monthly", "interval": 1, "start_date": "2026-01-31"}
+        response = self.client.post(reverse("recurring-add"), data)
+        self.assertRedirects(response, reverse("recurring-list"))
+        rule = RecurringTransaction.objects.get(user=self.user)
+        self.assertEqual((rule.category, rule.next_date), (self.rent, date(2026, 1, 31)))
+        self.assertContains(self.client.get(reverse("transaction-list")), reverse("recurring-list"))
+        self.assertContains(self.client.get(reverse("recurring-list")), reverse("recurring-delete", args=[rule.pk]))
+
+        other = User.objects.create_user("otto")
+        foreign = Category.objects.create(user=other, name="Rent", category_type="expense")
+        response = self.client.post(reverse("recurring-add"), {**data, "category": foreign.pk})
+        self.assertIn("category", response.context["form"].errors)
+        response = self.client.post(reverse("recurring-add"), {**data, "end_date": "2026-01-30"})
+        self.assertEqual(response.context["form"].errors["end_date"], ["End date cannot be before the start date."])
+
+        foreign_rule = self.rule(user=other, category=foreign)
+        self.assertEqual(self.client.post(reverse("recurring-delete", args=[foreign_rule.pk])).status_code, 404)
+        self.client.post(reverse("recurring-delete", args=[rule.pk]))
+        self.assertFalse(RecurringTransaction.objects.filter(user=self.user).exists())
+
+    def test_end_date_deactivates_the_rule(self):
+        rule = self.rule(frequency="daily", start_date=date(2026, 1, 1), end_date=date(2026, 1, 10))
+        self.assertEqual(recurring.run(until=date(2026, 2, 1)).created, 10)
+        rule.refresh_from_db()
+        self.assertFalse(rule.active)
+
+    def test_batches_many_rules(self):
+        RecurringTransaction.objects.bulk_create([
+            RecurringTransaction(user=self.user, transaction_type="income", amount=Decimal("1"),
+                                 start_date=date(2026, 1, 1), next_date=date(2026, 1, 1))
+            for _ in range(250)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            result = recurring.run(until=date(2026, 3, 1), batch_size=100)
+        self.assertEqual((result.rules, result.created), (250, 750))
+        # A fixed number of statements per batch of 100 rules, not per rule or occurrence
+        self.assertLess(len(ctx.captured_queries), 3 * 25)
+
+    def test_command(self):
+        self.rule(start_date=date(2026, 1, 1))
+        out = StringIO()
+        call_command("run_recurring", "--until", "2026-02-15", stdout=out)
+        self.assertIn("Created 2 occurrence(s) from 1 due rule(s).", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("run_recurring", "--until", "soon", stdout=StringIO())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("sam", password="pass12345")
+        self.client.login(username="sam", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Groceries", category_type="expense")
+        self.rent = Category.objects.create(user=self.user, name="Housing", category_type="expense")
+
+    def add(self, note, category=None, amount="10", **kwargs):
+        return Transaction.objects.create(user=self.user, category=category, transaction_type="expense",
+                                          amount=Decimal(amount), note=note, **kwargs)
+
+    def found(self, text, **filters):
+        return [t.note for t in search.search(self.user, text, **filters)]
+
+    def test_prefix_terms_across_note_and_category(self):
+        self.add("Weekly shop at the market", self.food)
+        self.add("Rent for March", self.rent)
+        self.add("Café with friends")
+
+        self.assertEqual(self.found("mark"), ["Weekly shop at the market"])
+        self.assertEqual(self.found("hous rent"), ["Rent for March"])
+        self.assertEqual(self.found("cafe"), ["Café with friends"])
+        # FTS5 operators in user input are plain words
+        self.assertEqual(self.found('rent" OR note:*'), [])
+
+    def test_ranks_better_matches_first(self):
+        self.add("coffee", self.food)
+        self.add("coffee beans, coffee filters and coffee cups")
+        self.assertEqual(self.found("coffee")[0], "coffee beans, coffee filters and coffee cups")
+
+    def test_combined_filters(self):
+        self.add("taxi home", amount="30", date=datetime(2026, 3, 5, tzinfo=dt_timezone.utc))
+        self.add("taxi to work", amount="8", date=datetime(2026, 4, 5, tzinfo=dt_timezone.utc))
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("8"), note="taxi refund")
+        other = User.objects.create_user("tom")
+        Transaction.objects.create(user=other, transaction_type="expense", amount=Decimal("8"), note="taxi")
+
+        self.assertEqual(len(self.found("taxi")), 3)
+        self.assertEqual(self.found("taxi", max_amount=Decimal("10"), transaction_type="expense"), ["taxi to work"])
+        self.assertEqual(self.found("taxi", start=date(2026, 3, 1), end=date(2026, 3, 31)), ["taxi home"])
+
+    def test_index_follows_writes(self):
+        t = self.add("old note", self.food)
+        t.note = "new note"
+        t.save()
+        self.assertEqual(self.found("old"), [])
+        self.assertEqual(self.found("new"), ["new note"])
+
+        # bulk_create and category renames skip the save signals, the triggers still see them
+        Transaction.objects.bulk_create([Transaction(user=self.user, transaction_type="expense", amount=1,
+                                                     note="bulk row", category=self.food)])
+        self.food.name = "Supermarket"
+        self.food.save()
+        self.assertEqual(sorted(self.found("supermarket")), ["bulk row", "new note"])
+
+        self.food.delete()
+        self.assertEqual(self.found("supermarket"), [])
+        t.delete()
+        self.assertEqual(self.found("new"), [])
+
+    def test_install_repairs_dropped_triggers(self):
+        # What a table rebuild during a migration does to the triggers
+        with connection.cursor() as cursor:
+            for name in search.TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {name}")
+        self.add("written while unindexed")
+        self.assertEqual(self.found("unindexed"), [])
+
+        self.assertTrue(search.install())
+        self.assertEqual(self.found("unindexed"), ["written while unindexed"])
+        self.assertFalse(search.install())
+
+    def test_view(self):
+        for i in range(30):
+            self.add(f"parking {i}", self.rent)
+        response = self.client.get(reverse("transaction-search"), {"q": "park", "category": self.rent.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["transactions"]), views.SEARCH_PAGE_SIZE)
+        self.assertTrue(response.context["has_next"])
+
+        response = self.client.get(reverse("transaction-search"), {"q": "park", "page": 2})
+        self.assertEqual(len(response.context["transactions"]), 5)
+        self.assertFalse(response.context["has_next"])
+
+
+class TransactionFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("tess", password="pass12345")
+        self.client.login(username="tess", password="pass12345")
+        self.salary = Category.objects.create(user=self.user, name="Salary", category_type="income")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        other = User.objects.create_user("otto")
+        self.foreign = Category.objects.create(user=other, name="Secret", category_type="expense")
+
+    def test_choices_are_the_users_grouped_by_type(self):
+        form = views.TransactionForm(user=self.user)
+        self.assertEqual(form.fields["category"].choices, [
+            ("", "---------"),
+            ("Income", [(self.salary.pk, "Salary")]),
+            ("Expense", [(self.food.pk, "Food")]),
+        ])
+
+    def test_render_and_submit_use_the_cached_choices(self):
+        self.client.get(reverse("transaction-add"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("transaction-add"))
+        self.assertNotContains(response, "Secret")
+        self.assertFalse([q for q in ctx.captured_queries if "fintrack_app_category" in q["sql"]])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("transaction-add"), {
+                "category": self.food.pk, "transaction_type": "expense", "amount": "12.50", "note": "",
+            })
+        self.assertRedirects(response, reverse("transaction-list"), fetch_redirect_response=False)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('SELECT') and
+                          'FROM "fintrack_app_category"' in q["sql"]])
+        self.assertEqual(Transaction.objects.get(user=self.user).category, self.food)
+
+    def test_other_users_categories_are_rejected(self):
+        response = self.client.post(reverse("transaction-add"), {
+            "category": self.foreign.pk, "transaction_type": "expense", "amount": "5",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("category", response.context["form"].errors)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_category_changes_invalidate_the_choices(self):
+        views.TransactionForm(user=self.user)
+        self.food.name = "Groceries"
+        self.food.save()
+        Category.objects.create(user=self.user, name="Bonus", category_type="income")
+        self.salary.delete()
+        form = views.TransactionForm(user=self.user)
+        self.assertEqual(form.fields["category"].choices[1:], [
+            ("Income", [(Category.objects.get(name="Bonus").pk, "Bonus")]),
+            ("Expense", [(self.food.pk, "Groceries")]),
+        ])
+
+    def test_edit_keeps_the_category_and_is_user_scoped(self):
+        t = Transaction.objects.create(user=self.user, category=self.food, transaction_type="expense",
+                                       amount=Decimal("3"))
+        response = self.client.get(reverse("transaction-edit", args=[t.pk]))
+        self.assertContains(response, f'<option value="{self.food.pk}" selected>Food</option>', html=True)
+
+        theirs = Transaction.objects.create(user=self.foreign.user, transaction_type="expense", amount=Decimal("3"))
+        self.assertEqual(self.client.get(reverse("transaction-edit", args=[theirs.pk])).status_code, 404)
+
+
+class ForecastTests(TestCase):
+    today = date(2026, 6, 15)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("fay", password="pass12345")
+        self.client.login(username="fay", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        self.salary = Category.objects.create(user=self.user, name="Salary", category_type="income")
+
+    def monthly(self, category, amounts, last=date(2026, 5, 1)):
+        # One transaction per month, the last one in `last`
+        months = forecasting.month_index(last)
+        for offset, amount in enumerate(reversed(amounts)):
+            day = forecasting.month_start(months - offset).replace(day=10)
+            Transaction.objects.create(
+                user=self.user, category=category, transaction_type=category.category_type, amount=Decimal(amount),
+                date=timezone.make_aware(datetime.combine(day, datetime.min.time())),
+            )
+
+    def test_flat_history_projects_flat(self):
+        self.monthly(self.food, ["100"] * 6)
+        self.monthly(self.salary, ["1000"] * 6)
+        result = forecasting.forecast(self.user, today=self.today)
+
+        self.assertEqual(result["months"][0], date(2026, 7, 1))
+        self.assertEqual(len(result["months"]), forecasting.HORIZON)
+        self.assertEqual(result["expense"], [100.0] * 12)
+        self.assertEqual(result["income"], [1000.0] * 12)
+        self.assertEqual(result["start_balance"], 5400.0)
+        self.assertEqual(result["balance"][0], 6300.0)
+        self.assertEqual(result["balance"][-1], 5400.0 + 12 * 900)
+
+    def test_trend_and_seasonality(self):
+        self.monthly(self.food, [str(100 + 10 * i) for i in range(12)])
+        self.assertEqual(forecasting.forecast(self.user, today=self.today)["expense"][:2], [220.0, 230.0])
+
+        # Two years where every December costs three times a normal month
+        values = [300.0 if m % 12 == 11 else 100.0 for m in range(24)]
+        projected = forecasting.project(values, forecasting.month_index(date(2024, 1, 1)))
+        self.assertGreater(projected[11], 2.5 * projected[0])
+
+    def test_recurring_rules_are_not_counted_twice(self):
+        rule = RecurringTransaction.objects.create(
+            user=self.user, category=self.food, transaction_type="expense", amount=Decimal("50"),
+            frequency="monthly", start_date=date(2025, 12, 5),
+        )
+        recurring.run(until=date(2026, 5, 31))
+        self.monthly(self.food, ["100"] * 6)
+
+        result = forecasting.forecast(self.user, today=self.today)
+        self.assertEqual(result["expense"], [150.0] * 12)
+        self.assertEqual(result["recurring"]["expense"], [50.0] * 12)
+
+        rule.end_date = date(2026, 8, 31)
+        rule.save()
+        self.assertEqual(forecasting.forecast(self.user, today=self.today)["expense"][:4], [150.0, 150.0, 100.0, 100.0])
+
+    def test_endpoint_is_cached_until_data_changes(self):
+        self.monthly(self.food, ["100"] * 3, last=forecasting.month_start(forecasting.month_index(date.today()) - 1))
+        response = self.client.get(reverse("forecast"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["expense"][0], 100.0)
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(reverse("forecast"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.assertNumQueries(0):
+            forecasting.forecast(self.user)
+
+        Transaction.objects.create(user=self.user, transaction_type="expense", amount=Decimal("1"))
+        self.assertEqual(self.client.get(reverse("forecast"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class GoalProjectionTests(TestCase):
+    today = date(2026, 6, 15)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("gus", password="pass12345")
+        self.client.login(username="gus", password="pass12345")
+
+    def monthly(self, transaction_type, amount, months):
+        # One transaction in each of the `months` months before today's
+        current = forecasting.month_index(self.today)
+        for offset in range(1, months + 1):
+            day = forecasting.month_start(current - offset).replace(day=10)
+            Transaction.objects.create(
+                user=self.user, transaction_type=transaction_type, amount=Decimal(amount),
+                date=timezone.make_aware(datetime.combine(day, datetime.min.time())),
+            )
+
+    def goal(self, title, target, current="0", deadline=None):
+        return Goal.objects.create(
+            user=self.user, title=title, goal_type="savings", target_amount=Decimal(target),
+            current_amount=Decimal(current), deadline=deadline,
+        )
+
+    def test_savings_go_to_goals_by_deadline(self):
+        self.monthly("income", "1000", 6)
+        self.monthly("expense", "400", 6)
+        car = self.goal("Car", "1200", deadline=date(2026, 8, 31))
+        house = self.goal("House", "3000", current="600", deadline=date(2026, 10, 31))
+        done = self.goal("Done", "500", current="500")
+        later = self.goal("Later", "100")
+        cache.clear()
+
+        with self.assertNumQueries(2):
+            projected = {goal.pk: goal.projection for goal in goals.project_goals(self.user, today=self.today)}
+        with self.assertNumQueries(0):
+            goals.project_goals(self.user, today=self.today)
+
+        self.assertEqual(projected[car.pk].completion, date(2026, 8, 1))
+        self.assertEqual(projected[car.pk].required_monthly, Decimal("600.00"))
+        self.assertTrue(projected[car.pk].on_track)
+        # Gets the savings only once the car is paid for
+        self.assertEqual(projected[house.pk].completion, date(2026, 12, 1))
+        self.assertEqual(projected[house.pk].required_monthly, Decimal("600.00"))
+        self.assertFalse(projected[house.pk].on_track)
+        self.assertEqual(projected[house.pk].progress, Decimal("20"))
+        self.assertEqual(projected[done.pk].remaining, 0)
+        self.assertIsNone(projected[done.pk].required_monthly)
+        self.assertEqual(projected[later.pk].completion, date(2027, 1, 1))
+
+    def test_short_history_and_no_savings(self):
+        self.monthly("income", "900", 2)
+        self.monthly("expense", "300", 2)
+        self.assertEqual(goals.savings_rate(self.user.pk, self.today), Decimal("600"))
+
+        self.monthly("expense", "600", 2)
+        goal = self.goal("Trip", "100")
+        self.assertIsNone(goals.project_goals(self.user, today=self.today)[0].projection.completion)
+        self.assertEqual(goal.pk, goals.project_goals(self.user, today=self.today)[0].pk)
+
+    def test_list_and_dashboard_share_projections(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        trip = self.goal("Trip", "100", deadline=forecasting.month_start(forecasting.month_index(timezone.localdate()) + 3))
+        response = self.client.get(reverse("goal-list"))
+        self.assertEqual(response.context["goals"][0].projection.required_monthly, Decimal("33.33"))
+
+        with self.assertNumQueries(0):
+            goals.project_goals(self.user)
+        dashboard = self.client.get(reverse("dashboard"))
+        self.assertEqual(dashboard.context["goals"][0].projection.progress, 0)
+
+        trip.current_amount = Decimal("50")
+        trip.save()
+        self.assertEqual(goals.project_goals(self.user)[0].projection.progress, Decimal("50"))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("abe", password="pass12345")
+        self.client.login(username="abe", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        old = timezone.now() - timedelta(days=archive.ARCHIVE_AFTER_DAYS + 30)
+        self.old = [
+            Transaction.objects.create(user=self.user, category=self.food, transaction_type=kind,
+                                       amount=Decimal(amount), date=old + timedelta(days=i), note=f"old {kind} {i}")
+            for i, (kind, amount) in enumerate((("income", "500"), ("expense", "20"), ("expense", "30"), ("income", "5")))
+        ]
+        self.recent = [
+            Transaction.objects.create(user=self.user, category=self.food, transaction_type="expense",
+                                       amount=Decimal("7"), note=f"recent {i}")
+            for i in range(2)
+        ]
+
+    def test_moves_old_rows_and_keeps_totals(self):
+        rollup_rows = sorted(MonthlySummary.objects.values_list("month", "transaction_type", "total", "count"))
+        balance = ledger.balance(self.user.pk)
+        first_day = timezone.localdate(self.old[0].date)
+        daily = analytics.series(self.user, first_day, first_day + timedelta(days=7), "day")
+
+        result = archive.run(batch_size=3)
+        self.assertEqual((result.archived, result.batches), (4, 2))
+        self.assertEqual(set(Transaction.objects.values_list("id", flat=True)), {t.pk for t in self.recent})
+        archived = ArchivedTransaction.objects.get(pk=self.old[1].pk)
+        self.assertEqual((archived.amount, archived.note, archived.created_at),
+                         (Decimal("20.00"), "old expense 1", self.old[1].created_at))
+
+        # Nothing left to do on a rerun
+        self.assertEqual(archive.run().archived, 0)
+
+        self.assertEqual(sorted(MonthlySummary.objects.values_list("month", "transaction_type", "total", "count")),
+                         rollup_rows)
+        self.assertEqual(rollups.check(), [])
+        self.assertEqual(ledger.balance(self.user.pk), balance)
+        self.assertEqual(ledger.expected_balance(self.user.pk), balance)
+        cache.clear()
+        self.assertEqual(analytics.series(self.user, first_day, first_day + timedelta(days=7), "day"), daily)
+
+    def test_archived_rows_stay_searchable_and_exported(self):
+        archive.run()
+        self.assertEqual(search.search(self.user, "old").count(), 0)
+        self.assertEqual(search.search(self.user, "old expense", archived=True).count(), 2)
+
+        self.food.name = "Groceries"
+        self.food.save()
+        self.assertEqual(search.search(self.user, "groceries", archived=True).count(), 4)
+
+        response = self.client.get(reverse("transaction-search"), {"q": "old", "archived": "on"})
+        self.assertEqual(len(response.context["transactions"]), 4)
+        self.assertContains(response, "Archived")
+
+        response = self.client.get(reverse("transaction-export"))
+        lines = b"".join(response.streaming_content).decode().splitlines()[1:]
+        self.assertEqual([int(line.split(",")[0]) for line in lines], [t.pk for t in self.old + self.recent])
+
+        self.user.delete()
+        self.assertFalse(TransactionSearch.objects.exists())
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_job_storage(self)
+        self.user = User.objects.create_user("jack", password="pass12345")
+        self.other = User.objects.create_user("kate", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        jobs.HANDLERS["test"] = self.failing
+        self.addCleanup(jobs.HANDLERS.pop, "test")
+
+    def failing(self, job, report):
+        raise ValueError("boom")
+
+    def test_claim_limits_running_jobs_per_user(self):
+        first = jobs.enqueue("rebuild_rollups", self.user)
+        second = jobs.enqueue("rebuild_rollups", self.user)
+        third = jobs.enqueue("rebuild_rollups", self.other)
+
+        self.assertEqual(jobs.claim("w1").pk, first.pk)
+        # jack already has a running job, kate's is next
+        self.assertEqual(jobs.claim("w1").pk, third.pk)
+        self.assertIsNone(jobs.claim("w1"))
+
+        jobs.execute(Job.objects.get(pk=first.pk))
+        claimed = jobs.claim("w2")
+        self.assertEqual((claimed.pk, claimed.status, claimed.worker, claimed.attempts),
+                         (second.pk, "running", "w2", 1))
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        job = jobs.enqueue("test", self.user, max_attempts=2)
+
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ("queued", 1, "ValueError: boom"))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=jobs.RETRY_DELAY - 5))
+        # Not due yet
+        self.assertIsNone(jobs.run_next())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_running_job_is_requeued(self):
+        job = jobs.enqueue("rebuild_rollups", self.user, max_attempts=2)
+        jobs.claim("gone")
+        stale = timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 1)
+        Job.objects.filter(pk=job.pk).update(heartbeat=stale)
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), ("queued", ""))
+
+        jobs.claim("gone")
+        Job.objects.filter(pk=job.pk).update(heartbeat=stale)
+        jobs.requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_import_resumes_after_reported_progress(self):
+        name = jobs.storage.save("imports/statement.csv", StringIO(ImportTests.CSV))
+        job = jobs.enqueue("import", self.user, {"file": name, "file_format": "csv", "date_format": ""})
+        # An earlier attempt committed the first two rows before its worker died
+        Transaction.objects.create(user=self.user, category=self.food, transaction_type="expense",
+                                   amount=Decimal("12.50"), date=timezone.now(), note="lunch")
+        Transaction.objects.create(user=self.user, category=self.food, transaction_type="expense",
+                                   amount=Decimal("8.00"), date=timezone.now(), note="snack")
+        Job.objects.filter(pk=job.pk).update(
+            progress=2, result={"processed": 2, "created": 2, "rejected_count": 0, "rejected": []},
+        )
+
+        job = jobs.run_next()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual((job.result["processed"], job.result["created"], job.result["rejected_count"]), (6, 3, 3))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_export_job_and_download(self):
+        Transaction.objects.create(user=self.user, category=self.food, transaction_type="expense",
+                                   amount=Decimal("12.50"), date=timezone.now(), note="lunch")
+        self.client.login(username="jack", password="pass12345")
+        response = self.client.post(reverse("export-job"), {"format": "csv"})
+        job = Job.objects.get(user=self.user, kind="export")
+        self.assertRedirects(response, reverse("job-detail", args=[job.pk]))
+
+        status = self.client.get(reverse("job-status", args=[job.pk])).json()
+        self.assertEqual(status["status"], "queued")
+        self.assertNotIn("download_url", status)
+
+        jobs.run_next()
+        status = self.client.get(reverse("job-status", args=[job.pk])).json()
+        self.assertEqual(status["status"], "succeeded")
+        response = self.client.get(status["download_url"])
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn(b"lunch", b"".join(response.streaming_content))
+
+        self.client.login(username="kate", password="pass12345")
+        self.assertEqual(self.client.get(reverse("job-status", args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("job-download", args=[job.pk])).status_code, 404)
+
+    def test_undecodable_upload_fails_at_once_and_is_deleted(self):
+        name = jobs.storage.save("imports/statement.csv", ContentFile("Date,Amount\n2025-01-01,5\n\xe9\n".encode("latin-1")))
+        job = jobs.enqueue("import", self.user, {"file": name, "file_format": "csv", "date_format": ""})
+
+        job = jobs.run_next()
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+        self.assertIn("not UTF-8", job.error)
+        self.assertFalse(jobs.storage.exists(name))
+
+    def test_outcome_that_cannot_be_recorded_leaves_the_job_running(self):
+        job = jobs.enqueue("rebuild_rollups", self.user)
+        job = jobs.claim("w1")
+        with mock.patch.object(jobs.Job.objects, "filter", side_effect=DatabaseError("database is locked")):
+            with self.assertLogs("fintrack.jobs", "ERROR"):
+                jobs.execute(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "running")
+
+    def test_prune_deletes_old_jobs_and_their_files(self):
+        old = jobs.enqueue("export", self.user, {"export": "transactions_csv"})
+        jobs.run_next()
+        recent = jobs.enqueue("export", self.user, {"export": "transactions_csv"})
+        jobs.run_next()
+        old.refresh_from_db()
+        Job.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=jobs.RETENTION_DAYS + 1))
+
+        self.assertEqual(jobs.prune(), 1)
+        self.assertFalse(jobs.storage.exists(old.result["file"]))
+        self.assertEqual(list(Job.objects.values_list("pk", flat=True)), [recent.pk])
+
+    def test_queue_option_of_rebuild_rollups(self):
+        call_command("rebuild_rollups", "--queue", stdout=StringIO())
+        job = Job.objects.get(kind="rebuild_rollups")
+        self.assertIsNone(job.user)
+        self.assertEqual(jobs.run_next().status, "succeeded")
+
+
+class JobWorkerTests(TransactionTestCase):
+    def test_worker_drains_the_queue_on_its_threads(self):
+        use_temporary_job_storage(self)
+        users = [User.objects.create_user(f"worker{n}", password="pass12345") for n in range(3)]
+        for user in users:
+            jobs.enqueue("export", user, {"export": "transactions_json"})
+            jobs.enqueue("rebuild_rollups", user)
+
+        jobs.Worker(threads=2, poll_interval=0.05, name="test").run(drain=True)
+
+        self.assertEqual(Job.objects.filter(status="succeeded").count(), 6)
+        self.assertFalse(Job.objects.exclude(worker="test").exists())
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_worker_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, "Configure a cache shared between processes."):
+            call_command("run_jobs", "--drain", stdout=StringIO())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("hank", password="pass12345")
+        self.client.login(username="hank", password="pass12345")
+        self.food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        for month, amount, category in ((1, "10.00", self.food), (2, "20.00", None), (3, "30.00", self.food)):
+            Transaction.objects.create(user=self.user, category=category, transaction_type="expense",
+                                       amount=Decimal(amount), date=datetime(2025, month, 5, 12, tzinfo=dt_timezone.utc),
+                                       note="x,y")
+        Budget.objects.create(user=self.user, monthly_limit=100, month="2025-02-01")
+        Debt.objects.create(user=self.user, title="Loan", debt_type="lent",
+                            total_amount=10, remaining_amount=5, start_date="2025-02-10")
+        Transaction.objects.create(user=User.objects.create_user("ivy"), transaction_type="income", amount=1)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_with_filters(self):
+        response = self.client.get(reverse("transaction-export"), {"start": "2025-01-01", "end": "2025-02-28"})
+        lines = self.content(response).decode().splitlines()
+        self.assertEqual(lines[0], "id,date,transaction_type,amount,category,note")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith('10.00,Food,"x,y"'))
+
+        response = self.client.get(reverse("transaction-export"), {"category": self.food.pk})
+        self.assertEqual(len(self.content(response).decode().splitlines()), 3)
+
+    def test_gzip_json(self):
+        response = self.client.get(reverse("transaction-export"), {"format": "json", "gzip": "1"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        rows = json.loads(gzip.decompress(self.content(response)))
+        self.assertEqual([r["amount"] for r in rows], ["10.00", "20.00", "30.00"])
+
+    def test_account_json(self):
+        response = self.client.get(reverse("account-export"), {"start": "2025-02-01"})
+        data = json.loads(self.content(response))
+        self.assertEqual(len(data["transactions"]), 2)
+        self.assertEqual(len(data["budgets"]), 1)
+        self.assertEqual(data["debts"][0]["title"], "Loan")
+        self.assertEqual(data["goals"], [])
+
+    def test_bad_filter(self):
+        response = self.client.get(reverse("transaction-export"), {"start": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.csv.gz")
+            call_command("export_data", "hank", "--gzip", "-o", path)
+            with gzip.open(path, "rt") as f:
+                self.assertEqual(len(f.read().splitlines()), 4)
+
+
+class BenchmarkTests(TestCase):
+    def test_seed(self):
+        [user_id] = benchmarks.seed(users=1, categories=6, transactions=250, batch_size=100, seed=1)
+        self.assertEqual(Transaction.objects.filter(user_id=user_id).count(), 250)
+        self.assertEqual(Category.objects.filter(user_id=user_id).count(), 6)
+        self.assertEqual(rollups.check([user_id]), [])
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_run_rolls_back(self):
+        results = benchmarks.run(sizes=[50], repeat=1, names=["dashboard (cold cache)", "transaction list"])
+        self.assertEqual([r["name"] for r in results["results"]], ["dashboard (cold cache)", "transaction list"])
+        self.assertFalse(User.objects.filter(username__startswith="bench_").exists())
+        self.assertEqual(benchmarks.compare(results, results)[0][-1], 0)
+
+    def test_sqlite_concurrency(self):
+        result = benchmarks.sqlite_concurrency(settings.SQLITE_PRAGMAS, duration=0.3, readers=1, rows=1000)
+        self.assertGreater(result["reads_per_sec"], 0)
+        self.assertGreater(result["writes_per_sec"], 0)
+
+
+class SQLiteSettingsTests(TestCase):
+    def test_pragmas_applied_to_connections(self):
+        with connection.cursor() as cursor:
+            for name, expected in (("synchronous", 1), ("temp_store", 2), ("busy_timeout", 5000),
+                                   ("cache_size", settings.SQLITE_PRAGMAS["cache_size"])):
+                cursor.execute(f"PRAGMA {name}")
+                self.assertEqual(cursor.fetchone()[0], expected, name)
+            # Set once by migration 0015
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.root = Path(directory.name)
+        settings_override = override_settings(STATIC_ROOT=cls.root)
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def middleware(self):
+        return StaticFilesMiddleware(lambda request: HttpResponse("view"))
+
+    def test_collectstatic_writes_hashed_and_compressed_copies(self):
+        hashed = staticfiles_storage.hashed_files["css/style.css"]
+        self.assertRegex(hashed, r"^css/style\.[0-9a-f]{12}\.css$")
+        original = (self.root / hashed).read_bytes()
+        self.assertEqual(gzip.decompress((self.root / (hashed + ".gz")).read_bytes()), original)
+        # Only text formats are compressed
+        self.assertFalse(list(self.root.glob("admin/img/LICENSE*.gz")))
+
+        html = render_to_string("fintrack_app/base.html")
+        self.assertIn(f'href="/static/{hashed}"', html)
+        self.assertNotIn('"/static/css/style.css"', html)
+        self.assertEqual(staticfiles.check_static_references(None), [])
+
+    def test_hashed_files_are_immutable_and_negotiate_encoding(self):
+        url = static("js/dashboard-charts.js")
+        response = self.middleware()(RequestFactory().get(url, HTTP_ACCEPT_ENCODING="gzip, deflate"))
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertIn("javascript", response["Content-Type"])
+        self.assertNotIn("Content-Disposition", response)
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, (settings.BASE_DIR / "static/js/dashboard-charts.js").read_bytes())
+
+        response = self.middleware()(RequestFactory().get(url, HTTP_ACCEPT_ENCODING="gzip;q=0"))
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_plain_names_are_revalidated(self):
+        middleware = self.middleware()
+        response = middleware(RequestFactory().get("/static/css/style.css"))
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.STATIC_MAX_AGE}")
+        response = middleware(RequestFactory().get(
+            "/static/css/style.css", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        ))
+        self.assertEqual(response.status_code, 304)
+        # Anything else goes on to the views
+        self.assertEqual(middleware(RequestFactory().get("/static/missing.css")).content, b"view")
+
+    def test_check_reports_names_without_a_hashed_copy(self):
+        hashed_files = staticfiles_storage.hashed_files
+        entry = hashed_files.pop("css/style.css")
+        self.addCleanup(hashed_files.__setitem__, "css/style.css", entry)
+        errors = staticfiles.check_static_references(None)
+        self.assertEqual([error.id for error in errors], ["fintrack.E002"])
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("jack", password="pass12345")
+        self.client.login(username="jack", password="pass12345")
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("fintrack.performance", "INFO") as logs:
+            response = self.client.get(reverse("transaction-list"))
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="2 queries"')
+        for metric in ("tpl", "view", "total"):
+            self.assertIn(f"{metric};dur=", timing)
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line["path"], line["status"], line["queries"]), (reverse("transaction-list"), 200, 2))
+        self.assertGreater(line["template_ms"], 0)
+
+    def test_log_line_is_not_built_when_info_is_off(self):
+        with mock.patch("fintrack_app.middleware.json.dumps") as dumps:
+            response = self.client.get(reverse("transaction-list"))
+        self.assertTrue(response.has_header("Server-Timing"))
+        dumps.assert_not_called()
+
+    @override_settings(PERFORMANCE_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("transaction-list"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_sampled_profile_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PERFORMANCE_PROFILE_SAMPLE_RATE=1, PERFORMANCE_PROFILE_THRESHOLD_MS=0,
+                                   PERFORMANCE_PROFILE_DIR=directory):
+                self.client.get(reverse("dashboard"))
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("kate", password="pass12345")
+        self.client.login(username="kate", password="pass12345")
+
+    def assertBalance(self, expected):
+        self.assertEqual(ledger.balance(self.user.pk), Decimal(expected))
+        self.assertEqual(ledger.expected_balance(self.user.pk), Decimal(expected))
+        total = LedgerEntry.objects.filter(user=self.user).aggregate(total=Sum("amount"))["total"]
+        self.assertEqual(total or 0, Decimal(expected))
+
+    def test_admin_cannot_edit_derived_rows(self):
+        admin_user = User.objects.create_superuser("root", password="pass12345")
+        self.client.force_login(admin_user)
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("40"))
+        entry = LedgerEntry.objects.get(user=self.user)
+
+        self.assertEqual(self.client.get(reverse("admin:fintrack_app_ledgerentry_add")).status_code, 403)
+        self.assertEqual(self.client.post(reverse("admin:fintrack_app_ledgerentry_delete", args=[entry.pk]),
+                                          {"post": "yes"}).status_code, 403)
+        self.assertEqual(self.client.get(reverse("admin:fintrack_app_monthlysummary_add")).status_code, 403)
+
+        profile = self.user.userprofile
+        self.client.post(reverse("admin:fintrack_app_userprofile_change", args=[profile.pk]),
+                         {"user": self.user.pk, "full_name": "Kate", "balance": "999"})
+        profile.refresh_from_db()
+        self.assertEqual((profile.full_name, profile.balance), ("Kate", Decimal("40")))
+        self.assertBalance("40")
+
+    def test_follows_transactions_debts_and_goals(self):
+        income = Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("500"))
+        expense = Transaction.objects.create(user=self.user, transaction_type="expense", amount=Decimal("120"))
+        self.assertBalance("380")
+
+        expense.amount = Decimal("20")
+        expense.save()
+        income.transaction_type = "expense"
+        income.save()
+        self.assertBalance("-520")
+        income.delete()
+        self.assertBalance("-20")
+
+        debt = Debt.objects.create(user=self.user, title="Loan", debt_type="borrowed", start_date="2026-01-01",
+                                   total_amount=Decimal("100"), remaining_amount=Decimal("100"))
+        self.assertBalance("-120")
+        debt.debt_type = "lent"
+        debt.save()
+        self.assertBalance("80")
+
+        goal = Goal.objects.create(user=self.user, title="Bike", goal_type="purchase",
+                                   target_amount=Decimal("300"), current_amount=Decimal("50"))
+        self.assertBalance("30")
+        goal.delete()
+        debt.delete()
+        self.assertBalance("-20")
+
+    def test_goal_cannot_overdraw(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        response = self.client.post(reverse("goal-add"), {
+            "title": "Car", "goal_type": "purchase", "target_amount": "5000", "current_amount": "150",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Not enough balance.", response.context["form"].errors["current_amount"])
+        self.assertFalse(Goal.objects.exists())
+        self.assertBalance("100")
+
+    def test_balance_at_uses_snapshots(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        snapshot = ledger.take_snapshot(self.user.pk)
+        self.assertIsNone(ledger.take_snapshot(self.user.pk))
+        Transaction.objects.create(user=self.user, transaction_type="expense", amount=Decimal("30"))
+
+        self.assertEqual(snapshot.balance, Decimal("100"))
+        self.assertEqual(ledger.balance_at(self.user.pk, timezone.now()), Decimal("70"))
+        self.assertEqual(ledger.balance_at(self.user.pk, snapshot.as_of), Decimal("100"))
+
+    def test_reconcile_command(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        UserProfile.objects.filter(user=self.user).update(balance=Decimal("0"))
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_balances", stdout=StringIO())
+        call_command("reconcile_balances", "--fix", stdout=StringIO())
+        self.assertEqual(ledger.balance(self.user.pk), Decimal("100"))
+        self.assertEqual(LedgerEntry.objects.filter(user=self.user, source="adjustment").get().amount, Decimal("100"))
+
+    def test_reconcile_refreshes_the_dashboard(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        UserProfile.objects.filter(user=self.user).update(balance=Decimal("0"))
+        self.assertEqual(self.client.get(reverse("dashboard")).context["balance"], Decimal("0"))
+
+        ledger.reconcile(self.user.pk)
+        self.assertEqual(self.client.get(reverse("dashboard")).context["balance"], Decimal("100"))
+
+    def test_user_deletion(self):
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("100"))
+        Goal.objects.create(user=self.user, title="Bike", goal_type="purchase",
+                            target_amount=Decimal("300"), current_amount=Decimal("50"))
+        self.user.delete()
+        self.assertFalse(LedgerEntry.objects.exists())
+
+
+class ConcurrentLedgerTests(TransactionTestCase):
+    def test_concurrent_writers(self):
+        user = User.objects.create_user("liam", password="pass12345")
+        Transaction.objects.create(user=user, transaction_type="income", amount=Decimal("100"))
+        errors = []
+
+        def spend():
+            try:
+                for _ in range(5):
+                    Transaction.objects.create(user=user, transaction_type="expense", amount=Decimal("1"))
+                try:
+                    Goal.objects.create(user=user, title="Trip", goal_type="savings",
+                                        target_amount=Decimal("100"), current_amount=Decimal("40"))
+                except ledger.InsufficientBalance:
+                    pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=spend) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # 100 - 20 leaves room for exactly two goals of 40
+        self.assertEqual(Goal.objects.filter(user=user).count(), 2)
+        self.assertEqual(ledger.balance(user.pk), Decimal("0"))
+        self.assertEqual(ledger.expected_balance(user.pk), Decimal("0"))
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("mia", password="pass12345")
+        food = Category.objects.create(user=self.user, name="Food", category_type="expense")
+        Transaction.objects.create(user=self.user, transaction_type="income", amount=Decimal("900"))
+        Transaction.objects.create(user=self.user, category=food, transaction_type="expense", amount=Decimal("40"))
+        Debt.objects.create(user=self.user, title="Car", debt_type="lent", start_date="2026-01-01",
+                            total_amount=Decimal("100"), remaining_amount=Decimal("60"))
+
+    async def test_parallel_queries_match_sync_context(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs("fintrack.performance", "INFO") as logs:
+            response = await self.async_client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+        expected = await sync_to_async(views.dashboard_context)(self.user)
+        for key in ("balance", "income", "expense", "saved", "today_count", "budget"):
+            self.assertEqual(response.context[key], expected[key], key)
+        self.assertEqual(response.context["balance"], Decimal("920"))
+        # Queries made on the worker threads are still counted
+        self.assertGreaterEqual(json.loads(logs.records[-1].getMessage())["queries"], len(views.DASHBOARD_QUERIES))
+
+    def test_serve_concurrency(self):
+        results = benchmarks.serve_concurrency(clients=2, requests=2, transactions=50)
+        self.assertEqual([r["mode"] for r in results["results"]], ["wsgi", "asgi"])
+        self.assertTrue(all(r["requests"] == 4 for r in results["results"]))
+        self.assertFalse(User.objects.filter(username__startswith="bench_").exists())
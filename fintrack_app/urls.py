@@ -6,6 +6,15 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/charts/', views.dashboard_charts, name='dashboard-charts'),
+    path('export/', views.account_export, name='account-export'),
+    path('analytics/series/', views.analytics_series, name='analytics-series'),
+    path('forecast/', views.forecast, name='forecast'),
+
+    path('jobs/export/', views.export_job, name='export-job'),
+    path('jobs/<int:pk>/', views.job_detail, name='job-detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job-status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job-download'),
 
     path('categories/', views.CategoryListView.as_view(), name='category-list'),
     path('categories/add/', views.CategoryCreateView.as_view(), name='category-add'),
@@ -14,9 +23,16 @@ urlpatterns = [
 
     path('transactions/', views.TransactionListView.as_view(), name='transaction-list'),
     path('transactions/add/', views.TransactionCreateView.as_view(), name='transaction-add'),
+    path('transactions/search/', views.transaction_search, name='transaction-search'),
+    path('transactions/import/', views.transaction_import, name='transaction-import'),
+    path('transactions/export/', views.transaction_export, name='transaction-export'),
     path('transactions/<int:pk>/edit/', views.TransactionUpdateView.as_view(), name='transaction-edit'),
     path('transactions/<int:pk>/delete/', views.TransactionDeleteView.as_view(), name='transaction-delete'),
 
+    path('recurring/', views.RecurringTransactionListView.as_view(), name='recurring-list'),
+    path('recurring/add/', views.RecurringTransactionCreateView.as_view(), name='recurring-add'),
+    path('recurring/<int:pk>/delete/', views.RecurringTransactionDeleteView.as_view(), name='recurring-delete'),
+
     path('budgets/', views.BudgetListView.as_view(), name='budget-list'),
     path('budgets/add/', views.BudgetCreateView.as_view(), name='budget-add'),
     path('budgets/<int:pk>/edit/', views.BudgetUpdateView.as_view(), name='budget-edit'),
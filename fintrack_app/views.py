@@ -1,16 +1,28 @@
 from collections import defaultdict
-from django.shortcuts import render, redirect
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from django.db.models import Sum
+from django.urls import reverse, reverse_lazy
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from .forms import BudgetForm, DebtForm
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from .forms import (
+    AnalyticsForm, BudgetForm, DebtForm, RecurringTransactionForm, TransactionForm, TransactionImportForm,
+    TransactionSearchForm, ExportForm,
+)
 from django.contrib.auth.forms import AuthenticationForm
-from .models import UserProfile, Category, Transaction, Budget, Debt, Goal
+from django.utils import timezone
+from .models import Category, Transaction, Budget, Debt, Goal, Job, MonthlySummary, RecurringTransaction
+from . import analytics, caching, concurrency, exporters, forecasting, goals, jobs, ledger, rollups, search
+from .pagination import KeysetPaginationMixin
 from datetime import datetime, timedelta, date
-import json
+import uuid
 # Create your views here.
 
 def login_view(request):
@@ -32,124 +44,98 @@ def logout_view(request):
     return render(request, 'fintrack_app/logout.html')
 
 @login_required
-def dashboard(request):
-    user = request.user
-    profile, created = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={"full_name": user.username}
-        )
-    
-    today = date.today()
-    # All user transactions
-    transactions = Transaction.objects.filter(user=user)
+async def dashboard(request):
+    # Served from the per-user cache until any of the user's data changes
+    user = await request.auser()
+    # auser() and request.user cache separately, share the loaded user with the templates
+    request.user = user
+    context = await caching.aget_dashboard(
+        user.pk, lambda: adashboard_context(user)
+    )
+    return await sync_to_async(render)(request, "fintrack_app/dashboard.html", context)
 
-    #Income & Expense
-    income = transactions.filter(
-        transaction_type="income"
-    ).aggregate(total=Sum("amount"))["total"] or 0
+# Dashboard queries: each is independent of the others, so the async view can run them at once
 
-    expense = transactions.filter(
-        transaction_type="expense"
-    ).aggregate(total=Sum("amount"))["total"] or 0
+def _dashboard_profile(user):
+    # Usually attached by auth.load_user
+    return user.userprofile
 
-    saved = income - expense
+def _dashboard_totals(user):
+    # Monthly rollups, kept in step with transactions (see rollups.py)
+    month_start = rollups.month_of(timezone.now())
+
+    #Income & Expense (one conditional aggregate over the rollups)
+    return MonthlySummary.objects.filter(user=user).aggregate(
+        income=Sum("total", filter=Q(transaction_type="income")),
+        expense=Sum("total", filter=Q(transaction_type="expense")),
+        monthly_expense=Sum("total", filter=Q(transaction_type="expense", month=month_start)),
+    )
 
+def _dashboard_today_count(user):
     # Today's Transaction Count
+    today = date.today()
     start = datetime(today.year, today.month, today.day)
     end = start + timedelta(days=1)
 
-    today_count = transactions.filter(date__gte=start, date__lt=end).count()
-
-    # Monthly Expense
-    month_start = datetime(today.year, today.month, 1)
-    next_month = (month_start + timedelta(days=32)).replace(day=1)
-
-    monthly_expense = transactions.filter(
-        transaction_type="expense",
-        date__gte=month_start,
-        date__lt=next_month
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
+    return Transaction.objects.filter(user=user, date__gte=start, date__lt=end).count()
 
-    # Monthly Budget 
-    budget = Budget.objects.filter(
+def _dashboard_budget(user):
+    # Monthly Budget (a range on month, so the index can be used)
+    budget_month = date.today().replace(day=1)
+    return Budget.objects.filter(
         user=user,
-        month__year=today.year,
-        month__month=today.month
+        month__gte=budget_month,
+        month__lt=(budget_month + timedelta(days=32)).replace(day=1)
     ).aggregate(total=Sum("monthly_limit"))["total"] or 0
 
-    budget_left = budget - monthly_expense
-
-    #Category Expenses 
-    category_expenses = transactions.filter(
-        transaction_type="expense"
-    ).values("category__name").annotate(
-        total=Sum("amount")
-    )
-    category_labels = json.dumps(
-        [c["category__name"] for c in category_expenses]
-    )
-
-    category_totals = json.dumps(
-       [float(c["total"]) for c in category_expenses]
-     )
-    
-    # Income & Expense by Category bar graph
-    category_map = defaultdict(lambda: {"income": 0, "expense": 0})
-
-    for t in transactions:
-        if t.category:
-            if t.transaction_type == "income":
-                category_map[t.category.name]["income"] += float(t.amount)
-            else:
-                category_map[t.category.name]["expense"] += float(t.amount)
-
-    all_labels = list(category_map.keys())
-    income_data = [round(category_map[label]["income"], 2) for label in all_labels]
-    expense_data = [round(category_map[label]["expense"], 2) for label in all_labels]
+def _dashboard_category_totals(user):
+    # Category totals per type, shared by the pie and the bar graph
+    return list(MonthlySummary.objects.filter(user=user).values(
+        "category__name", "transaction_type"
+    ).annotate(
+        total=Sum("total")
+    ).order_by("category__name"))
 
+def _dashboard_transactions(user):
     #Recent Transactions
-    recent_transactions = transactions.select_related(
+    return list(Transaction.objects.filter(user=user).select_related(
         "category"
-    ).order_by("-date")[:8]
-
-    # Goals
-    goals = Goal.objects.filter(user=user).order_by("-created_at")[:4]
+    ).order_by("-date")[:8])
 
-    for goal in goals:
-        if goal.target_amount and goal.target_amount != 0:
-            percentage = (goal.current_amount / goal.target_amount) * 100
-            goal.progress_percentage = min(percentage, 100)
-        else:
-            goal.progress_percentage = 0
+def _dashboard_goals(user):
+    return goals.project_goals(user)[:4]
 
+def _dashboard_debts(user):
     #Debt Chart Data
-    debts = Debt.objects.filter(user=request.user)
-    debt_labels = []
-    debt_totals = []
-    debt_types = []
+    return list(Debt.objects.filter(user=user).values_list("title", "remaining_amount", "debt_type"))
 
-    for debt in debts:
-        debt_labels.append(debt.title)
-        debt_totals.append(float(debt.remaining_amount))
-        debt_types.append(debt.debt_type)
+DASHBOARD_QUERIES = {
+    "profile": _dashboard_profile,
+    "totals": _dashboard_totals,
+    "today_count": _dashboard_today_count,
+    "budget": _dashboard_budget,
+    "transactions": _dashboard_transactions,
+    "goals": _dashboard_goals,
+}
 
+def dashboard_context(user):
+    return _dashboard_context(**{name: query(user) for name, query in DASHBOARD_QUERIES.items()})
 
-    # Calculate REAL total balance
+async def adashboard_context(user):
+    results = await concurrency.gather(*(partial(query, user) for query in DASHBOARD_QUERIES.values()))
+    return _dashboard_context(**dict(zip(DASHBOARD_QUERIES, results)))
 
-    base_balance = profile.balance or 0
+def _dashboard_context(profile, totals, today_count, budget, transactions, goals):
+    income = totals["income"] or 0
+    expense = totals["expense"] or 0
+    monthly_expense = totals["monthly_expense"] or 0
 
-    # Total borrowed debts
-    borrowed_debts = Debt.objects.filter(user=user, debt_type="borrowed").aggregate(total=Sum("remaining_amount"))["total"] or 0
-
-    # Total lent debts
-    lent_debts = Debt.objects.filter(user=user, debt_type="lent").aggregate(total=Sum("remaining_amount"))["total"] or 0
+    saved = income - expense
 
-    # Total money allocated to goals
-    allocated_goals = Goal.objects.filter(user=user).aggregate(total=Sum("current_amount"))["total"] or 0
+    budget_left = budget - monthly_expense
 
-    # Real total balance
-    total_balance = income- expense - borrowed_debts + lent_debts - allocated_goals
+    # Real total balance (income - expense + lent - borrowed - goals), kept by the balance ledger
+    total_balance = profile.balance
 
     context = {
         "profile": profile,
@@ -162,19 +148,85 @@ def dashboard(request):
         "budget": budget,
         "goals":goals,
         "budget_left": budget_left,
-        "category_expenses": category_expenses,
-        "category_labels": category_labels,
-        "category_totals": category_totals,
-        "transactions": recent_transactions,
-        "debt_labels": json.dumps(debt_labels),
-        "debt_totals": json.dumps(debt_totals),
-        "debt_types": json.dumps(debt_types),
-        "income_cat_labels": json.dumps(all_labels),
-        "income_cat_totals": json.dumps(income_data),
-        "expense_cat_totals": json.dumps(expense_data),
+        "transactions": transactions,
+    }
+
+    return context
+
+def dashboard_charts_data(user):
+    """Series for the dashboard charts, fetched by dashboard-charts.js once the page has painted."""
+    #Category Expenses 
+    category_expenses = []
+    # Income & Expense by Category bar graph
+    category_map = defaultdict(lambda: {"income": 0, "expense": 0})
+
+    for c in _dashboard_category_totals(user):
+        if c["transaction_type"] == "expense":
+            category_expenses.append(c)
+        if c["category__name"] is not None:
+            category_map[c["category__name"]][c["transaction_type"]] += float(c["total"])
+
+    all_labels = list(category_map.keys())
+
+    debt_labels = []
+    debt_totals = []
+    debt_types = []
+
+    for title, remaining_amount, debt_type in _dashboard_debts(user):
+        debt_labels.append(title)
+        debt_totals.append(float(remaining_amount))
+        debt_types.append(debt_type)
+
+    return {
+        "income_expense": {
+            "labels": all_labels,
+            "income": [round(category_map[label]["income"], 2) for label in all_labels],
+            "expense": [round(category_map[label]["expense"], 2) for label in all_labels],
+        },
+        "category_expenses": {
+            "labels": [c["category__name"] for c in category_expenses],
+            "values": [float(c["total"]) for c in category_expenses],
+        },
+        "debts": {
+            "labels": debt_labels,
+            "values": debt_totals,
+            "types": debt_types,
+        },
     }
 
-    return render(request, "fintrack_app/dashboard.html", context)
+def _dashboard_charts_etag(request):
+    # Changes whenever any of the user's data does, so unchanged charts are answered with a 304
+    return f'"charts-{request.user.pk}-{caching.data_version(request.user.pk)}"'
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_dashboard_charts_etag)
+def dashboard_charts(request):
+    return JsonResponse(dashboard_charts_data(request.user))
+
+def _forecast_etag(request):
+    # The forecast starts next month, so it also changes when the month turns
+    return f'"forecast-{request.user.pk}-{caching.data_version(request.user.pk)}-{timezone.localdate():%Y-%m}"'
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_forecast_etag)
+def forecast(request):
+    return JsonResponse(forecasting.forecast(request.user))
+
+@login_required
+def analytics_series(request):
+    form = AnalyticsForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    return JsonResponse(analytics.series(
+        request.user,
+        form.cleaned_data["start"],
+        form.cleaned_data["end"],
+        form.cleaned_data["granularity"],
+        form.cleaned_data["category"],
+    ))
 
 # Mixin for ListView, DeleteView etc.
 class UserQuerysetMixin(LoginRequiredMixin):
@@ -188,8 +240,9 @@ class UserFormMixin(LoginRequiredMixin):
         form.instance.user = self.request.user
         return super().form_valid(form)
 
-class CategoryListView(UserQuerysetMixin, ListView):
+class CategoryListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
     model = Category
+    keyset_ordering = ("name", "id")
     template_name = 'fintrack_app/category/category_list.html'
     context_object_name = 'categories'
 
@@ -213,35 +266,209 @@ class CategoryDeleteView(UserQuerysetMixin, DeleteView):
     def get_queryset(self):
         return Category.objects.filter(user=self.request.user)
 
-class TransactionListView(UserQuerysetMixin, ListView):
+class TransactionListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
     model = Transaction
     template_name = 'fintrack_app/transaction/transaction_list.html'
     context_object_name = 'transactions'
+    keyset_ordering = ("-date", "id")
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("category")
 
 
 class TransactionCreateView(UserFormMixin, CreateView):
     model = Transaction
-    fields = ['category', 'transaction_type', 'amount', 'note']
+    form_class = TransactionForm
     template_name = 'fintrack_app/transaction/transaction_form.html'
     success_url = reverse_lazy('transaction-list')
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
 
 class TransactionUpdateView(TransactionCreateView, UpdateView):
     template_name = 'fintrack_app/transaction/transaction_form.html'
 
+    def get_queryset(self):
+        return Transaction.objects.filter(user=self.request.user)
+
 
 class TransactionDeleteView(UserQuerysetMixin, DeleteView):
     model = Transaction
     template_name = 'fintrack_app/transaction/transaction_delete.html'
     success_url = reverse_lazy('transaction-list')
 
-class BudgetListView(UserQuerysetMixin, ListView):
+class RecurringTransactionListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
+    model = RecurringTransaction
+    keyset_ordering = ("next_date", "id")
+    template_name = 'fintrack_app/recurring/recurring_list.html'
+    context_object_name = 'rules'
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("category")
+
+
+class RecurringTransactionCreateView(UserFormMixin, CreateView):
+    model = RecurringTransaction
+    form_class = RecurringTransactionForm
+    template_name = 'fintrack_app/recurring/recurring_form.html'
+    success_url = reverse_lazy('recurring-list')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+
+class RecurringTransactionDeleteView(UserQuerysetMixin, DeleteView):
+    model = RecurringTransaction
+    template_name = 'fintrack_app/recurring/recurring_delete.html'
+    success_url = reverse_lazy('recurring-list')
+
+
+@login_required
+def transaction_import(request):
+    if request.method == "POST":
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            file_format = form.cleaned_data["file_format"]
+            name = jobs.storage.save(f"imports/{uuid.uuid4().hex}.{file_format}", form.cleaned_data["file"])
+            job = jobs.enqueue("import", request.user, {
+                "file": name,
+                "file_format": file_format,
+                "date_format": form.cleaned_data["date_format"],
+            })
+            return redirect('job-detail', pk=job.pk)
+    else:
+        form = TransactionImportForm()
+    return render(request, 'fintrack_app/transaction/transaction_import.html', {'form': form})
+
+SEARCH_PAGE_SIZE = 25
+
+@login_required
+def transaction_search(request):
+    form = TransactionSearchForm(request.GET, user=request.user)
+    transactions, page, has_next = [], 1, False
+    if form.is_valid():
+        # Ranked results have no stable key to paginate on, so pages are offsets; one extra row tells if there is a next
+        page = form.cleaned_data["page"] or 1
+        offset = (page - 1) * SEARCH_PAGE_SIZE
+        transactions = list(search.search(request.user, **form.filters())[offset:offset + SEARCH_PAGE_SIZE + 1])
+        has_next = len(transactions) > SEARCH_PAGE_SIZE
+        transactions = transactions[:SEARCH_PAGE_SIZE]
+
+    query = request.GET.copy()
+    query.pop("page", None)
+    return render(request, 'fintrack_app/transaction/transaction_search.html', {
+        'form': form,
+        'transactions': transactions,
+        'page': page,
+        'has_next': has_next,
+        'query': query.urlencode(),
+    })
+
+def _export_response(chunks, filename, content_type, compress):
+    if compress:
+        filename += ".gz"
+        content_type = "application/gzip"
+    response = StreamingHttpResponse(exporters.encode(chunks, compress), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def transaction_export(request):
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    if form.cleaned_data["format"] == "json":
+        chunks = exporters.transactions_json(request.user, **form.filters())
+        return _export_response(chunks, "transactions.json", "application/json", form.cleaned_data["gzip"])
+
+    chunks = exporters.transactions_csv(request.user, **form.filters())
+    return _export_response(chunks, "transactions.csv", "text/csv", form.cleaned_data["gzip"])
+
+@login_required
+def account_export(request):
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    chunks = exporters.account_json(request.user, **form.filters())
+    return _export_response(chunks, "fintrack-account.json", "application/json", form.cleaned_data["gzip"])
+
+@login_required
+@require_POST
+def export_job(request):
+    form = ExportForm(request.POST)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    if request.POST.get("account"):
+        export = "account_json"
+    else:
+        export = "transactions_json" if form.cleaned_data["format"] == "json" else "transactions_csv"
+    # The payload is stored as JSON
+    filters = {name: value.isoformat() if isinstance(value, date) else value for name, value in form.filters().items()}
+    job = jobs.enqueue("export", request.user, {
+        "export": export,
+        "filters": filters,
+        "gzip": form.cleaned_data["gzip"],
+    })
+    return redirect('job-detail', pk=job.pk)
+
+def _job_status(job):
+    status = {
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "progress": job.progress,
+        "total": job.total,
+        "message": job.message,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.kind == "export" and job.status == "succeeded":
+        status["download_url"] = reverse('job-download', args=[job.pk])
+    return status
+
+@login_required
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return render(request, 'fintrack_app/job/job_detail.html', {'job': job})
+
+@login_required
+@cache_control(private=True, no_store=True)
+def job_status(request, pk):
+    # Polled by job-status.js until the job has finished
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return JsonResponse(_job_status(job))
+
+@login_required
+def job_download(request, pk):
+    job = get_object_or_404(Job, pk=pk, user=request.user, kind="export", status="succeeded")
+    try:
+        file = jobs.storage.open(job.result["file"], "rb")
+    except FileNotFoundError:
+        raise Http404("The export file is no longer available.")
+    return FileResponse(file, as_attachment=True, filename=job.result["filename"],
+                        content_type=job.result["content_type"])
+
+class BudgetListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
     model = Budget
+    keyset_ordering = ("-month", "id")
     template_name = 'fintrack_app/budget/budget_list.html'
     context_object_name = 'budgets'
 
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        # Actual spend per budget month, from the rollups in the same query
+        return rollups.with_budget_actuals(Budget.objects.filter(user=self.request.user))
 
 class BudgetCreateView(UserFormMixin, CreateView):
     model = Budget
@@ -264,8 +491,9 @@ class BudgetDeleteView(UserQuerysetMixin, DeleteView):
     template_name = 'fintrack_app/budget/budget_delete.html'
     success_url = reverse_lazy('budget-list')
 
-class DebtListView(UserQuerysetMixin, ListView):
+class DebtListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
     model = Debt
+    keyset_ordering = ("-start_date", "id")
     template_name = 'fintrack_app/debt/debt_list.html'
     context_object_name = 'debts'
 
@@ -286,63 +514,44 @@ class DebtDeleteView(UserQuerysetMixin, DeleteView):
     template_name = 'fintrack_app/debt/debt_delete.html'
     success_url = reverse_lazy('debt-list')
 
-class GoalListView(UserQuerysetMixin, ListView):
+class GoalListView(UserQuerysetMixin, KeysetPaginationMixin, ListView):
     model = Goal
+    keyset_ordering = ("-created_at", "id")
     template_name = 'fintrack_app/goal/goal_list.html'
     context_object_name = 'goals'
 
-def allocate_goal_money(user_profile, amount, source=None):
-    if user_profile.balance < amount:
-        raise ValueError("Not enough balance.")
-
-    user_profile.balance -= amount
-    user_profile.save()
-    
-class GoalCreateView(UserFormMixin, CreateView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Projections need every goal anyway (savings go to them in deadline order), and are cached
+        projections = {goal.pk: goal.projection for goal in goals.project_goals(self.request.user)}
+        for goal in context["object_list"]:
+            goal.projection = projections.get(goal.pk)
+        return context
+
+# Mixin for goal Create/Update views
+class GoalAllocationMixin(UserFormMixin):
+    # Saving a goal draws its current amount from the balance ledger, which refuses to go below zero
+    def form_valid(self, form):
+        pk = form.instance.pk
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except ledger.InsufficientBalance as e:
+            form.instance.pk = pk
+            form.add_error('current_amount', str(e))
+            return self.form_invalid(form)
+
+class GoalCreateView(GoalAllocationMixin, CreateView):
     model = Goal
     fields = ['title', 'goal_type', 'target_amount', 'current_amount', 'deadline']
     template_name = 'fintrack_app/goal/goal_form.html'
     success_url = reverse_lazy('goal-list')
-    
-    def form_valid(self, form):
-        amount = form.cleaned_data.get('current_amount', 0)
-        user_profile = self.request.user.userprofile
-        source = self.request.POST.get('source', 'total')
 
-        if amount > 0:
-            try:
-                allocate_goal_money(user_profile, amount, source)
-            except ValueError as e:
-                form.add_error('current_amount', str(e))
-                return self.form_invalid(form)
-
-        form.instance.user = self.request.user
-        return super().form_valid(form)
-
-class GoalUpdateView(UserFormMixin, UpdateView):
+class GoalUpdateView(GoalAllocationMixin, UpdateView):
     model = Goal
     fields = ['title', 'goal_type', 'target_amount', 'current_amount', 'deadline']
     template_name = 'fintrack_app/goal/goal_form.html'
     success_url = reverse_lazy('goal-list')
-    
-    def form_valid(self, form):
-        goal = self.get_object()
-        user_profile = self.request.user.userprofile
-
-        old_amount = goal.current_amount
-        new_amount = form.cleaned_data.get('current_amount', 0)
-        diff = new_amount - old_amount
-
-        if diff > 0:
-            source = self.request.POST.get('source', 'total')
-            try:
-                allocate_goal_money(user_profile, diff, source)
-            except ValueError as e:
-                form.add_error('current_amount', str(e))
-                return self.form_invalid(form)
-
-        form.instance.user = self.request.user
-        return super().form_valid(form)
 
 class GoalDeleteView(UserQuerysetMixin, DeleteView):
     model = Goal
@@ -24,16 +24,25 @@ Chart.register({
 });
 
 
+// Swap a chart for its "no data" message
+function showEmpty(canvasId, hideId) {
+    document.getElementById(hideId || canvasId).classList.add("d-none");
+    const message = document.querySelector(`[data-empty-for="${canvasId}"]`);
+    if (message) message.classList.remove("d-none");
+}
+
+
 // INCOME VS EXPENSE (BAR)
-document.addEventListener("DOMContentLoaded", function () {
+function drawIncomeExpenseChart(series) {
 
     const canvas = document.getElementById("incomeExpenseChart");
     if (!canvas) return;
 
-    // Get data from HTML
-    const labels = JSON.parse(canvas.dataset.labels || "[]");
-    const incomeData = JSON.parse(canvas.dataset.income || "[]").map(Number);
-    const expenseData = JSON.parse(canvas.dataset.expense || "[]").map(Number);
+    const labels = series.labels || [];
+    if (labels.length === 0) return showEmpty("incomeExpenseChart");
+
+    const incomeData = (series.income || []).map(Number);
+    const expenseData = (series.expense || []).map(Number);
 
     // Split long labels into multiple lines
     const formattedLabels = labels.map(label => {
@@ -122,7 +131,7 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     });
 
-});
+}
 
 // MONTHLY BUDGET (DOUGHNUT)
 
@@ -162,53 +171,55 @@ if (budgetCanvas) {
 }
 
 // EXPENSE BY CATEGORY (PIE)
+function drawCategoryPieChart(series) {
 
-const categoryCanvas = document.getElementById("categoryPieChart");
-
-if (categoryCanvas) {
-
-    const labels = JSON.parse(categoryCanvas.dataset.labels || "[]");
-    const values = JSON.parse(categoryCanvas.dataset.values || "[]");
-
-    if (labels.length > 0) {
-
-        new Chart(categoryCanvas, {
-            type: "pie",
-            data: {
-                labels: labels,
-                datasets: [{
-                    data: values,
-                    backgroundColor: [
-                        "#0d6efd",
-                        "#198754",
-                        "#dc3545",
-                        "#ffc107",
-                        "#6f42c1",
-                        "#fd7e14",
-                        "#20c997",
-                        "#6c757d"
-                    ]
-                }]
-            },
-            options: {
-                responsive: true,
-                maintainAspectRatio: false,
-                plugins: {
-                    legend: { position: "bottom" }
-                }
+    const categoryCanvas = document.getElementById("categoryPieChart");
+    if (!categoryCanvas) return;
+
+    const labels = series.labels || [];
+    const values = series.values || [];
+
+    if (labels.length === 0) return showEmpty("categoryPieChart");
+
+    new Chart(categoryCanvas, {
+        type: "pie",
+        data: {
+            labels: labels,
+            datasets: [{
+                data: values,
+                backgroundColor: [
+                    "#0d6efd",
+                    "#198754",
+                    "#dc3545",
+                    "#ffc107",
+                    "#6f42c1",
+                    "#fd7e14",
+                    "#20c997",
+                    "#6c757d"
+                ]
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: { position: "bottom" }
             }
-        });
-    }
+        }
+    });
 }
 
 // Debt Chart
-const debtCanvas = document.getElementById("debtChart");
+function drawDebtChart(series) {
 
-if (debtCanvas) {
+    const debtCanvas = document.getElementById("debtChart");
+    if (!debtCanvas) return;
 
-    const labels = JSON.parse(debtCanvas.dataset.labels || "[]");
-    const values = JSON.parse(debtCanvas.dataset.values || "[]");
-    const types  = JSON.parse(debtCanvas.dataset.types || "[]");
+    const labels = series.labels || [];
+    const values = series.values || [];
+    const types  = series.types || [];
+
+    if (labels.length === 0) return showEmpty("debtChart", "debtChartBlock");
 
     const colors = [];
     for (let i = 0; i < values.length; i++) {
@@ -253,3 +264,100 @@ if (debtCanvas) {
         }
     );
 }
+
+
+// Chart series come from a separate JSON endpoint, fetched once the page is up.
+// The browser revalidates with the ETag, unchanged data comes back as a 304.
+const chartsRoot = document.getElementById("dashboardCharts");
+
+if (chartsRoot) {
+    fetch(chartsRoot.dataset.url, {
+        credentials: "same-origin",
+        headers: { "Accept": "application/json" }
+    })
+        .then(response => {
+            if (!response.ok) throw new Error(`Chart data request failed (${response.status})`);
+            return response.json();
+        })
+        .then(data => {
+            drawIncomeExpenseChart(data.income_expense);
+            drawCategoryPieChart(data.category_expenses);
+            drawDebtChart(data.debts);
+        })
+        .catch(error => console.error(error));
+}
+
+
+// BALANCE FORECAST (projected balance line over net cash-flow bars)
+function drawForecastChart(forecast) {
+
+    const canvas = document.getElementById("forecastChart");
+    if (!canvas) return;
+
+    const months = forecast.months || [];
+    const flows = (forecast.income || []).concat(forecast.expense || []);
+    if (months.length === 0 || !flows.some(Number)) return showEmpty("forecastChart");
+
+    const labels = months.map(month =>
+        new Date(month + "T00:00:00").toLocaleDateString(undefined, { month: "short", year: "numeric" })
+    );
+
+    new Chart(canvas, {
+        data: {
+            labels,
+            datasets: [
+                {
+                    type: "line",
+                    label: "Balance",
+                    data: forecast.balance,
+                    borderColor: "#0d6efd",
+                    backgroundColor: "rgba(13, 110, 253, 0.1)",
+                    fill: true,
+                    tension: 0.3,
+                    yAxisID: "balance"
+                },
+                {
+                    type: "bar",
+                    label: "Net cash flow",
+                    data: forecast.net,
+                    backgroundColor: forecast.net.map(value =>
+                        value < 0 ? "rgba(220, 53, 69, 0.6)" : "rgba(25, 135, 84, 0.6)"
+                    ),
+                    borderRadius: 6,
+                    yAxisID: "flow"
+                }
+            ]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: { position: "top" },
+                tooltip: {
+                    callbacks: {
+                        label: context => context.dataset.label + ": Rs. " + context.parsed.y.toLocaleString()
+                    }
+                }
+            },
+            scales: {
+                balance: { position: "left" },
+                flow: { position: "right", grid: { display: false } }
+            }
+        }
+    });
+}
+
+const forecastRoot = document.getElementById("forecastWidget");
+
+if (forecastRoot) {
+    fetch(forecastRoot.dataset.url, {
+        credentials: "same-origin",
+        headers: { "Accept": "application/json" }
+    })
+        .then(response => {
+            if (!response.ok) throw new Error(`Forecast request failed (${response.status})`);
+            return response.json();
+        })
+        .then(drawForecastChart)
+        .catch(error => console.error(error));
+}
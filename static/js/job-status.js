@@ -0,0 +1,30 @@
+
+// Poll a background job until it has finished, then reload for the result
+(function () {
+    const job = document.getElementById("job");
+    if (!job || job.dataset.finished === "true") return;
+
+    const state = document.getElementById("job-state");
+    const message = document.getElementById("job-message");
+
+    function poll() {
+        fetch(job.dataset.statusUrl, { credentials: "same-origin" })
+            .then((response) => response.json())
+            .then((status) => {
+                if (status.status === "succeeded" || status.status === "failed") {
+                    window.location.reload();
+                    return;
+                }
+                state.textContent = status.status.charAt(0).toUpperCase() + status.status.slice(1);
+                let text = status.message;
+                if (status.total) {
+                    text = `${status.progress} of ${status.total}` + (text ? ` - ${text}` : "");
+                }
+                message.textContent = text;
+                setTimeout(poll, 2000);
+            })
+            .catch(() => setTimeout(poll, 5000));
+    }
+
+    setTimeout(poll, 1000);
+})();